@@ -0,0 +1,228 @@
+# analytics.py
+"""Оценка числа уникальных пользователей по дням без хранения самих ID.
+
+На каждую метрику ("all" — любые апдейты, плюс отдельные команды) и каждый день заводится
+HyperLogLog-скетч фиксированного размера; DAU/WAU/MAU — объединение скетчей за 1/7/30 дней.
+Скетчи разных процессов объединяются поэлементным максимумом, поэтому файлы воркеров можно сложить:
+python analytics.py analytics-1.json analytics-2.json
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+# 2^12 регистров по байту: 4 КБ на скетч, стандартная ошибка около 1.6%
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+# Сколько последних дней хранить; хватает на MAU за 30 дней
+RETAIN_DAYS = 31
+TRACKED_COMMANDS = ("/start", "/programma", "/donate")
+WINDOWS = (("DAU", 1), ("WAU", 7), ("MAU", 30))
+
+
+class HyperLogLog:
+    def __init__(self, registers: bytearray | None = None):
+        self.registers = registers if registers is not None else bytearray(REGISTERS)
+
+    def add(self, user_id: int):
+        # Хэш не зависит от процесса (в отличие от hash()), иначе скетчи воркеров не сложить
+        x = int.from_bytes(hashlib.blake2b(str(user_id).encode(), digest_size=8).digest(), "big")
+        idx = x >> (64 - PRECISION)
+        rank = (64 - PRECISION) - (x & ((1 << (64 - PRECISION)) - 1)).bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+        estimate = alpha * REGISTERS * REGISTERS / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Поправка для малых значений: linear counting по пустым регистрам
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return round(estimate)
+
+    def dump(self) -> str:
+        return base64.b64encode(zlib.compress(bytes(self.registers))).decode("ascii")
+
+    @classmethod
+    def load(cls, raw: str) -> "HyperLogLog":
+        registers = bytearray(zlib.decompress(base64.b64decode(raw)))
+        if len(registers) != REGISTERS:
+            raise ValueError(f"sketch has {len(registers)} registers, expected {REGISTERS}")
+        return cls(registers)
+
+
+# Метрика -> день (ISO) -> скетч
+sketches: Dict[str, Dict[str, HyperLogLog]] = {}
+_today: str | None = None
+# Были ли отметки после последнего сохранения (см. run)
+_dirty = False
+
+
+def _day_key() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+def _trim(today: str):
+    oldest = (date.fromisoformat(today) - timedelta(days=RETAIN_DAYS - 1)).isoformat()
+    for days in sketches.values():
+        for day in [day for day in days if day < oldest]:
+            del days[day]
+
+def track(user_id: int, command: str | None = None):
+    global _today, _dirty
+    _dirty = True
+    today = _day_key()
+    if today != _today:
+        _today = today
+        _trim(today)
+    for metric in ("all", command) if command else ("all",):
+        days = sketches.setdefault(metric, {})
+        sketch = days.get(today)
+        if sketch is None:
+            sketch = days[today] = HyperLogLog()
+        sketch.add(user_id)
+
+def unique_users(metric: str = "all", days: int = 1, today: str | None = None) -> int:
+    """Оценка уникальных пользователей метрики за последние days дней, включая сегодня."""
+    end = date.fromisoformat(today or _day_key())
+    union = HyperLogLog()
+    for offset in range(days):
+        sketch = sketches.get(metric, {}).get((end - timedelta(days=offset)).isoformat())
+        if sketch is not None:
+            union.merge(sketch)
+    return union.count()
+
+def report(today: str | None = None) -> Dict[str, Dict[str, int]]:
+    """{метрика: {"DAU": ..., "WAU": ..., "MAU": ...}} для всех отслеживаемых метрик."""
+    return {
+        metric: {name: unique_users(metric, days, today) for name, days in WINDOWS}
+        for metric in ("all",) + TRACKED_COMMANDS
+    }
+
+
+def command_of(update: Update) -> str | None:
+    text = update.message.text if update.message else None
+    if not text or not text.startswith("/"):
+        return None
+    command = text.split(maxsplit=1)[0].split("@")[0]
+    return command if command in TRACKED_COMMANDS else None
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """Outer-middleware: отмечает автора апдейта в скетчах текущего дня."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user:
+            try:
+                track(user.id, command_of(event))
+            except Exception as e:
+                logger.error(f"Failed to track activity of update {event.update_id}: {e}")
+        return await handler(event, data)
+
+
+def _merge(data: dict, source: str):
+    if data.get("precision") != PRECISION:
+        logger.error(f"Skipping analytics {source}: precision {data.get('precision')}, expected {PRECISION}")
+        return
+    for metric, days in data.get("sketches", {}).items():
+        for day, raw in days.items():
+            try:
+                sketch = HyperLogLog.load(raw)
+            except Exception as e:
+                logger.error(f"Skipping broken sketch {metric}/{day} in {source}: {e}")
+                continue
+            current = sketches.setdefault(metric, {}).get(day)
+            if current is None:
+                sketches[metric][day] = sketch
+            else:
+                current.merge(sketch)
+    _trim(_day_key())
+    logger.info(f"Loaded analytics from {source}: {sum(len(days) for days in sketches.values())} sketches")
+
+def load(path: str):
+    """Добавляет скетчи из файла к текущим (объединением), так что можно загрузить файлы нескольких воркеров."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        logger.error(f"Error loading analytics {path}: {e}")
+        return
+    _merge(data, path)
+
+def snapshot() -> bytes:
+    """Текущие скетчи в формате файла аналитики (см. backup.py)."""
+    payload = {
+        "precision": PRECISION,
+        "sketches": {metric: {day: sketch.dump() for day, sketch in days.items()} for metric, days in sketches.items()}
+    }
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+def restore(raw: bytes, path: str):
+    """Заменяет скетчи снимком из snapshot() и записывает их в файл."""
+    sketches.clear()
+    _merge(json.loads(raw), "backup")
+    save(path)
+
+def save(path: str):
+    global _dirty
+    if not sketches:
+        return
+    _dirty = False
+    tmp_file = f"{path}.tmp"
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(snapshot())
+        os.replace(tmp_file, path)
+        logger.info(f"Saved analytics to {path}")
+    except Exception as e:
+        _dirty = True
+        logger.error(f"Error saving analytics {path}: {e}")
+
+async def run(interval: float, path: str):
+    """Фоновое сохранение скетчей раз в interval секунд, если с прошлого сохранения были отметки."""
+    while True:
+        await asyncio.sleep(interval)
+        if _dirty:
+            save(path)
+
+
+def format_report(stats: Dict[str, Dict[str, int]]) -> str:
+    lines = []
+    for metric, counts in stats.items():
+        title = "Все пользователи" if metric == "all" else metric
+        lines.append(f"{title}: " + ", ".join(f"{name} {count}" for name, count in counts.items()))
+    return "\n".join(lines)
+
+
+def main(paths: Iterable[str]):
+    for path in paths:
+        load(path)
+    print(format_report(report()))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main(sys.argv[1:])
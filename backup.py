@@ -0,0 +1,182 @@
+# backup.py
+"""Резервные копии хранилища программ и аналитики без остановки бота.
+
+Снимок снимается синхронно в event loop (storage.snapshot, analytics.snapshot), поэтому он
+согласован на один момент времени и не зависит от того, пишется ли сейчас user_program.json.
+Сжатие, контрольные суммы и запись архива идут в отдельном потоке. Архив — tar.gz с файлами
+хранилищ и manifest.json (SHA-256 каждого файла); хранятся последние BACKUP_KEEP архивов.
+
+Восстановление в работающем боте — /restore, при остановленном — python backup.py restore <архив>.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import settings.config as cfg
+import storage
+import analytics
+import reminders
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+PREFIX = "backup-"
+SUFFIX = ".tar.gz"
+
+
+class BackupError(Exception):
+    pass
+
+
+def take_snapshot() -> Dict[str, bytes]:
+    """Содержимое хранилищ на текущий момент: имя файла в архиве -> данные."""
+    return {
+        "user_program.json": storage.snapshot(),
+        "analytics.json": analytics.snapshot()
+    }
+
+def write_archive(members: Dict[str, bytes], path: str):
+    manifest = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "storage_format": storage.STORAGE_FORMAT,
+        "files": {name: {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data)} for name, data in members.items()}
+    }
+    members = {MANIFEST: json.dumps(manifest, indent=2).encode("utf-8"), **members}
+    tmp_file = f"{path}.tmp"
+    with tarfile.open(tmp_file, "w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            archive.addfile(info, io.BytesIO(data))
+    os.replace(tmp_file, path)
+
+def read_archive(path: str) -> Dict[str, bytes]:
+    """Файлы архива с проверкой контрольных сумм; BackupError, если архив поврежден."""
+    try:
+        with tarfile.open(path, "r:gz") as archive:
+            members = {member.name: archive.extractfile(member).read() for member in archive.getmembers() if member.isfile()}
+        manifest = json.loads(members.pop(MANIFEST))
+    except (OSError, tarfile.TarError, KeyError, ValueError) as e:
+        raise BackupError(f"cannot read {path}: {e}") from e
+    if set(manifest["files"]) != set(members):
+        raise BackupError(f"{path}: files {sorted(members)} do not match manifest {sorted(manifest['files'])}")
+    for name, expected in manifest["files"].items():
+        if hashlib.sha256(members[name]).hexdigest() != expected["sha256"]:
+            raise BackupError(f"{path}: checksum mismatch for {name}")
+    return members
+
+
+def list_backups() -> List[str]:
+    """Имена архивов в BACKUP_DIR, от новых к старым."""
+    if not os.path.isdir(cfg.BACKUP_DIR):
+        return []
+    names = [name for name in os.listdir(cfg.BACKUP_DIR) if name.startswith(PREFIX) and name.endswith(SUFFIX)]
+    # По имени нельзя: "-2" и метка после времени сортируются раньше архива той же секунды без них
+    return sorted(names, key=_created, reverse=True)
+
+def _created(name: str) -> tuple:
+    stamp = name[len(PREFIX):len(PREFIX) + len("YYYYmmdd-HHMMSS")]
+    return stamp, os.stat(os.path.join(cfg.BACKUP_DIR, name)).st_mtime_ns
+
+def _rotate():
+    for name in list_backups()[cfg.BACKUP_KEEP:]:
+        os.remove(os.path.join(cfg.BACKUP_DIR, name))
+        logger.info(f"Removed old backup {name}")
+
+def _store(members: Dict[str, bytes], name: str) -> str:
+    os.makedirs(cfg.BACKUP_DIR, exist_ok=True)
+    path = os.path.join(cfg.BACKUP_DIR, name)
+    write_archive(members, path)
+    _rotate()
+    return path
+
+async def create_backup(label: str = "") -> str:
+    """Снимает снимок и пишет архив; возвращает имя архива."""
+    started = time.perf_counter()
+    members = take_snapshot()
+    stem = f"{PREFIX}{datetime.now():%Y%m%d-%H%M%S}{'-' + label if label else ''}"
+    name, copy = f"{stem}{SUFFIX}", 1
+    # Две копии в одну секунду не должны перезаписать друг друга
+    while os.path.exists(os.path.join(cfg.BACKUP_DIR, name)):
+        copy += 1
+        name = f"{stem}-{copy}{SUFFIX}"
+    path = await asyncio.to_thread(_store, members, name)
+    logger.info(
+        f"Backup {name} written in {(time.perf_counter() - started) * 1000:.1f} ms: "
+        f"{sum(map(len, members.values()))} bytes, archive {os.path.getsize(path)} bytes"
+    )
+    return name
+
+async def restore_backup(name: str):
+    """Проверяет архив и подменяет им данные работающего бота; текущее состояние сохраняется архивом pre-restore."""
+    if os.path.basename(name) != name or name not in list_backups():
+        raise BackupError(f"unknown backup {name}")
+    members = await asyncio.to_thread(read_archive, os.path.join(cfg.BACKUP_DIR, name))
+    await create_backup("pre-restore")
+    storage.restore_snapshot(members["user_program.json"])
+    # Куча напоминаний строится по storage.reminders, после подмены ее нужно пересобрать
+    reminders.rebuild(time.time())
+    if "analytics.json" in members:
+        analytics.restore(members["analytics.json"], cfg.ANALYTICS_FILE)
+    logger.warning(f"Restored state from backup {name}: {len(storage.user_program)} users")
+
+async def run(interval: float):
+    """Фоновые резервные копии раз в interval секунд."""
+    await storage.wait_loaded()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await create_backup()
+        except Exception as e:
+            logger.error(f"Scheduled backup failed: {e}")
+
+
+def restore_files(path: str):
+    """Восстановление при остановленном боте: файлы архива атомарно заменяют файлы хранилищ."""
+    members = read_archive(path)
+    targets = {"user_program.json": storage.STORAGE_FILE, "analytics.json": cfg.ANALYTICS_FILE}
+    for name, data in members.items():
+        tmp_file = f"{targets[name]}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, targets[name])
+        print(f"{name} -> {targets[name]} ({len(data)} bytes)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Резервные копии хранилища бота")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create", help="снять резервную копию с файлов на диске")
+    commands.add_parser("list", help="список архивов")
+    verify = commands.add_parser("verify", help="проверить контрольные суммы архива")
+    verify.add_argument("archive")
+    restore = commands.add_parser("restore", help="восстановить файлы из архива (бот должен быть остановлен)")
+    restore.add_argument("archive")
+    args = parser.parse_args()
+
+    if args.command == "create":
+        storage.load_user_program()
+        analytics.load(cfg.ANALYTICS_FILE)
+        print(asyncio.run(create_backup()))
+    elif args.command == "list":
+        print("\n".join(list_backups()))
+    elif args.command == "verify":
+        members = read_archive(args.archive)
+        print("OK: " + ", ".join(f"{name} ({len(data)} bytes)" for name, data in members.items()))
+    else:
+        restore_files(args.archive)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,222 @@
+# bootstrap.py
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram.types import TelegramObject, Update
+
+import settings.config as cfg
+import storage
+import media
+import analytics
+import workout_log
+import progress
+import reminders
+import backup
+from edit_dedup import EditDedupMiddleware
+from catalog import compile_catalog, watch_catalog
+from replay import UpdateRecorder
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FILES = [cfg.start_image, cfg.donate_image, cfg.tutorials_image]
+
+def configure_logging():
+    logging.basicConfig(
+        level=cfg.LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(cfg.LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
+
+
+class StorageReadyMiddleware(BaseMiddleware):
+    """Пропускает /start сразу, остальные апдейты ждут окончания загрузки хранилища."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not storage.is_loaded() and not is_start_command(event):
+            await storage.wait_loaded()
+        return await handler(event, data)
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """Считает апдейты в обработке, чтобы при остановке дождаться их завершения."""
+
+    def __init__(self):
+        self.active = 0
+        self.accepting = True
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not self.accepting:
+            logger.warning(f"Dropping update {event.update_id} received during shutdown")
+            return None
+        self.active += 1
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.active -= 1
+            if not self.active:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+def is_start_command(update: Update) -> bool:
+    text = update.message.text if update.message else None
+    return bool(text) and text.split(maxsplit=1)[0].split("@")[0] == "/start"
+
+
+class Bootstrap:
+    """Явный запуск бота по фазам с замером времени каждой фазы."""
+
+    def __init__(self, dp: Dispatcher, register_handlers: Callable[[Dispatcher], None]):
+        self.dp = dp
+        self.register_handlers = register_handlers
+        self.timings: Dict[str, float] = {}
+        self.recorder: UpdateRecorder | None = None
+        self._background: list[asyncio.Task] = []
+        self._report_task: asyncio.Task | None = None
+        self._catalog_watcher: asyncio.Task | None = None
+        self._reminders: asyncio.Task | None = None
+        self._backups: asyncio.Task | None = None
+        self._analytics: asyncio.Task | None = None
+        self.in_flight = InFlightMiddleware()
+        self.edit_dedup = EditDedupMiddleware()
+        self.webapp_runner = None
+        self._closed = False
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (time.perf_counter() - started) * 1000
+            logger.info(f"Startup phase '{name}' took {self.timings[name]:.1f} ms")
+
+    async def start(self) -> Bot:
+        with self.phase("config"):
+            configure_logging()
+            if not cfg.BOT_TOKEN:
+                raise RuntimeError("TOKEN is not set")
+            bot = Bot(
+                token=cfg.BOT_TOKEN,
+                default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+            )
+            bot.session.middleware(self.edit_dedup)
+
+        self.dp.update.outer_middleware(self.in_flight)
+        # Хранилище грузится в фоне, пока бот уже отвечает на /start
+        self.dp.update.outer_middleware(StorageReadyMiddleware())
+        self._background.append(asyncio.create_task(self._timed("storage", storage.load_user_program_async())))
+        self._background.append(asyncio.create_task(self._timed("workout log", workout_log.load_async())))
+
+        with self.phase("catalog"):
+            compile_catalog()
+        if cfg.CATALOG_WATCH_INTERVAL > 0:
+            self._catalog_watcher = asyncio.create_task(watch_catalog(cfg.CATALOG_WATCH_INTERVAL))
+
+        with self.phase("handlers"):
+            self.register_handlers(self.dp)
+            if cfg.CAPTURE_FILE:
+                self.recorder = UpdateRecorder(cfg.CAPTURE_FILE)
+                self.dp.update.outer_middleware(self.recorder)
+                logger.info(f"Capturing updates to {cfg.CAPTURE_FILE}")
+
+        with self.phase("analytics"):
+            analytics.load(cfg.ANALYTICS_FILE)
+            self.dp.update.outer_middleware(analytics.ActivityMiddleware())
+
+        with self.phase("media"):
+            media.load_cache(cfg.MEDIA_CACHE_FILE)
+            media.preload(MEDIA_FILES)
+        if cfg.MEDIA_CHAT_ID:
+            self._background.append(asyncio.create_task(
+                self._timed("media upload", media.upload(bot, cfg.MEDIA_CHAT_ID, MEDIA_FILES))
+            ))
+
+        if cfg.WEBAPP_URL:
+            with self.phase("webapp"):
+                # aiohttp-сервер нужен только вместе с Mini App
+                from webapp import start_webapp
+                self.webapp_runner = await start_webapp()
+
+        self._reminders = asyncio.create_task(reminders.run(bot))
+        if cfg.BACKUP_INTERVAL > 0:
+            self._backups = asyncio.create_task(backup.run(cfg.BACKUP_INTERVAL))
+        if cfg.ANALYTICS_SAVE_INTERVAL > 0:
+            self._analytics = asyncio.create_task(analytics.run(cfg.ANALYTICS_SAVE_INTERVAL, cfg.ANALYTICS_FILE))
+        self._report_task = asyncio.create_task(self._report())
+        self.dp.shutdown.register(self.shutdown)
+        return bot
+
+    async def _timed(self, name: str, coro: Awaitable[Any]):
+        with self.phase(name):
+            await coro
+
+    async def _report(self):
+        await asyncio.gather(*self._background, return_exceptions=True)
+        summary = ", ".join(f"{name} {ms:.1f} ms" for name, ms in self.timings.items())
+        logger.info(f"Startup finished: {summary}")
+
+    async def shutdown(self):
+        """Called by the dispatcher once polling has stopped: no new updates arrive after this point."""
+        logger.info(f"Shutting down: waiting for {self.in_flight.active} running handlers")
+        started = time.perf_counter()
+        if not await self.in_flight.drain(cfg.SHUTDOWN_TIMEOUT):
+            logger.warning(f"{self.in_flight.active} handlers still running after {cfg.SHUTDOWN_TIMEOUT}s, shutting down anyway")
+        for task in self._background:
+            task.cancel()
+        if self._catalog_watcher:
+            self._catalog_watcher.cancel()
+        if self._reminders:
+            self._reminders.cancel()
+        if self._backups:
+            self._backups.cancel()
+        if self._analytics:
+            self._analytics.cancel()
+        if self.webapp_runner:
+            await self.webapp_runner.cleanup()
+        self.close()
+        logger.info(f"Skipped {self.edit_dedup.skipped} no-op message edits")
+        logger.info(f"Shutdown finished in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def close(self):
+        """Flush state to disk; safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        if storage.is_loaded():
+            storage.flush_user_program()
+        media.save_cache(cfg.MEDIA_CACHE_FILE)
+        analytics.save(cfg.ANALYTICS_FILE)
+        workout_log.close()
+        progress.shutdown()
+        if self.recorder:
+            self.recorder.close()
@@ -0,0 +1,142 @@
+# catalog.py
+"""Справочник упражнений из settings/exercises.json.
+
+ID групп, подгрупп и упражнений задаются в файле и не меняются при правках,
+поэтому на них можно ссылаться в callback_data и сохраненных данных.
+Файл можно перечитать на ходу (/reload_catalog или watch_catalog): новый справочник
+подменяет текущий целиком, а начатые мастера продолжают работать со своей версией.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import settings.config as cfg
+
+logger = logging.getLogger(__name__)
+
+# Сколько прошлых версий держать для мастеров, начатых до перезагрузки
+KEEP_VERSIONS = 5
+
+
+class Catalog:
+    """Скомпилированный справочник упражнений: группы, подгруппы и обратные индексы."""
+
+    def __init__(self, source: dict, version: str = ""):
+        self.version = version
+        self.groups: Dict[str, Tuple[str, ...]] = {}
+        self.exercises: Dict[str, Tuple[str, ...]] = {}
+        self.subgroup_to_group: Dict[str, str] = {}
+        self.group_ids: Dict[str, int] = {}
+        self.subgroup_ids: Dict[str, int] = {}
+        # ID упражнений подгруппы в том же порядке, что и self.exercises[subgroup]
+        self.exercise_ids: Dict[str, Tuple[int, ...]] = {}
+        # ID -> (группа, подгруппа, упражнение) и обратно (подгруппа, упражнение) -> ID
+        self.exercise_by_id: Dict[int, Tuple[str, str, str]] = {}
+        self.exercise_index: Dict[Tuple[str, str], int] = {}
+        # Короткие ASCII токены подгрупп для callback_data вместо кириллицы
+        self.tokens: Dict[str, str] = {}
+        self.subgroup_by_token: Dict[str, str] = {}
+
+        self._subgroup_id_seen = set()
+        for group in source["groups"]:
+            name = group["name"]
+            if group["id"] in self.group_ids.values() or name in self.groups:
+                raise ValueError(f"duplicate group {group['id']} {name!r}")
+            self.group_ids[name] = group["id"]
+            self.groups[name] = tuple(subgroup["name"] for subgroup in group["subgroups"])
+            for subgroup in group["subgroups"]:
+                self._add_subgroup(name, subgroup)
+
+    def _add_subgroup(self, group: str, subgroup: dict):
+        name = subgroup["name"]
+        token = f"{self.group_ids[group]}.{subgroup['id']}"
+        if name in self.exercises or subgroup["id"] in self._subgroup_id_seen:
+            raise ValueError(f"duplicate subgroup {subgroup['id']} {name!r}")
+        self._subgroup_id_seen.add(subgroup["id"])
+        self.subgroup_ids[name] = subgroup["id"]
+        self.subgroup_to_group[name] = group
+        self.tokens[name] = token
+        self.subgroup_by_token[token] = name
+
+        names, ids = [], []
+        for exercise in subgroup["exercises"]:
+            exercise_id, title = exercise["id"], exercise["name"].strip()
+            if not title or exercise_id in self.exercise_by_id or (name, title) in self.exercise_index:
+                raise ValueError(f"bad or duplicate exercise {exercise_id} {title!r} in {name!r}")
+            names.append(title)
+            ids.append(exercise_id)
+            self.exercise_by_id[exercise_id] = (group, name, title)
+            self.exercise_index[(name, title)] = exercise_id
+        self.exercises[name] = tuple(names)
+        self.exercise_ids[name] = tuple(ids)
+
+    def get_exercises(self, muscle_group: str, subgroup: str) -> Tuple[str, ...]:
+        if self.subgroup_to_group.get(subgroup) != muscle_group:
+            return ()
+        return self.exercises[subgroup]
+
+
+_catalog: Catalog | None = None
+_versions: "OrderedDict[str, Catalog]" = OrderedDict()
+_mtime: float | None = None
+
+def read_catalog(path: str) -> Catalog:
+    """Читает и компилирует файл; версия — хэш содержимого, так что она одинакова у всех процессов."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    version = hashlib.blake2b(raw, digest_size=4).hexdigest()
+    return Catalog(json.loads(raw.decode("utf-8")), version)
+
+def install_catalog(catalog: Catalog) -> Catalog:
+    global _catalog
+    if _catalog and _catalog.version == catalog.version:
+        return _catalog
+    _versions[catalog.version] = catalog
+    while len(_versions) > KEEP_VERSIONS:
+        _versions.popitem(last=False)
+    # Одно присваивание: обработчики видят либо старый, либо новый справочник целиком
+    _catalog = catalog
+    logger.info(
+        f"Catalog version {catalog.version}: {len(catalog.groups)} groups, "
+        f"{len(catalog.exercises)} subgroups, {len(catalog.exercise_by_id)} exercises"
+    )
+    return catalog
+
+def compile_catalog() -> Catalog:
+    global _mtime
+    _mtime = os.stat(cfg.CATALOG_FILE).st_mtime
+    return install_catalog(read_catalog(cfg.CATALOG_FILE))
+
+async def reload_catalog() -> Catalog:
+    """Перечитывает файл справочника. При ошибке бросает исключение, текущий справочник остается."""
+    global _mtime
+    # Запоминаем mtime до разбора, чтобы watch_catalog не повторял ошибку битого файла каждую проверку
+    _mtime = os.stat(cfg.CATALOG_FILE).st_mtime
+    return install_catalog(await asyncio.to_thread(read_catalog, cfg.CATALOG_FILE))
+
+def get_catalog(version: str | None = None, strict: bool = False) -> Catalog:
+    """Текущий справочник или версия, с которой начат мастер (если она еще в памяти).
+
+    Мастер на вытесненной версии продолжает с текущей; со strict=True это ошибка: номера
+    упражнений из такой версии могут указывать уже на другие упражнения.
+    """
+    if version and version in _versions:
+        return _versions[version]
+    catalog = _catalog or compile_catalog()
+    if version and strict and version != catalog.version:
+        raise ValueError("каталог обновился, откройте конструктор заново")
+    return catalog
+
+async def watch_catalog(interval: float):
+    """Фоновая проверка mtime файла справочника; перечитывает его при изменении."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if os.stat(cfg.CATALOG_FILE).st_mtime != _mtime:
+                await reload_catalog()
+        except Exception as e:
+            logger.error(f"Failed to reload catalog from {cfg.CATALOG_FILE}: {e}")
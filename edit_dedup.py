@@ -0,0 +1,110 @@
+# edit_dedup.py
+"""Пропуск правок сообщений, которые ничего не меняют.
+
+Двойное нажатие кнопки или повторный показ того же шага мастера приводят к edit_text с тем же
+текстом и клавиатурой, на что Telegram отвечает ошибкой "message is not modified". Middleware
+на сессии бота помнит отпечаток (хэш текста и клавиатуры) последнего содержимого каждого
+сообщения — и отправленного, и отредактированного — и такие правки в API не отправляет.
+Работает для всех хендлеров сразу, без проверок в каждом из них.
+"""
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import (
+    DeleteMessage, EditMessageCaption, EditMessageMedia, EditMessageReplyMarkup, EditMessageText,
+    SendMessage, SendPhoto, TelegramMethod
+)
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+# Сколько сообщений помнить; вытесняются давно не менявшиеся
+CACHE_SIZE = 50_000
+
+# Отпечаток содержимого: (хэш текста или подписи, хэш клавиатуры)
+Fingerprint = Tuple[bytes, bytes]
+
+
+def _digest(value) -> bytes:
+    if value is None:
+        raw = b""
+    elif isinstance(value, str):
+        raw = value.encode("utf-8")
+    else:
+        raw = value.model_dump_json(exclude_none=True).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=8).digest()
+
+def _message_key(method: TelegramMethod) -> tuple | None:
+    if getattr(method, "inline_message_id", None):
+        return ("inline", method.inline_message_id)
+    if getattr(method, "message_id", None) and getattr(method, "chat_id", None) is not None:
+        return (str(method.chat_id), method.message_id)
+    return None
+
+
+class EditDedupMiddleware(BaseRequestMiddleware):
+    """Request-middleware: не отправляет правки, совпадающие с последним содержимым сообщения."""
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self.skipped = 0
+        self._fingerprints: "OrderedDict[tuple, Fingerprint]" = OrderedDict()
+
+    def _remember(self, key: tuple, fingerprint: Fingerprint):
+        self._fingerprints[key] = fingerprint
+        self._fingerprints.move_to_end(key)
+        while len(self._fingerprints) > self.size:
+            self._fingerprints.popitem(last=False)
+
+    def _planned(self, method: TelegramMethod, key: tuple) -> Fingerprint | None:
+        """Отпечаток, который будет у сообщения после правки; None — правку не отслеживаем."""
+        if isinstance(method, EditMessageText):
+            return _digest(method.text), _digest(method.reply_markup)
+        if isinstance(method, EditMessageCaption):
+            return _digest(method.caption), _digest(method.reply_markup)
+        if isinstance(method, EditMessageReplyMarkup):
+            # Текст не меняется: без известного текста правку не с чем сравнить
+            current = self._fingerprints.get(key)
+            return (current[0], _digest(method.reply_markup)) if current else None
+        return None
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        if isinstance(method, (SendMessage, SendPhoto)):
+            result = await make_request(bot, method)
+            if isinstance(result, Message):
+                content = method.text if isinstance(method, SendMessage) else method.caption
+                self._remember((str(result.chat.id), result.message_id), (_digest(content), _digest(method.reply_markup)))
+            return result
+
+        key = _message_key(method)
+        if key is None:
+            return await make_request(bot, method)
+        if isinstance(method, (DeleteMessage, EditMessageMedia)):
+            self._fingerprints.pop(key, None)
+            return await make_request(bot, method)
+
+        planned = self._planned(method, key)
+        if planned is None:
+            return await make_request(bot, method)
+        if self._fingerprints.get(key) == planned:
+            self.skipped += 1
+            logger.debug(f"Skipped no-op {type(method).__name__} of message {key}")
+            # Message здесь собрать не из чего: вызывающий код берет id из исходного сообщения, а не из результата правки
+            return True
+        try:
+            result = await make_request(bot, method)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                self._fingerprints.pop(key, None)
+                raise
+            # Сообщение отправлено до перезапуска: содержимое уже такое, запоминаем его
+            logger.debug(f"Message {key} was not modified: {e}")
+            self._remember(key, planned)
+            return True
+        self._remember(key, planned)
+        return result
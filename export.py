@@ -0,0 +1,113 @@
+# export.py
+"""Выгрузка всех программ для администраторов: строка на каждое упражнение каждого дня пользователя.
+
+Строки генерируются по EXPORT_CHUNK_USERS пользователей, сразу сжимаются gzip и отдаются
+в multipart-запрос sendDocument по мере готовности, так что файл целиком в памяти не собирается.
+"""
+import asyncio
+import csv
+import io
+import itertools
+import json
+import zlib
+from collections import deque
+from typing import AsyncGenerator, Iterator
+
+from aiogram import Bot
+from aiogram.types import InputFile
+
+import storage
+
+EXPORT_CHUNK_USERS = 500
+FORMATS = ("csv", "jsonl")
+COLUMNS = ("user_id", "type", "days_per_week", "day", "position", "exercise_id", "subgroup", "exercise", "sets_reps")
+
+
+def user_rows(user_id: str) -> Iterator[tuple]:
+    ref = storage.user_program.get(user_id)
+    if not ref:
+        return
+    record = storage.programs[ref["hash"]]
+    program = record.get("program")
+    if not isinstance(program, dict) or "layout" not in program:
+        return
+    for day, unique_day in enumerate(program["order"], 1):
+        for position, exercise_id in enumerate(program["days"][unique_day], 1):
+            subgroup, _, exercise = storage.decode_exercise(exercise_id).partition(": ")
+            yield (user_id, record.get("type"), ref.get("days"), day, position, exercise_id,
+                   subgroup, exercise, record.get("sets_reps"))
+
+
+def _user_ids() -> Iterator[str]:
+    """ID пользователей в порядке хранилища, без копии всего списка.
+
+    Ключи берутся из словаря пачками по EXPORT_CHUNK_USERS, и между yield живой итератор
+    словаря не держится: хендлеры в это время добавляют и удаляют пользователей. Перед
+    каждой пачкой проверяется, что последний выгруженный пользователь стоит на прежнем месте;
+    если нет, обход продолжается сразу после последнего выгруженного, который еще есть
+    в хранилище. Порядок оставшихся ключей не меняется, новые добавляются в конец, так что
+    никто из оставшихся пользователей не пропадет и не выгрузится дважды.
+    """
+    recent = deque(maxlen=EXPORT_CHUNK_USERS)
+    position = 0
+    while True:
+        if recent:
+            # Берем на один ключ раньше: там должен стоять последний выгруженный
+            chunk = list(itertools.islice(storage.user_program, position - 1, position + EXPORT_CHUNK_USERS))
+            if chunk and chunk[0] == recent[-1]:
+                del chunk[0]
+            else:
+                position = _resume_position(recent)
+                chunk = list(itertools.islice(storage.user_program, position, position + EXPORT_CHUNK_USERS))
+        else:
+            chunk = list(itertools.islice(storage.user_program, EXPORT_CHUNK_USERS))
+        if not chunk:
+            return
+        recent.extend(chunk)
+        position += len(chunk)
+        yield from chunk
+
+
+def _resume_position(recent: deque) -> int:
+    for user_id in reversed(recent):
+        if user_id in storage.user_program:
+            for position, key in enumerate(storage.user_program, 1):
+                if key == user_id:
+                    return position
+    # Удалена вся последняя пачка: выгрузка повторится с начала, с повторами, но без пропусков
+    return 0
+
+
+def _format_rows(rows: Iterator[tuple], file_format: str) -> str:
+    buffer = io.StringIO()
+    if file_format == "csv":
+        csv.writer(buffer).writerows(rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n")
+    return buffer.getvalue()
+
+
+class ExportFile(InputFile):
+    """Файл, который сжимается и отправляется по частям прямо во время загрузки."""
+
+    def __init__(self, file_format: str, filename: str):
+        super().__init__(filename=filename)
+        self.file_format = file_format
+        self.rows = 0
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        compressor = zlib.compressobj(wbits=31)  # gzip
+        if self.file_format == "csv":
+            yield compressor.compress(_format_rows(iter([COLUMNS]), "csv").encode("utf-8"))
+        # Пользователи, удаленные по ходу выгрузки, пропускаются: user_rows проверяет каждый ID
+        user_ids = _user_ids()
+        while chunk_ids := list(itertools.islice(user_ids, EXPORT_CHUNK_USERS)):
+            rows = [row for user_id in chunk_ids for row in user_rows(user_id)]
+            self.rows += len(rows)
+            chunk = compressor.compress(_format_rows(iter(rows), self.file_format).encode("utf-8"))
+            if chunk:
+                yield chunk
+            # Отдаем управление другим апдейтам между пачками
+            await asyncio.sleep(0)
+        yield compressor.flush()
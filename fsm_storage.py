@@ -0,0 +1,118 @@
+# fsm_storage.py
+"""FSM-хранилище в памяти с ограничением по времени простоя и числу сессий.
+
+Брошенные мастера программ держали бы exercise_mapping, selected и selected_exercises в памяти
+бесконечно. Здесь сессии лежат в OrderedDict в порядке последнего обращения: давно не
+тронутые снимаются с начала словаря (простой дольше ttl), а при превышении max_sessions
+вытесняются самые старые. Размер каждой сессии оценивается при записи данных — по длине
+JSON, — так что /stats показывает число сессий и их объем без обхода всего хранилища.
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Tuple
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    __slots__ = ("state", "data", "size", "touched")
+
+    def __init__(self, now: float):
+        self.state: str | None = None
+        self.data: Dict[str, Any] = {}
+        self.size = 0
+        self.touched = now
+
+
+def _estimate(data: Mapping[str, Any]) -> int:
+    """Примерный объем данных сессии в байтах."""
+    return len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """Замена MemoryStorage: пустые сессии удаляются, простаивающие — истекают через ttl секунд."""
+
+    def __init__(self, ttl: float, max_sessions: int):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.expired = 0
+        self.evicted = 0
+        self._bytes = 0
+        self._sessions: "OrderedDict[StorageKey, _Session]" = OrderedDict()
+
+    def _drop(self, key: StorageKey):
+        self._bytes -= self._sessions.pop(key).size
+
+    def _sweep(self, now: float):
+        # Словарь упорядочен по последнему обращению: истекшие сессии всегда в начале
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if now - session.touched < self.ttl:
+                break
+            self._drop(key)
+            self.expired += 1
+            logger.debug(f"FSM session {key.chat_id}/{key.user_id} expired")
+
+    def _get(self, key: StorageKey, create: bool = False) -> _Session | None:
+        now = time.monotonic()
+        self._sweep(now)
+        session = self._sessions.get(key)
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[key] = _Session(now)
+            if len(self._sessions) > self.max_sessions:
+                oldest = next(iter(self._sessions))
+                self._drop(oldest)
+                self.evicted += 1
+                logger.info(f"FSM session {oldest.chat_id}/{oldest.user_id} evicted: more than {self.max_sessions} sessions")
+        else:
+            session.touched = now
+            self._sessions.move_to_end(key)
+        return session
+
+    def _release_if_empty(self, key: StorageKey, session: _Session):
+        # state.clear() оставляет пустую запись — в памяти она не нужна
+        if session.state is None and not session.data:
+            self._drop(key)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        session = self._get(key, create=state is not None)
+        if session is not None:
+            session.state = state
+            self._release_if_empty(key, session)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        session = self._get(key)
+        return session.state if session else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        session = self._get(key, create=bool(data))
+        if session is None:
+            return
+        session.data = data.copy()
+        size = _estimate(data) if data else 0
+        self._bytes += size - session.size
+        session.size = size
+        self._release_if_empty(key, session)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        session = self._get(key)
+        return session.data.copy() if session else {}
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Tuple[int, int]:
+        """Число живых сессий и их примерный объем в байтах."""
+        self._sweep(time.monotonic())
+        return len(self._sessions), self._bytes
@@ -0,0 +1,42 @@
+from aiogram import Dispatcher, types, F
+from aiogram.fsm.context import FSMContext
+import settings.markups as nav
+from programs import PROGRAMS, generate_days, save_program, expected_counts
+from program_view import display_program
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def auto_program(callback: types.CallbackQuery, state: FSMContext):
+    # auto_<key> или auto_<key>_<попытка> для кнопки "Другой вариант"
+    parts = callback.data.split("_")
+    spec = PROGRAMS.get(parts[1])
+    attempt = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 0
+    if not spec:
+        logger.error(f"Unknown program key in callback_data: {callback.data}")
+        await callback.answer("❌ Неизвестный тип программы")
+        return
+
+    user_id = str(callback.from_user.id)
+    data = await state.get_data()
+    days = generate_days(spec, seed=f"{user_id}:{spec.key}:{attempt}")
+
+    if [len(day) for day in days] != expected_counts(spec):
+        logger.error(f"Generated incomplete {spec.program_type} program for user {user_id}: {days}")
+        await callback.answer("❗ Не удалось собрать программу, попробуйте через /programma", show_alert=True)
+        return
+
+    save_program(user_id, spec, days, data.get("days", spec.days))
+    await state.clear()
+    logger.info(f"Auto-generated {spec.program_type} program for user {user_id}, attempt {attempt}")
+
+    await callback.message.edit_text(
+        f"⚡ <b>Программа «{spec.title}» собрана автоматически!</b>\n"
+        "Можно заменить любое упражнение или собрать другой вариант.",
+        reply_markup=nav.get_auto_program_keyboard(spec.key, attempt)
+    )
+    await display_program(callback.message, user_id, callback.from_user.first_name or "User")
+    await callback.answer()
+
+def register_auto_handlers(dp: Dispatcher):
+    dp.callback_query.register(auto_program, F.data.startswith("auto_"))
@@ -0,0 +1,169 @@
+from aiogram import Dispatcher, types, F
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import StatesGroup, State
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from functools import lru_cache
+from catalog import get_catalog
+from programs import PROGRAMS, ProgramSpec, save_program
+from program_view import display_program
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHECK = "✅ "
+
+class CompactStates(StatesGroup):
+    choosing_day = State()
+
+# Выбор хранится прямо в клавиатуре сообщения (отметки ✅), поэтому нажатия
+# не пишут в FSM: состояние обновляется один раз на день, по кнопке "Готово".
+
+@lru_cache(maxsize=256)
+def day_layout(key: str, day: int, version: str | None = None) -> tuple:
+    """(номер подгруппы, подгруппа, сколько выбрать, упражнения, строка заголовка в клавиатуре)."""
+    spec = PROGRAMS[key]
+    catalog = get_catalog(version)
+    layout = []
+    row = 0
+    for sub_idx, (group, subgroup, count) in enumerate(spec.flat_sequences[day]):
+        exercises = catalog.get_exercises(group, subgroup)
+        layout.append((sub_idx, subgroup, count, exercises, row))
+        row += 1 + len(exercises)
+    return tuple(layout)
+
+def header_button(key: str, day: int, sub_idx: int, subgroup: str, count: int, selected: int) -> InlineKeyboardButton:
+    mark = "✔️" if selected == count else "▫️"
+    return InlineKeyboardButton(
+        text=f"{mark} {subgroup} — {selected}/{count}",
+        callback_data=f"cmp_h_{key}_{day}_{sub_idx}"
+    )
+
+def exercise_button(key: str, day: int, sub_idx: int, ex_idx: int, exercise: str, selected: bool) -> InlineKeyboardButton:
+    return InlineKeyboardButton(
+        text=f"{CHECK}{exercise}" if selected else exercise,
+        callback_data=f"cmp_t_{key}_{day}_{sub_idx}_{ex_idx}"
+    )
+
+def get_day_keyboard(key: str, day: int, version: str | None = None) -> InlineKeyboardMarkup:
+    rows = []
+    for sub_idx, subgroup, count, exercises, _ in day_layout(key, day, version):
+        rows.append([header_button(key, day, sub_idx, subgroup, count, 0)])
+        for ex_idx, exercise in enumerate(exercises):
+            rows.append([exercise_button(key, day, sub_idx, ex_idx, exercise, False)])
+    rows.append([InlineKeyboardButton(text="✅ Готово", callback_data="cmp_done")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def selected_in(rows: list, header_row: int, exercises: tuple) -> list:
+    return [
+        ex_idx for ex_idx in range(len(exercises))
+        if rows[header_row + 1 + ex_idx][0].text.startswith(CHECK)
+    ]
+
+def day_text(spec: ProgramSpec, day: int) -> str:
+    title = f"📋 <b>{spec.title}: день {day + 1}/{len(spec.flat_sequences)}</b>\n" if len(spec.flat_sequences) > 1 else f"📋 <b>{spec.title}</b>\n"
+    return title + "Отметьте упражнения для каждой группы и нажмите «Готово»."
+
+async def start_compact(callback: types.CallbackQuery, state: FSMContext):
+    key = callback.data.split("_", 2)[2]
+    spec = PROGRAMS.get(key)
+    if not spec:
+        await callback.answer("❌ Неизвестный тип программы")
+        return
+
+    data = await state.get_data()
+    version = get_catalog().version
+    await state.set_state(CompactStates.choosing_day)
+    await state.set_data({
+        "key": key,
+        "catalog_version": version,
+        "day": 0,
+        "days_selected": [],
+        "days_per_week": data.get("days", spec.days)
+    })
+    await callback.message.edit_text(day_text(spec, 0), reply_markup=get_day_keyboard(key, 0, version))
+    await callback.answer()
+
+async def toggle_exercise(callback: types.CallbackQuery, state: FSMContext):
+    _, _, key, day, sub_idx, ex_idx = callback.data.split("_")
+    day, sub_idx, ex_idx = int(day), int(sub_idx), int(ex_idx)
+    # Только чтение FSM: номера упражнений в клавиатуре относятся к версии справочника на старте
+    data = await state.get_data()
+    layout = day_layout(key, day, data.get("catalog_version"))
+    _, subgroup, count, exercises, header_row = layout[sub_idx]
+
+    rows = list(callback.message.reply_markup.inline_keyboard)
+    last_sub = layout[-1]
+    if len(rows) != last_sub[4] + len(last_sub[3]) + 2:
+        await callback.answer("❗ Сессия устарела. Начните заново с /programma", show_alert=True)
+        return
+    selected = selected_in(rows, header_row, exercises)
+
+    if ex_idx in selected:
+        changed = {ex_idx: False}
+    elif count == 1:
+        # Для групп на одно упражнение работает как переключатель
+        changed = {idx: False for idx in selected}
+        changed[ex_idx] = True
+    elif len(selected) < count:
+        changed = {ex_idx: True}
+    else:
+        await callback.answer(f"❗ Для {subgroup} уже выбрано {count}. Снимите отметку с другого упражнения.")
+        return
+
+    # Пересобираем только строки этой подгруппы, остальные переиспользуются как есть
+    for idx, is_selected in changed.items():
+        rows[header_row + 1 + idx] = [exercise_button(key, day, sub_idx, idx, exercises[idx], is_selected)]
+    total = len(selected) + sum(1 if is_selected else -1 for is_selected in changed.values())
+    rows[header_row] = [header_button(key, day, sub_idx, subgroup, count, total)]
+
+    await callback.message.edit_reply_markup(reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
+    await callback.answer()
+
+async def header_pressed(callback: types.CallbackQuery):
+    await callback.answer("Отметьте упражнения под заголовком группы")
+
+async def day_done(callback: types.CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    key = data.get("key")
+    day = data.get("day", 0)
+    spec = PROGRAMS.get(key)
+    if not spec:
+        await callback.answer("❗ Сессия устарела. Начните заново с /programma", show_alert=True)
+        return
+
+    rows = callback.message.reply_markup.inline_keyboard
+    lines = []
+    missing = []
+    for sub_idx, subgroup, count, exercises, header_row in day_layout(key, day, data.get("catalog_version")):
+        selected = selected_in(rows, header_row, exercises)
+        if len(selected) != count:
+            missing.append(f"{subgroup} ({len(selected)}/{count})")
+        lines.extend(f"{subgroup}: {exercises[idx]}" for idx in selected)
+
+    if missing:
+        # Текст алерта ограничен 200 символами
+        more = f" и еще {len(missing) - 4}" if len(missing) > 4 else ""
+        await callback.answer("❗ Не хватает упражнений: " + ", ".join(missing[:4]) + more, show_alert=True)
+        return
+
+    days_selected = data.get("days_selected", []) + [lines]
+    user_id = str(callback.from_user.id)
+    logger.info(f"User {user_id} completed day {day + 1} of {spec.program_type} in compact mode")
+
+    if day + 1 < len(spec.flat_sequences):
+        await state.update_data({"day": day + 1, "days_selected": days_selected})
+        await callback.message.edit_text(day_text(spec, day + 1), reply_markup=get_day_keyboard(key, day + 1, data.get("catalog_version")))
+        await callback.answer()
+        return
+
+    save_program(user_id, spec, days_selected, data.get("days_per_week", spec.days))
+    await state.clear()
+    await callback.message.edit_text(f"✅ <b>Программа «{spec.title}» сохранена!</b>")
+    await display_program(callback.message, user_id, callback.from_user.first_name or "User")
+    await callback.answer()
+
+def register_compact_handlers(dp: Dispatcher):
+    dp.callback_query.register(start_compact, F.data.startswith("cmp_start_"))
+    dp.callback_query.register(toggle_exercise, CompactStates.choosing_day, F.data.startswith("cmp_t_"))
+    dp.callback_query.register(header_pressed, F.data.startswith("cmp_h_"))
+    dp.callback_query.register(day_done, CompactStates.choosing_day, F.data == "cmp_done")
@@ -0,0 +1,124 @@
+from aiogram import Dispatcher, types, F
+from aiogram.types import InlineKeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from catalog import get_catalog
+from programs import spec_for, program_days
+from program_view import format_day
+from storage import get_program, replace_exercise
+import logging
+
+logger = logging.getLogger(__name__)
+
+CANCEL_BUTTON = InlineKeyboardButton(text="❌ Отмена", callback_data="edit_cancel")
+
+def load_days(user_id: str):
+    entry = get_program(user_id)
+    spec = spec_for(entry) if entry else None
+    if not spec:
+        return None, None, None
+    return entry, spec, program_days(spec, entry["program"])
+
+def day_keyboard(days: list, day_idx: int) -> InlineKeyboardBuilder:
+    """Упражнения одного дня; сверху — переключатель дней, если их несколько."""
+    builder = InlineKeyboardBuilder()
+    if len(days) > 1:
+        builder.row(*[
+            InlineKeyboardButton(text=f"• Д{idx + 1} •" if idx == day_idx else f"Д{idx + 1}", callback_data=f"edit_day_{idx}")
+            for idx in range(len(days))
+        ])
+    for pos, line in enumerate(days[day_idx]):
+        builder.row(InlineKeyboardButton(text=line, callback_data=f"edit_ex_{day_idx}_{pos}"))
+    builder.row(CANCEL_BUTTON)
+    return builder
+
+async def edit_program(callback: types.CallbackQuery):
+    user_id = str(callback.from_user.id)
+    entry, spec, days = load_days(user_id)
+    if not spec:
+        await callback.answer("❗ Программа не найдена. Создайте ее через /programma", show_alert=True)
+        return
+
+    day_idx = int(callback.data.rsplit("_", 1)[1]) if callback.data.startswith("edit_day_") else 0
+    if day_idx >= len(days):
+        await callback.answer("❗ Программа изменилась, откройте ее заново: /programma", show_alert=True)
+        return
+    title = f"✏️ <b>Какое упражнение заменить?</b>\nДень {day_idx + 1}" if len(days) > 1 else "✏️ <b>Какое упражнение заменить?</b>"
+    await callback.message.edit_text(title, reply_markup=day_keyboard(days, day_idx).as_markup())
+    await callback.answer()
+
+async def edit_exercise_chosen(callback: types.CallbackQuery):
+    user_id = str(callback.from_user.id)
+    day_idx, pos = map(int, callback.data.split("_")[2:4])
+    entry, spec, days = load_days(user_id)
+    if not spec or day_idx >= len(days) or pos >= len(days[day_idx]):
+        await callback.answer("❗ Программа изменилась, откройте ее заново: /programma", show_alert=True)
+        return
+
+    subgroup, current = days[day_idx][pos].split(": ", 1)
+    catalog = get_catalog()
+    group = catalog.subgroup_to_group.get(subgroup)
+    taken = {line.split(": ", 1)[-1] for line in days[day_idx]}
+
+    builder = InlineKeyboardBuilder()
+    # В callback_data — постоянный ID упражнения: кнопка останется верной и после перезагрузки справочника
+    for exercise, exercise_id in zip(catalog.get_exercises(group, subgroup), catalog.exercise_ids.get(subgroup, ())):
+        if exercise not in taken:
+            builder.add(InlineKeyboardButton(text=exercise, callback_data=f"edit_set_{day_idx}_{pos}_{exercise_id}"))
+    builder.add(CANCEL_BUTTON)
+    builder.adjust(1)
+
+    await callback.message.edit_text(
+        f"✏️ <b>Замена для {subgroup}</b>\nСейчас: {current}",
+        reply_markup=builder.as_markup()
+    )
+    await callback.answer()
+
+async def edit_exercise_set(callback: types.CallbackQuery):
+    user_id = str(callback.from_user.id)
+    day_idx, pos, exercise_id = map(int, callback.data.split("_")[2:5])
+    entry, spec, days = load_days(user_id)
+    if not spec or day_idx >= len(days) or pos >= len(days[day_idx]):
+        await callback.answer("❗ Программа изменилась, откройте ее заново: /programma", show_alert=True)
+        return
+
+    subgroup, current = days[day_idx][pos].split(": ", 1)
+    found = get_catalog().exercise_by_id.get(exercise_id)
+    if not found or found[1] != subgroup:
+        await callback.answer("❌ Упражнение не найдено!")
+        return
+    exercise = found[2]
+
+    # Меняется одна позиция в ID; текст программы у других пользователей с той же программой
+    # не трогаем: у измененной программы другой хэш, и ее текст соберется при показе
+    if not replace_exercise(user_id, day_idx, pos, exercise_id):
+        await callback.answer("❗ Программа изменилась, откройте ее заново: /programma", show_alert=True)
+        return
+    days[day_idx][pos] = f"{subgroup}: {exercise}"
+    logger.info(f"User {user_id} replaced {current} with {exercise} (day {day_idx + 1})")
+
+    day_title = f"\n📅 <b>День {day_idx + 1}</b>" if len(days) > 1 else ""
+    day_text = await format_day(day_idx + 1, "", days[day_idx], entry.get("sets_reps", ""), is_multi_day=False)
+    builder = InlineKeyboardBuilder()
+    # Дни при замене идут в том же порядке, что и страницы просмотра программы
+    builder.row(
+        InlineKeyboardButton(text="✏️ Заменить еще", callback_data=f"edit_day_{day_idx}"),
+        InlineKeyboardButton(text="📋 К программе", callback_data=f"page_{day_idx}")
+    )
+    await callback.message.edit_text(
+        f"✅ <b>{subgroup}:</b> {current} → {exercise}\n{day_title}\n{day_text}",
+        reply_markup=builder.as_markup()
+    )
+    await callback.answer()
+
+async def edit_cancel(callback: types.CallbackQuery):
+    await callback.message.edit_text(
+        "Замена отменена.\n/programma - просмотреть программу"
+    )
+    await callback.answer()
+
+def register_edit_handlers(dp: Dispatcher):
+    dp.callback_query.register(edit_program, F.data == "edit_program")
+    dp.callback_query.register(edit_program, F.data.startswith("edit_day_"))
+    dp.callback_query.register(edit_exercise_chosen, F.data.startswith("edit_ex_"))
+    dp.callback_query.register(edit_exercise_set, F.data.startswith("edit_set_"))
+    dp.callback_query.register(edit_cancel, F.data == "edit_cancel")
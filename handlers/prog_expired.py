@@ -0,0 +1,28 @@
+from aiogram import Dispatcher, types, F
+from aiogram.filters import StateFilter
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from wizard_undo import BACK_DATA
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Кнопки мастеров, которые имеют смысл только внутри живой FSM-сессии
+WIZARD_BUTTONS = F.data.startswith("ex_") | F.data.startswith("custom_ex_") | F.data.startswith("days_") | F.data.startswith("cmp_t_") | F.data.in_({
+    BACK_DATA, "cancel_custom_exercise", "back_to_days", "cmp_done"
+})
+
+async def session_expired(callback: types.CallbackQuery):
+    # Сессия истекла по простою, вытеснена при переполнении или потеряна при перезапуске бота
+    logger.info(f"User {callback.from_user.id} pressed {callback.data} without a wizard session")
+    await callback.message.edit_text(
+        "⌛ <b>Этот выбор устарел</b>\n"
+        "Создание программы давно не продолжалось, и мы его закрыли. Начните заново — это займет пару минут.",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="🏋️ Новая программа", callback_data="start_programma")]
+        ])
+    )
+    await callback.answer()
+
+def register_expired_handlers(dp: Dispatcher):
+    # Регистрируется последним: срабатывает, только если ни один мастер не принял кнопку
+    dp.callback_query.register(session_expired, StateFilter(None), WIZARD_BUTTONS)
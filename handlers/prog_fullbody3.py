@@ -4,12 +4,13 @@ from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from settings.config import full_body_program
-from storage import user_program
-from storage import save_user_program
+from catalog import get_catalog
+from suggest import canonical_exercise, offer_suggestions
+from wizard_panel import add_selection, show_program, with_panel
+from wizard_undo import BACK_DATA, back_button, push_undo, undo_step
+from storage import user_program, set_program, popular_first
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 SETS_REPS = "2 подхода по 4-8 повторений (Выполнять в 0-2 повторений в запасе)"
@@ -39,15 +40,16 @@ muscle_sequence = [
     ("Ноги", "Ягодицы", 1),
 ]
 
-def get_exercise_keyboard(muscle_group: str, subgroup: str, selected_exercises: list) -> InlineKeyboardMarkup:
+def get_exercise_keyboard(muscle_group: str, subgroup: str, selected_exercises: list, catalog_version: str | None = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
-    exercises = full_body_program.get(muscle_group, {}).get(subgroup, [])
+    catalog = get_catalog(catalog_version)
+    exercises = catalog.get_exercises(muscle_group, subgroup)
     logger.debug(f"Exercises for {muscle_group}/{subgroup}: {exercises}")
     
-    for idx, exercise in enumerate(exercises):
+    for idx, exercise in popular_first(catalog.exercise_ids[subgroup], exercises):
         if exercise not in selected_exercises:
-            callback_data = f"ex_{muscle_group}_{subgroup}_{idx}"
+            callback_data = f"ex_{catalog.exercise_ids[subgroup][idx]}"
             builder.add(InlineKeyboardButton(
                 text=exercise,
                 callback_data=callback_data
@@ -55,9 +57,11 @@ def get_exercise_keyboard(muscle_group: str, subgroup: str, selected_exercises:
     
     builder.add(InlineKeyboardButton(
         text="✍️ Вписать свое упражнение",
-        callback_data=f"custom_ex_{muscle_group}_{subgroup}"
+        callback_data=f"custom_ex_{catalog.tokens[subgroup]}"
     ))
     
+    builder.add(back_button())
+
     builder.adjust(1)
     return builder.as_markup()
 
@@ -74,8 +78,10 @@ async def start_fullbody3(callback: types.CallbackQuery, state: FSMContext):
         "selected": [],
         "exercise_mapping": {},
         "selected_exercises": [],
+        "panel": "",
         "days_per_week": days,
-        "user_id": user_id
+        "user_id": user_id,
+        "catalog_version": get_catalog().version
     })
     logger.info(f"Starting FullBody 3.0 for user {user_id} with {days} days")
     await send_next_muscle(callback, state)
@@ -105,36 +111,33 @@ async def send_next_muscle(message: types.CallbackQuery | types.Message, state:
             await state.clear()
             return
 
-        user_program[user_id] = {
+        set_program(user_id, {
             "days": days,
             "program": selected,
             "type": "FullBody 3.0",
             "sets_reps": SETS_REPS
-        }
-        save_user_program()
+        })
 
         logger.info(f"Saved program for user {user_id}: {user_program[user_id]}")
 
-        if isinstance(message, types.CallbackQuery):
-            await message.message.edit_text("/programma - просмотреть программу")
-        else:
-            await message.answer("/programma - просмотреть программу")
+        await show_program(message, user_id)
         await state.clear()
         logger.info(f"Program completed for user {user_id}")
         return
 
     muscle_group, subgroup, required_count = flat_sequence[step]
-    exercises = full_body_program.get(muscle_group, {}).get(subgroup, [])
+    catalog = get_catalog(data.get("catalog_version"))
+    exercises = catalog.get_exercises(muscle_group, subgroup)
 
     if not exercises:
-        logger.warning(f"No exercises found for {muscle_group}/{subgroup} in full_body_program")
+        logger.warning(f"No exercises found for {muscle_group}/{subgroup} in catalog {catalog.version}")
         await state.update_data({"current_step": step + 1})
         await send_next_muscle(message, state)
         return
 
     exercise_mapping = {}
     for idx, exercise in enumerate(exercises):
-        callback_data = f"ex_{muscle_group}_{subgroup}_{idx}"
+        callback_data = f"ex_{catalog.exercise_ids[subgroup][idx]}"
         exercise_mapping[callback_data] = {
             "muscle_group": muscle_group,
             "subgroup": subgroup,
@@ -156,7 +159,8 @@ async def send_next_muscle(message: types.CallbackQuery | types.Message, state:
         f"💪 <b>Выберите {required_count} упражнение для {subgroup}</b>\n"
         f"📋 Доступные варианты:"
     )
-    keyboard = get_exercise_keyboard(muscle_group, subgroup, data.get("selected_exercises", []))
+    text = with_panel(data.get("panel", ""), text)
+    keyboard = get_exercise_keyboard(muscle_group, subgroup, data.get("selected_exercises", []), catalog_version=data.get("catalog_version"))
 
     if isinstance(message, types.CallbackQuery):
         await message.message.edit_text(text, reply_markup=keyboard)
@@ -191,15 +195,21 @@ async def exercise_selected(callback: types.CallbackQuery, state: FSMContext):
     
     logger.debug(f"User {callback.from_user.id} selected exercise: {exercise} for {muscle_group}/{subgroup}, callback_data: {callback.data}")
     
+    panel = data.get("panel", "")
+    
     if exercise not in selected_for_muscle:
+        undo = push_undo(data)
         selected_for_muscle.append(exercise)
         selected_total.append(f"{subgroup}: {exercise}")
         selected_exercises.append(exercise)
+        panel = add_selection(panel, subgroup, exercise)
         
         await state.update_data({
             "selected_for_muscle": selected_for_muscle,
             "selected": selected_total,
-            "selected_exercises": selected_exercises
+            "selected_exercises": selected_exercises,
+            "panel": panel,
+            "undo": undo
         })
     
     logger.info(f"Updated selected exercises for user {callback.from_user.id}: {selected_total}")
@@ -210,11 +220,12 @@ async def exercise_selected(callback: types.CallbackQuery, state: FSMContext):
         await send_next_muscle(callback, state)
     else:
         await callback.message.edit_text(
-            f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup}</b>",
+            with_panel(panel, f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup}</b>"),
             reply_markup=get_exercise_keyboard(
                 muscle_group, 
                 subgroup, 
-                selected_exercises
+                selected_exercises,
+                catalog_version=data.get("catalog_version")
             )
         )
     
@@ -231,7 +242,7 @@ async def custom_exercise_button_pressed(callback: types.CallbackQuery, state: F
         await callback.answer("❗ Вы уже выбрали максимум упражнений для этой группы!")
         return
 
-    message = await callback.message.edit_text(
+    await callback.message.edit_text(
         f"✍️ <b>Введите свое упражнение для {subgroup}</b>\n"
         "Напишите название (например, 'Жим ногами в тренажере'):",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=[
@@ -239,7 +250,7 @@ async def custom_exercise_button_pressed(callback: types.CallbackQuery, state: F
         ])
     )
 
-    await state.update_data({"request_message_id": message.message_id})
+    await state.update_data({"request_message_id": callback.message.message_id})
     await state.set_state(FullBody3States.entering_custom_exercise)
     await callback.answer()
 
@@ -257,21 +268,34 @@ async def process_custom_exercise(message: types.Message, state: FSMContext):
         )
         return
 
+    # Известное написание сохраняется по ID справочника; на похожее сначала предлагаем подсказки
+    known = canonical_exercise(subgroup, custom_exercise)
+    if known:
+        custom_exercise = known
+    elif await offer_suggestions(message, state, data, subgroup, custom_exercise):
+        return
+
     selected_for_muscle = data.get("selected_for_muscle", [])
     selected_total = data.get("selected", [])
     selected_exercises = data.get("selected_exercises", [])
 
     logger.debug(f"User {message.from_user.id} added custom exercise: {custom_exercise} for {muscle_group}/{subgroup}")
 
+    panel = data.get("panel", "")
+
     if custom_exercise not in selected_for_muscle:
+        undo = push_undo(data)
         selected_for_muscle.append(custom_exercise)
         selected_total.append(f"{subgroup}: {custom_exercise}")
         selected_exercises.append(custom_exercise)
+        panel = add_selection(panel, subgroup, custom_exercise)
 
         await state.update_data({
             "selected_for_muscle": selected_for_muscle,
             "selected": selected_total,
-            "selected_exercises": selected_exercises
+            "selected_exercises": selected_exercises,
+            "panel": panel,
+            "undo": undo
         })
 
     logger.info(f"Updated selected exercises for user {message.from_user.id}: {selected_total}")
@@ -293,14 +317,20 @@ async def process_custom_exercise(message: types.Message, state: FSMContext):
     else:
         await state.set_state(FullBody3States.choosing_muscle_group)
         await message.answer(
-            f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup}</b>",
+            with_panel(panel, f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup}</b>"),
             reply_markup=get_exercise_keyboard(
                 muscle_group,
                 subgroup,
-                selected_exercises
+                selected_exercises,
+                catalog_version=data.get("catalog_version")
             )
         )
 
+async def suggestion_selected(callback: types.CallbackQuery, state: FSMContext):
+    # Кнопка из "Вы имели в виду…?" работает так же, как выбор упражнения в списке
+    await state.set_state(FullBody3States.choosing_muscle_group)
+    await exercise_selected(callback, state)
+
 async def cancel_custom_exercise(callback: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
     muscle_group = data.get("current_muscle")
@@ -309,15 +339,19 @@ async def cancel_custom_exercise(callback: types.CallbackQuery, state: FSMContex
 
     await state.set_state(FullBody3States.choosing_muscle_group)
     await callback.message.edit_text(
-        f"💪 <b>Выберите {data.get('required_count')} упражнение для {subgroup}</b>",
+        with_panel(data.get("panel", ""), f"💪 <b>Выберите {data.get('required_count')} упражнение для {subgroup}</b>"),
         reply_markup=get_exercise_keyboard(
             muscle_group,
             subgroup,
-            selected_exercises
+            selected_exercises,
+            catalog_version=data.get("catalog_version")
         )
     )
     await callback.answer()
 
+async def step_back(callback: types.CallbackQuery, state: FSMContext):
+    await undo_step(callback, state, send_next_muscle)
+
 def register_fullbody3_handlers(dp: Dispatcher):
     dp.callback_query.register(start_fullbody3, F.data == "prog_fullbody3")
     dp.callback_query.register(
@@ -330,10 +364,20 @@ def register_fullbody3_handlers(dp: Dispatcher):
         FullBody3States.choosing_muscle_group,
         F.data.startswith("custom_ex_")
     )
+    dp.callback_query.register(
+        step_back,
+        FullBody3States.choosing_muscle_group,
+        F.data == BACK_DATA
+    )
     dp.message.register(
         process_custom_exercise,
         FullBody3States.entering_custom_exercise
     )
+    dp.callback_query.register(
+        suggestion_selected,
+        FullBody3States.entering_custom_exercise,
+        F.data.startswith("ex_")
+    )
     dp.callback_query.register(
         cancel_custom_exercise,
         FullBody3States.entering_custom_exercise,
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from aiogram import Dispatcher, types, F
+from aiogram.filters import Command
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from program_view import display_program
+from storage import history_versions, is_current_version, restore_version
+import logging
+
+logger = logging.getLogger(__name__)
+
+def version_line(number: int, version: dict, current: bool) -> str:
+    when = datetime.fromtimestamp(version["t"]).strftime("%d.%m.%Y %H:%M")
+    exercises = sum(len(version["days"][day]) for day in set(version["order"]))
+    mark = " — <b>текущая</b>" if current else ""
+    return f"{number}. {when} — {version['type']}, {exercises} упр.{mark}"
+
+async def history_cmd(message: types.Message):
+    user_id = str(message.from_user.id)
+    versions = history_versions(user_id)
+    if not versions:
+        await message.answer("📜 История пуста: сохраненных программ пока нет.\nСоздайте программу с помощью /programma")
+        return
+
+    lines = []
+    buttons = []
+    current_found = False
+    # Сначала новые версии
+    for idx in range(len(versions) - 1, -1, -1):
+        version = versions[idx]
+        # Текущей считаем только самую новую из совпадающих версий
+        current = not current_found and is_current_version(user_id, version)
+        current_found = current_found or current
+        lines.append(version_line(idx + 1, version, current))
+        if not current:
+            buttons.append([InlineKeyboardButton(
+                text=f"↩️ Вернуть версию {idx + 1}",
+                callback_data=f"hist_{idx}_{version['t']}"
+            )])
+
+    await message.answer(
+        "📜 <b>История программ</b>\n" + "\n".join(lines),
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons) if buttons else None
+    )
+
+async def restore_selected(callback: types.CallbackQuery):
+    user_id = str(callback.from_user.id)
+    _, idx, saved_at = callback.data.split("_")
+    versions = history_versions(user_id)
+    idx = int(idx)
+    # Пока список был на экране, старые версии могли вытесниться новыми
+    if idx >= len(versions) or str(versions[idx]["t"]) != saved_at:
+        await callback.answer("❗ Эта версия уже недоступна, откройте /history заново", show_alert=True)
+        return
+
+    restore_version(user_id, versions[idx])
+    logger.info(f"User {user_id} restored program version {idx + 1} from {saved_at}")
+    await callback.message.edit_text(f"↩️ <b>Версия {idx + 1} восстановлена!</b>")
+    await display_program(callback.message, user_id, callback.from_user.first_name or "User")
+    await callback.answer()
+
+def register_history_handlers(dp: Dispatcher):
+    dp.message.register(history_cmd, Command("history"))
+    dp.callback_query.register(restore_selected, F.data.startswith("hist_"))
@@ -4,12 +4,13 @@ from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from settings.config import full_body_program
-from storage import user_program, save_user_program
+from catalog import get_catalog
+from suggest import canonical_exercise, offer_suggestions
+from wizard_panel import add_day, add_selection, show_program, with_panel
+from wizard_undo import BACK_DATA, back_button, push_undo, undo_step
+from storage import user_program, set_program, delete_program, popular_first
 import logging
-import re
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 SETS_REPS = "2 подхода по 4-8 повторений (Выполнять в 0-2 повторений в запасе)"
@@ -62,28 +63,15 @@ muscle_sequence_day3 = [
     ("Ноги", "Ягодицы", 1),
 ]
 
-# Транслитерация для callback_data
-TRANSLIT_MAP = {
-    'Спина': 'Spina', 'Широчайшие': 'Shirochayshie', 'Верх спины': 'Verh_spiny',
-    'Дельты': 'Delty', 'Передняя дельта': 'Perednyaya_delta', 'Средняя дельта': 'Srednyaya_delta',
-    'Задняя дельта': 'Zadnyaya_delta', 'Грудь': 'Grud', 'Верх груди': 'Verh_grudi',
-    'Низ груди': 'Niz_grudi', 'Руки': 'Ruki', 'Бицепс': 'Bitseps', 'Трицепс': 'Tritseps',
-    'Ноги': 'Nogi', 'Ягодицы': 'Yagoditsy', 'Квадрицепсы': 'Kvadricep',
-    'Бицепс бедра': 'Bitseps_bedra', 'Hinge': 'Hinge',
-    'Приводящие': 'Privodyashchie', 'Икры': 'Ikry'
-}
-
-def translit(text: str) -> str:
-    return TRANSLIT_MAP.get(text, re.sub(r'[^\w]', '_', text))
-
-def get_exercise_keyboard(muscle_group: str, subgroup: str, selected_exercises: list, day: int) -> InlineKeyboardMarkup:
+def get_exercise_keyboard(muscle_group: str, subgroup: str, selected_exercises: list, day: int, catalog_version: str | None = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    exercises = full_body_program.get(muscle_group, {}).get(subgroup, [])
+    catalog = get_catalog(catalog_version)
+    exercises = catalog.get_exercises(muscle_group, subgroup)
     logger.debug(f"Exercises for {muscle_group}/{subgroup} (Day {day}): {exercises}")
     
-    for idx, exercise in enumerate(exercises):
+    for idx, exercise in popular_first(catalog.exercise_ids[subgroup], exercises):
         if exercise not in selected_exercises:
-            callback_data = f"ex_{translit(muscle_group)}_{translit(subgroup)}_{idx}_day{day}"
+            callback_data = f"ex_{catalog.exercise_ids[subgroup][idx]}_day{day}"
             builder.add(InlineKeyboardButton(
                 text=exercise,
                 callback_data=callback_data
@@ -91,9 +79,11 @@ def get_exercise_keyboard(muscle_group: str, subgroup: str, selected_exercises:
     
     builder.add(InlineKeyboardButton(
         text="✍️ Вписать свое упражнение",
-        callback_data=f"custom_ex_{translit(muscle_group)}_{translit(subgroup)}_day{day}"
+        callback_data=f"custom_ex_{catalog.tokens[subgroup]}_day{day}"
     ))
     
+    builder.add(back_button())
+
     builder.adjust(1)
     return builder.as_markup()
 
@@ -110,8 +100,10 @@ async def start_hybrid3(callback: types.CallbackQuery, state: FSMContext):
         "selected": [],
         "exercise_mapping": {},
         "selected_exercises": [],
+        "panel": add_day("", 1),
         "days_per_week": days,
         "user_id": user_id,
+        "catalog_version": get_catalog().version,
         "program": []
     })
     logger.info(f"Starting Hybrid 3.0 for user {user_id} with {days} days")
@@ -150,6 +142,7 @@ async def send_next_muscle(message: types.CallbackQuery | types.Message, state:
         if current_day < 3:
             await state.update_data({
                 "current_day": current_day + 1,
+                "panel": add_day(data.get("panel", ""), current_day + 1),
                 "current_step": 0,
                 "selected": [],
                 "exercise_mapping": {},
@@ -160,36 +153,33 @@ async def send_next_muscle(message: types.CallbackQuery | types.Message, state:
             await send_next_muscle(message, state)
             return
 
-        user_program[user_id] = {
+        set_program(user_id, {
             "days": data.get("days_per_week", 3),
             "program": program,
             "type": "Hybrid 3.0",
             "sets_reps": SETS_REPS
-        }
-        save_user_program()
+        })
 
         logger.info(f"Saved program for user {user_id}: {user_program[user_id]}")
 
-        if isinstance(message, types.CallbackQuery):
-            await message.message.edit_text("/programma - просмотреть программу")
-        else:
-            await message.answer("/programma - просмотреть программу")
+        await show_program(message, user_id)
         await state.clear()
         logger.info(f"Program completed for user {user_id}")
         return
 
     muscle_group, subgroup, required_count = flat_sequence[step]
-    exercises = full_body_program.get(muscle_group, {}).get(subgroup, [])
+    catalog = get_catalog(data.get("catalog_version"))
+    exercises = catalog.get_exercises(muscle_group, subgroup)
 
     if not exercises:
-        logger.warning(f"No exercises found for {muscle_group}/{subgroup} (Day {current_day}) in full_body_program")
+        logger.warning(f"No exercises found for {muscle_group}/{subgroup} (Day {current_day}) in catalog {catalog.version}")
         await state.update_data({"current_step": step + 1})
         await send_next_muscle(message, state)
         return
 
     exercise_mapping = {}
     for idx, exercise in enumerate(exercises):
-        callback_data = f"ex_{translit(muscle_group)}_{translit(subgroup)}_{idx}_day{current_day}"
+        callback_data = f"ex_{catalog.exercise_ids[subgroup][idx]}_day{current_day}"
         exercise_mapping[callback_data] = {
             "muscle_group": muscle_group,
             "subgroup": subgroup,
@@ -212,7 +202,8 @@ async def send_next_muscle(message: types.CallbackQuery | types.Message, state:
         f"💪 <b>Выберите {required_count} упражнение для {subgroup} (День {current_day})</b>\n"
         f"📋 Доступные варианты:"
     )
-    keyboard = get_exercise_keyboard(muscle_group, subgroup, data.get("selected_exercises", []), current_day)
+    text = with_panel(data.get("panel", ""), text)
+    keyboard = get_exercise_keyboard(muscle_group, subgroup, data.get("selected_exercises", []), current_day, catalog_version=data.get("catalog_version"))
 
     if isinstance(message, types.CallbackQuery):
         await message.message.edit_text(text, reply_markup=keyboard)
@@ -248,15 +239,21 @@ async def exercise_selected(callback: types.CallbackQuery, state: FSMContext):
     
     logger.debug(f"User {callback.from_user.id} selected exercise: {exercise} for {muscle_group}/{subgroup} (Day {current_day}), callback_data: {callback.data}")
     
+    panel = data.get("panel", "")
+    
     if exercise not in selected_for_muscle:
+        undo = push_undo(data)
         selected_for_muscle.append(exercise)
         selected_total.append(f"{subgroup}: {exercise}")
         selected_exercises.append(exercise)
+        panel = add_selection(panel, subgroup, exercise)
         
         await state.update_data({
             "selected_for_muscle": selected_for_muscle,
             "selected": selected_total,
-            "selected_exercises": selected_exercises
+            "selected_exercises": selected_exercises,
+            "panel": panel,
+            "undo": undo
         })
     
     logger.info(f"Updated selected exercises for user {callback.from_user.id}: {selected_total}")
@@ -267,9 +264,9 @@ async def exercise_selected(callback: types.CallbackQuery, state: FSMContext):
         await send_next_muscle(callback, state)
     else:
         await callback.message.edit_text(
-            f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup} (День {current_day})</b>",
+            with_panel(panel, f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup} (День {current_day})</b>"),
             reply_markup=get_exercise_keyboard(
-                muscle_group, subgroup, selected_exercises, current_day
+                muscle_group, subgroup, selected_exercises, current_day, catalog_version=data.get("catalog_version")
             )
         )
     
@@ -287,7 +284,7 @@ async def custom_exercise_button_pressed(callback: types.CallbackQuery, state: F
         await callback.answer("❗ Вы уже выбрали максимум упражнений для этой группы!")
         return
 
-    message = await callback.message.edit_text(
+    await callback.message.edit_text(
         f"✍️ <b>Введите свое упражнение для {subgroup} (День {current_day})</b>\n"
         "Напишите название (например, 'Жим ногами в тренажере'):",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=[
@@ -295,7 +292,7 @@ async def custom_exercise_button_pressed(callback: types.CallbackQuery, state: F
         ])
     )
 
-    await state.update_data({"request_message_id": message.message_id})
+    await state.update_data({"request_message_id": callback.message.message_id})
     await state.set_state(HybridStates.entering_custom_exercise)
     await callback.answer()
 
@@ -314,21 +311,34 @@ async def process_custom_exercise(message: types.Message, state: FSMContext):
         )
         return
 
+    # Известное написание сохраняется по ID справочника; на похожее сначала предлагаем подсказки
+    known = canonical_exercise(subgroup, custom_exercise)
+    if known:
+        custom_exercise = known
+    elif await offer_suggestions(message, state, data, subgroup, custom_exercise):
+        return
+
     selected_for_muscle = data.get("selected_for_muscle", [])
     selected_total = data.get("selected", [])
     selected_exercises = data.get("selected_exercises", [])
 
     logger.debug(f"User {message.from_user.id} added custom exercise: {custom_exercise} for {muscle_group}/{subgroup} (Day {current_day})")
 
+    panel = data.get("panel", "")
+
     if custom_exercise not in selected_for_muscle:
+        undo = push_undo(data)
         selected_for_muscle.append(custom_exercise)
         selected_total.append(f"{subgroup}: {custom_exercise}")
         selected_exercises.append(custom_exercise)
+        panel = add_selection(panel, subgroup, custom_exercise)
 
         await state.update_data({
             "selected_for_muscle": selected_for_muscle,
             "selected": selected_total,
-            "selected_exercises": selected_exercises
+            "selected_exercises": selected_exercises,
+            "panel": panel,
+            "undo": undo
         })
 
     logger.info(f"Updated selected exercises for user {message.from_user.id}: {selected_total}")
@@ -350,12 +360,17 @@ async def process_custom_exercise(message: types.Message, state: FSMContext):
     else:
         await state.set_state(HybridStates.choosing_muscle_group)
         await message.answer(
-            f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup} (День {current_day})</b>",
+            with_panel(panel, f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup} (День {current_day})</b>"),
             reply_markup=get_exercise_keyboard(
-                muscle_group, subgroup, selected_exercises, current_day
+                muscle_group, subgroup, selected_exercises, current_day, catalog_version=data.get("catalog_version")
             )
         )
 
+async def suggestion_selected(callback: types.CallbackQuery, state: FSMContext):
+    # Кнопка из "Вы имели в виду…?" работает так же, как выбор упражнения в списке
+    await state.set_state(HybridStates.choosing_muscle_group)
+    await exercise_selected(callback, state)
+
 async def cancel_custom_exercise(callback: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
     muscle_group = data.get("current_muscle")
@@ -365,28 +380,29 @@ async def cancel_custom_exercise(callback: types.CallbackQuery, state: FSMContex
 
     await state.set_state(HybridStates.choosing_muscle_group)
     await callback.message.edit_text(
-        f"💪 <b>Выберите {data.get('required_count')} упражнение для {subgroup} (День {current_day})</b>",
+        with_panel(data.get("panel", ""), f"💪 <b>Выберите {data.get('required_count')} упражнение для {subgroup} (День {current_day})</b>"),
         reply_markup=get_exercise_keyboard(
-            muscle_group, subgroup, selected_exercises, current_day
+            muscle_group, subgroup, selected_exercises, current_day, catalog_version=data.get("catalog_version")
         )
     )
     await callback.answer()
 
 async def clear_program(callback: types.CallbackQuery, state: FSMContext):
     user_id = str(callback.from_user.id)
-    if user_id in user_program:
-        del user_program[user_id]
-        save_user_program()
+    if delete_program(user_id):
         logger.info(f"Program removed for user {user_id}")
     await state.clear()
     await callback.message.edit_text(
-        "🗑 <b>Программа удалена!</b>\nСоздайте новую с помощью /programma или /start",
+        "🗑 <b>Программа удалена!</b>\nСоздайте новую с помощью /programma или /start\nВернуть прошлую версию можно через /history",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="🏋️ Новая программа", callback_data="start_programma")]
         ])
     )
     await callback.answer()
 
+async def step_back(callback: types.CallbackQuery, state: FSMContext):
+    await undo_step(callback, state, send_next_muscle)
+
 def register_hybrid3_handlers(dp: Dispatcher):
     dp.callback_query.register(start_hybrid3, F.data == "prog_hybrid3")
     dp.callback_query.register(
@@ -399,10 +415,20 @@ def register_hybrid3_handlers(dp: Dispatcher):
         HybridStates.choosing_muscle_group,
         F.data.startswith("custom_ex_")
     )
+    dp.callback_query.register(
+        step_back,
+        HybridStates.choosing_muscle_group,
+        F.data == BACK_DATA
+    )
     dp.message.register(
         process_custom_exercise,
         HybridStates.entering_custom_exercise
     )
+    dp.callback_query.register(
+        suggestion_selected,
+        HybridStates.entering_custom_exercise,
+        F.data.startswith("ex_")
+    )
     dp.callback_query.register(
         cancel_custom_exercise,
         HybridStates.entering_custom_exercise,
@@ -0,0 +1,162 @@
+import re
+
+from aiogram import Dispatcher, types, F
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import StatesGroup, State
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from storage import get_program, decode_exercise
+import workout_log
+import logging
+
+logger = logging.getLogger(__name__)
+
+class LogStates(StatesGroup):
+    entering_set = State()
+
+# "3x8x60", "3 х 8 х 62,5 кг" или "8x60" для одного подхода
+SET_PATTERN = re.compile(r"^\s*(?:(\d{1,2})\s*[xх×*]\s*)?(\d{1,3})\s*[xх×*]\s*(\d{1,4}(?:[.,]\d)?)\s*(?:кг)?\s*$", re.IGNORECASE)
+
+CANCEL_BUTTON = InlineKeyboardButton(text="✅ Готово", callback_data="log_cancel")
+
+def program_days(user_id: str):
+    """Уникальные дни сохраненной программы в виде списков ID упражнений."""
+    entry = get_program(user_id, decode=False)
+    program = entry.get("program") if entry else None
+    if not isinstance(program, dict) or "layout" not in program:
+        return None
+    return program["days"]
+
+def format_set(entry: workout_log.LogEntry) -> str:
+    return f"{entry.sets}×{entry.reps}×{entry.weight:g} кг"
+
+def format_volume(volume: float) -> str:
+    return f"{volume:,.0f}".replace(",", " ")
+
+def day_keyboard(days: list) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for idx in range(len(days)):
+        builder.add(InlineKeyboardButton(text=f"📅 День {idx + 1}", callback_data=f"log_day_{idx}"))
+    builder.add(CANCEL_BUTTON)
+    builder.adjust(1)
+    return builder.as_markup()
+
+def exercise_keyboard(exercise_ids: list) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for exercise_id in exercise_ids:
+        builder.add(InlineKeyboardButton(text=decode_exercise(exercise_id), callback_data=f"log_ex_{exercise_id}"))
+    builder.add(CANCEL_BUTTON)
+    builder.adjust(1)
+    return builder.as_markup()
+
+def menu(days: list) -> tuple[str, InlineKeyboardMarkup]:
+    if len(days) > 1:
+        return "🏋️ <b>Какой день тренировки записать?</b>", day_keyboard(days)
+    return "🏋️ <b>Какое упражнение записать?</b>", exercise_keyboard(days[0])
+
+async def log_cmd(message: types.Message, state: FSMContext):
+    user_id = str(message.from_user.id)
+    days = program_days(user_id)
+    if not days:
+        await message.answer("❗ Сначала создайте программу: /programma")
+        return
+    await state.clear()
+    text, markup = menu(days)
+    await message.answer(text, reply_markup=markup)
+
+async def log_menu(callback: types.CallbackQuery, state: FSMContext):
+    days = program_days(str(callback.from_user.id))
+    if not days:
+        await callback.answer("❗ Программа не найдена. Создайте ее через /programma", show_alert=True)
+        return
+    await state.clear()
+    text, markup = menu(days)
+    await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
+
+async def log_day_chosen(callback: types.CallbackQuery):
+    days = program_days(str(callback.from_user.id))
+    day_idx = int(callback.data.split("_")[2])
+    if not days or day_idx >= len(days):
+        await callback.answer("❗ Программа изменилась, откройте /log заново", show_alert=True)
+        return
+    await callback.message.edit_text(
+        f"🏋️ <b>День {day_idx + 1}: какое упражнение записать?</b>",
+        reply_markup=exercise_keyboard(days[day_idx])
+    )
+    await callback.answer()
+
+async def log_exercise_chosen(callback: types.CallbackQuery, state: FSMContext):
+    user_id = callback.from_user.id
+    exercise_id = int(callback.data.split("_")[2])
+    days = program_days(str(user_id))
+    if not days or not any(exercise_id in day for day in days):
+        await callback.answer("❗ Этого упражнения нет в программе, откройте /log заново", show_alert=True)
+        return
+
+    await workout_log.wait_loaded()
+    lines = [f"🏋️ <b>{decode_exercise(exercise_id)}</b>"]
+    session = workout_log.last_session(user_id, exercise_id)
+    if session:
+        lines.append(f"Прошлый раз ({session[0].day:%d.%m}): " + ", ".join(format_set(entry) for entry in session))
+        best = workout_log.best_set(user_id, exercise_id)
+        lines.append(f"🏆 Лучший подход: {best.reps}×{best.weight:g} кг ({best.day:%d.%m.%Y})")
+    lines.append(
+        "\nВведите подходы×повторения×вес, например <code>3x8x60</code>, "
+        "или <code>8x60</code> для одного подхода:"
+    )
+
+    await state.set_state(LogStates.entering_set)
+    await state.update_data({"log_exercise": exercise_id})
+    await callback.message.edit_text(
+        "\n".join(lines),
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="📋 Другое упражнение", callback_data="log_menu")],
+            [CANCEL_BUTTON]
+        ])
+    )
+    await callback.answer()
+
+async def process_set(message: types.Message, state: FSMContext):
+    match = SET_PATTERN.match(message.text or "")
+    if not match:
+        await message.answer("❗ Не понял запись. Формат: <code>3x8x60</code> (подходы×повторения×вес) или <code>8x60</code>")
+        return
+    sets = int(match.group(1) or 1)
+    reps = int(match.group(2))
+    weight = float(match.group(3).replace(",", "."))
+    if not 1 <= sets <= 50 or not 1 <= reps <= 500 or weight > 1000:
+        await message.answer("❗ Проверьте числа: до 50 подходов, до 500 повторений и до 1000 кг")
+        return
+
+    data = await state.get_data()
+    exercise_id = data.get("log_exercise")
+    user_id = message.from_user.id
+    await workout_log.wait_loaded()
+    entry = workout_log.append(user_id, exercise_id, sets, reps, weight)
+    logger.info(f"User {user_id} logged {sets}x{reps}x{weight} for exercise {exercise_id}")
+
+    await message.answer(
+        f"✅ Записано: {decode_exercise(exercise_id)} — {format_set(entry)}\n"
+        f"📊 Тоннаж за 7 дней: {format_volume(workout_log.weekly_volume(user_id))} кг\n"
+        "Можно сразу ввести следующий подход.",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="📋 Другое упражнение", callback_data="log_menu")],
+            [CANCEL_BUTTON]
+        ])
+    )
+
+async def log_cancel(callback: types.CallbackQuery, state: FSMContext):
+    await state.clear()
+    await callback.message.edit_text("💪 <b>Тренировка записана!</b> Продолжить можно командой /log")
+    await callback.answer()
+
+def register_log_handlers(dp: Dispatcher):
+    dp.message.register(log_cmd, Command("log"))
+    # Команды (/progress, /remind) не должны приниматься за запись подхода
+    dp.message.register(process_set, LogStates.entering_set, ~F.text.startswith("/"))
+    dp.callback_query.register(log_menu, F.data == "log_menu")
+    dp.callback_query.register(log_day_chosen, F.data.startswith("log_day_"))
+    dp.callback_query.register(log_exercise_chosen, F.data.startswith("log_ex_"))
+    dp.callback_query.register(log_cancel, F.data == "log_cancel")
@@ -0,0 +1,98 @@
+from aiogram import Dispatcher, types, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile, InlineKeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from storage import get_program, decode_exercise
+from suggest import normalize, trigrams
+import html
+import progress
+import workout_log
+import logging
+
+logger = logging.getLogger(__name__)
+
+def logged_exercises(user_id: int) -> dict:
+    """Упражнения программы, по которым есть записи в журнале: ID -> "Подгруппа: упражнение"."""
+    entry = get_program(str(user_id), decode=False)
+    program = entry.get("program") if entry else None
+    if not isinstance(program, dict) or "layout" not in program:
+        return {}
+    return {
+        exercise_id: decode_exercise(exercise_id)
+        for day in program["days"] for exercise_id in day
+        if workout_log.data_version(user_id, exercise_id)
+    }
+
+def match_exercise(text: str, exercises: dict) -> int | None:
+    """Упражнение по тексту из команды: сначала по вхождению названия, затем по похожести."""
+    query = normalize(text)
+    for exercise_id, line in exercises.items():
+        if query and query in normalize(line):
+            return exercise_id
+    grams = trigrams(text)
+    scored = [(len(grams & trigrams(line.split(": ", 1)[-1])), exercise_id) for exercise_id, line in exercises.items()]
+    best = max(scored, default=(0, None))
+    return best[1] if best[0] >= 3 else None
+
+def exercises_keyboard(exercises: dict):
+    builder = InlineKeyboardBuilder()
+    for exercise_id, line in exercises.items():
+        builder.add(InlineKeyboardButton(text=line, callback_data=f"progress_{exercise_id}"))
+    builder.adjust(1)
+    return builder.as_markup()
+
+async def send_chart(message: types.Message, user_id: int, exercise_id: int):
+    if not progress.charts_available():
+        await message.answer("📉 Графики недоступны: на сервере не установлены numpy и matplotlib")
+        return
+
+    title = decode_exercise(exercise_id)
+    best = workout_log.best_set(user_id, exercise_id)
+    caption = f"📈 <b>{title}</b>\n🏆 Лучший подход: {best.reps}×{best.weight:g} кг ({best.day:%d.%m.%Y})"
+    key = progress.chart_key(user_id, exercise_id)
+    file_id = progress.cached_file_id(key)
+    if file_id:
+        await message.answer_photo(file_id, caption=caption)
+        return
+
+    await message.bot.send_chat_action(chat_id=message.chat.id, action="upload_photo")
+    try:
+        png = await progress.render_progress(user_id, exercise_id, title)
+    except Exception as e:
+        logger.error(f"Failed to render progress chart for user {user_id}, exercise {exercise_id}: {e}")
+        await message.answer("❗ Не удалось построить график, попробуйте позже")
+        return
+    sent = await message.answer_photo(BufferedInputFile(png, filename="progress.png"), caption=caption)
+    if sent.photo:
+        progress.remember(key, sent.photo[-1].file_id)
+
+async def progress_cmd(message: types.Message, command: CommandObject):
+    user_id = message.from_user.id
+    await workout_log.wait_loaded()
+    exercises = logged_exercises(user_id)
+    if not exercises:
+        await message.answer("📉 Пока нечего показывать: запишите тренировку через /log")
+        return
+
+    if command.args:
+        exercise_id = match_exercise(command.args, exercises)
+        if exercise_id is not None:
+            await send_chart(message, user_id, exercise_id)
+            return
+        text = f"❗ Не нашел «{html.escape(command.args)}» среди записанных упражнений. Выберите из списка:"
+    else:
+        text = "📈 <b>Прогресс какого упражнения показать?</b>"
+    await message.answer(text, reply_markup=exercises_keyboard(exercises))
+
+async def progress_selected(callback: types.CallbackQuery):
+    user_id = callback.from_user.id
+    exercise_id = int(callback.data.split("_")[1])
+    if not workout_log.data_version(user_id, exercise_id):
+        await callback.answer("❗ По этому упражнению нет записей", show_alert=True)
+        return
+    await callback.answer()
+    await send_chart(callback.message, user_id, exercise_id)
+
+def register_progress_handlers(dp: Dispatcher):
+    dp.message.register(progress_cmd, Command("progress"))
+    dp.callback_query.register(progress_selected, F.data.startswith("progress_"))
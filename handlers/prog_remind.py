@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from aiogram import Dispatcher, types, F
+from aiogram.filters import Command
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+import settings.config as cfg
+from storage import get_program, reminders as saved_reminders
+import reminders
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Время напоминания на выбор, минуты от полуночи
+TIME_OPTIONS = [7 * 60, 9 * 60, 12 * 60, 18 * 60, 20 * 60]
+
+def format_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+def remind_keyboard(enabled: bool) -> InlineKeyboardMarkup:
+    buttons = [InlineKeyboardButton(text=f"⏰ {format_minute(minute)}", callback_data=f"remind_{minute}") for minute in TIME_OPTIONS]
+    rows = [buttons[:3], buttons[3:]]
+    if enabled:
+        rows.append([InlineKeyboardButton(text="🔕 Выключить", callback_data="remind_off")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def status_text(user_id: str) -> str:
+    reminder = saved_reminders.get(user_id)
+    zone = f"UTC{cfg.REMINDER_UTC_OFFSET:+d}"
+    if not reminder:
+        return (
+            "⏰ <b>Напоминания о тренировках выключены</b>\n"
+            f"Выберите время ({zone}) — напомню в дни тренировок по вашей программе:"
+        )
+    next_at = datetime.fromtimestamp(reminder["next"], reminders.TZ)
+    return (
+        f"⏰ <b>Напоминания включены:</b> {reminders.PLAN_TITLES[reminder['plan']]} "
+        f"в {format_minute(reminder['minute'])} ({zone})\n"
+        f"Следующее: {next_at:%d.%m в %H:%M}\n\n"
+        "Чтобы изменить время, выберите другое:"
+    )
+
+async def remind_cmd(message: types.Message):
+    user_id = str(message.from_user.id)
+    if not get_program(user_id, decode=False):
+        await message.answer("❗ Сначала создайте программу: /programma")
+        return
+    await message.answer(status_text(user_id), reply_markup=remind_keyboard(user_id in saved_reminders))
+
+async def remind_time_chosen(callback: types.CallbackQuery):
+    user_id = str(callback.from_user.id)
+    entry = get_program(user_id, decode=False)
+    if not entry:
+        await callback.answer("❗ Программа не найдена. Создайте ее через /programma", show_alert=True)
+        return
+    minute = int(callback.data.split("_")[1])
+    reminders.schedule(user_id, reminders.plan_for(entry.get("days")), minute)
+    logger.info(f"User {user_id} set reminders at {format_minute(minute)}")
+    await callback.message.edit_text(status_text(user_id), reply_markup=remind_keyboard(True))
+    await callback.answer("✅ Напоминания включены")
+
+async def remind_off(callback: types.CallbackQuery):
+    user_id = str(callback.from_user.id)
+    reminders.cancel(user_id)
+    await callback.message.edit_text("🔕 <b>Напоминания выключены.</b> Включить снова — /remind")
+    await callback.answer()
+
+def register_remind_handlers(dp: Dispatcher):
+    dp.message.register(remind_cmd, Command("remind"))
+    dp.callback_query.register(remind_off, F.data == "remind_off")
+    dp.callback_query.register(remind_time_chosen, F.data.regexp(r"^remind_\d+$"))
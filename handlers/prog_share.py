@@ -0,0 +1,43 @@
+from aiogram import Dispatcher, types, F
+from aiogram.utils.deep_linking import create_start_link
+from program_view import display_program
+from storage import share_program, take_shared
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Префикс payload в ссылке /start, по нему start_cmd отличает ссылку на программу
+SHARE_PREFIX = "share_"
+
+async def share_selected(callback: types.CallbackQuery):
+    user_id = str(callback.from_user.id)
+    token = share_program(user_id)
+    if not token:
+        await callback.answer("❗ Программа не найдена, создайте ее с помощью /programma", show_alert=True)
+        return
+
+    link = await create_start_link(callback.bot, SHARE_PREFIX + token)
+    logger.info(f"User {user_id} shared program as {token}")
+    await callback.message.answer(
+        "📤 <b>Ссылка на вашу программу:</b>\n"
+        f"{link}\n\n"
+        "Перешлите ее другу — он увидит программу и сможет взять ее себе в одно нажатие."
+    )
+    await callback.answer()
+
+async def take_selected(callback: types.CallbackQuery):
+    user_id = str(callback.from_user.id)
+    token = callback.data.removeprefix("take_")
+    if not take_shared(user_id, token):
+        await callback.answer("❗ Ссылка больше не действует", show_alert=True)
+        return
+
+    logger.info(f"User {user_id} took shared program {token}")
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.message.answer("📥 <b>Программа теперь ваша!</b> Прежняя осталась в /history.")
+    await display_program(callback.message, user_id, callback.from_user.first_name or "User")
+    await callback.answer()
+
+def register_share_handlers(dp: Dispatcher):
+    dp.callback_query.register(share_selected, F.data == "share_program")
+    dp.callback_query.register(take_selected, F.data.startswith("take_"))
@@ -4,12 +4,13 @@ from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from settings.config import full_body_program
-from storage import user_program, save_user_program
+from catalog import get_catalog
+from suggest import canonical_exercise, offer_suggestions
+from wizard_panel import add_day, add_selection, show_program, with_panel
+from wizard_undo import BACK_DATA, back_button, push_undo, undo_step
+from storage import user_program, set_program, delete_program, popular_first
 import logging
-import re
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 SETS_REPS = "2 подхода по 4-8 повторений (Выполнять в 0-2 повторений в запасе)"
@@ -45,20 +46,6 @@ muscle_sequence_day2 = [
 muscle_sequence_day3 = muscle_sequence_day1.copy()
 muscle_sequence_day4 = muscle_sequence_day2.copy()
 
-# Транслитерация для callback_data
-TRANSLIT_MAP = {
-    'Спина': 'Spina', 'Широчайшие': 'Shirochayshie', 'Верх спины': 'Verh_spiny',
-    'Дельты': 'Delty', 'Передняя дельта': 'Perednyaya_delta', 'Средняя дельта': 'Srednyaya_delta',
-    'Задняя дельта': 'Zadnyaya_delta', 'Грудь': 'Grud', 'Верх груди': 'Verh_grudi',
-    'Низ груди': 'Niz_grudi', 'Руки': 'Ruki', 'Бицепс': 'Bitseps', 'Трицепс': 'Tritseps',
-    'Ноги': 'Nogi', 'Ягодицы': 'Yagoditsy', 'Квадрицепсы': 'Kvadricep', 'Квадрицепсы (приседания)': 'Kvadricep_prised',
-    'Квадрицепсы (разгибания)': 'Kvadricep_razgib', 'Бицепс бедра': 'Bitseps_bedra', 'Hinge': 'Hinge',
-    'Приводящие': 'Privodyashchie', 'Икры': 'Ikry'
-}
-
-def translit(text: str) -> str:
-    return TRANSLIT_MAP.get(text, re.sub(r'[^\w]', '_', text))
-
 async def send_split_message(bot, chat_id: int, text: str, reply_markup=None):
     MAX_MESSAGE_LENGTH = 4000
     logger.info(f"Sending message to chat {chat_id}, length: {len(text)}")
@@ -116,17 +103,15 @@ async def format_day(day_num: int, day_name: str, muscle_seq: list, exercises: l
     logger.info(f"Day {day_num} text length: {len(day_text)} characters")
     return day_text
 
-def get_exercise_keyboard(muscle_group: str, subgroup: str, selected_exercises: list, day: int) -> InlineKeyboardMarkup:
+def get_exercise_keyboard(muscle_group: str, subgroup: str, selected_exercises: list, day: int, catalog_version: str | None = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    exercises = full_body_program.get(muscle_group, {}).get(subgroup, [])
+    catalog = get_catalog(catalog_version)
+    exercises = catalog.get_exercises(muscle_group, subgroup)
     logger.debug(f"Exercises for {muscle_group}/{subgroup} (Day {day}): {exercises}")
     
-    muscle_group_translit = translit(muscle_group)
-    subgroup_translit = translit(subgroup)
-    
-    for idx, exercise in enumerate(exercises):
+    for idx, exercise in popular_first(catalog.exercise_ids[subgroup], exercises):
         if exercise not in selected_exercises:
-            callback_data = f"ex_{muscle_group_translit}_{subgroup_translit}_{idx}_{day}"
+            callback_data = f"ex_{catalog.exercise_ids[subgroup][idx]}_{day}"
             if len(callback_data.encode('utf-8')) > 64:
                 logger.error(f"Callback data too long: {callback_data}")
                 raise ValueError("Callback data exceeds Telegram limit")
@@ -136,7 +121,7 @@ def get_exercise_keyboard(muscle_group: str, subgroup: str, selected_exercises:
                 callback_data=callback_data
             ))
     
-    callback_data_custom = f"custom_ex_{muscle_group_translit}_{subgroup_translit}_{day}"
+    callback_data_custom = f"custom_ex_{catalog.tokens[subgroup]}_{day}"
     if len(callback_data_custom.encode('utf-8')) > 64:
         logger.error(f"Custom callback data too long: {callback_data_custom}")
         raise ValueError("Custom callback data exceeds Telegram limit")
@@ -145,6 +130,8 @@ def get_exercise_keyboard(muscle_group: str, subgroup: str, selected_exercises:
         callback_data=callback_data_custom
     ))
     
+    builder.add(back_button())
+
     builder.adjust(1)
     return builder.as_markup()
 
@@ -160,8 +147,10 @@ async def start_upperlower2(callback: types.CallbackQuery, state: FSMContext):
         "selected": {"day1": [], "day2": [], "day3": [], "day4": []},
         "exercise_mapping": {},
         "selected_exercises": [],
+        "panel": add_day("", 1),
         "days_per_week": days,
         "user_id": user_id,
+        "catalog_version": get_catalog().version,
         "current_day": 1
     })
     logger.info(f"Started upperlower2 for user {user_id} with {days} days")
@@ -192,6 +181,7 @@ async def send_next_muscle(message: types.CallbackQuery | types.Message, state:
             await state.update_data({
                 "current_step": 0,
                 "current_day": current_day + 1,
+                "panel": add_day(data.get("panel", ""), current_day + 1),
                 "selected_exercises": []
             })
             logger.info(f"Moving to Day {current_day + 1} for user {user_id}")
@@ -219,7 +209,7 @@ async def send_next_muscle(message: types.CallbackQuery | types.Message, state:
                     await state.clear()
                     return
 
-            user_program[user_id] = {
+            set_program(user_id, {
                 "days": days,
                 "program": {
                     "day1": selected["day1"],
@@ -229,33 +219,28 @@ async def send_next_muscle(message: types.CallbackQuery | types.Message, state:
                 },
                 "type": "4 день верх/низ",
                 "sets_reps": SETS_REPS
-            }
-            save_user_program()
+            })
 
             logger.info(f"Saved program for user {user_id}: {user_program[user_id]}")
 
-            bot = message.bot
-            chat_id = message.chat.id if isinstance(message, types.Message) else message.message.chat.id
-            await bot.send_message(chat_id=chat_id, text="/programma - просмотреть программу")
+            await show_program(message, user_id)
             await state.clear()
             logger.info(f"Program completed for user {user_id}")
             return
 
     muscle_group, subgroup, required_count = flat_sequence[step]
-    exercises = full_body_program.get(muscle_group, {}).get(subgroup, [])
+    catalog = get_catalog(data.get("catalog_version"))
+    exercises = catalog.get_exercises(muscle_group, subgroup)
 
     if not exercises:
-        logger.warning(f"No exercises found for {muscle_group}/{subgroup} in full_body_program")
+        logger.warning(f"No exercises found for {muscle_group}/{subgroup} in catalog {catalog.version}")
         await state.update_data({"current_step": step + 1})
         await send_next_muscle(message, state)
         return
 
-    muscle_group_translit = translit(muscle_group)
-    subgroup_translit = translit(subgroup)
-
     exercise_mapping = {}
     for idx, exercise in enumerate(exercises):
-        callback_data = f"ex_{muscle_group_translit}_{subgroup_translit}_{idx}_{current_day}"
+        callback_data = f"ex_{catalog.exercise_ids[subgroup][idx]}_{current_day}"
         if len(callback_data.encode('utf-8')) > 64:
             logger.error(f"Callback data too long: {callback_data}")
             raise ValueError("Callback data exceeds Telegram limit")
@@ -278,7 +263,8 @@ async def send_next_muscle(message: types.CallbackQuery | types.Message, state:
     })
 
     text = f"💪 <b>Выберите {required_count} упражнение для {subgroup} (День {current_day})</b>\n📋 Доступные варианты:"
-    keyboard = get_exercise_keyboard(muscle_group, subgroup, data.get("selected_exercises", []), current_day)
+    text = with_panel(data.get("panel", ""), text)
+    keyboard = get_exercise_keyboard(muscle_group, subgroup, data.get("selected_exercises", []), current_day, catalog_version=data.get("catalog_version"))
 
     if isinstance(message, types.CallbackQuery):
         await message.message.edit_text(text, reply_markup=keyboard)
@@ -315,15 +301,21 @@ async def exercise_selected(callback: types.CallbackQuery, state: FSMContext):
     
     logger.debug(f"User {callback.from_user.id} selected exercise: {exercise} for {muscle_group}/{subgroup} (Day {day}), callback_data: {callback.data}")
     
+    panel = data.get("panel", "")
+    
     if exercise not in selected_for_muscle:
+        undo = push_undo(data)
         selected_for_muscle.append(exercise)
         selected_total.append(f"{subgroup}: {exercise}")
         selected_exercises.append(exercise)
+        panel = add_selection(panel, subgroup, exercise)
         
         await state.update_data({
             "selected_for_muscle": selected_for_muscle,
             "selected": {f"day{d}": selected[f"day{d}"] for d in range(1, 5)},
-            "selected_exercises": selected_exercises
+            "selected_exercises": selected_exercises,
+            "panel": panel,
+            "undo": undo
         })
     
     logger.info(f"Updated selected exercises for user {callback.from_user.id} (Day {day}): {selected_total}")
@@ -334,9 +326,9 @@ async def exercise_selected(callback: types.CallbackQuery, state: FSMContext):
         await send_next_muscle(callback, state)
     else:
         await callback.message.edit_text(
-            f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup} (День {day})</b>",
+            with_panel(panel, f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup} (День {day})</b>"),
             reply_markup=get_exercise_keyboard(
-                muscle_group, subgroup, selected_exercises, day
+                muscle_group, subgroup, selected_exercises, day, catalog_version=data.get("catalog_version")
             )
         )
     
@@ -354,14 +346,13 @@ async def custom_exercise_button_pressed(callback: types.CallbackQuery, state: F
         await callback.answer("❗ Вы уже выбрали максимум упражнений для этой группы!")
         return
 
-    muscle_group_translit = translit(muscle_group)
-    subgroup_translit = translit(subgroup)
-    callback_data_custom = f"custom_ex_{muscle_group_translit}_{subgroup_translit}_{day}"
+    catalog = get_catalog(data.get("catalog_version"))
+    callback_data_custom = f"custom_ex_{catalog.tokens[subgroup]}_{day}"
     if len(callback_data_custom.encode('utf-8')) > 64:
         logger.error(f"Custom callback data too long: {callback_data_custom}")
         raise ValueError("Custom callback data exceeds Telegram limit")
 
-    message = await callback.message.edit_text(
+    await callback.message.edit_text(
         f"✍️ <b>Введите свое упражнение для {subgroup} (День {day})</b>\n"
         "Напишите название (например, 'Жим ногами в тренажере'):",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=[
@@ -369,7 +360,7 @@ async def custom_exercise_button_pressed(callback: types.CallbackQuery, state: F
         ])
     )
 
-    await state.update_data({"request_message_id": message.message_id})
+    await state.update_data({"request_message_id": callback.message.message_id})
     await state.set_state(UpperLowerStates.entering_custom_exercise)
     await callback.answer()
 
@@ -387,6 +378,13 @@ async def process_custom_exercise(message: types.Message, state: FSMContext):
         )
         return
 
+    # Известное написание сохраняется по ID справочника; на похожее сначала предлагаем подсказки
+    known = canonical_exercise(subgroup, custom_exercise)
+    if known:
+        custom_exercise = known
+    elif await offer_suggestions(message, state, data, subgroup, custom_exercise):
+        return
+
     selected_for_muscle = data.get("selected_for_muscle", [])
     selected = data.get("selected", {"day1": [], "day2": [], "day3": [], "day4": []})
     selected_total = selected[f"day{day}"]
@@ -394,15 +392,21 @@ async def process_custom_exercise(message: types.Message, state: FSMContext):
 
     logger.debug(f"User {message.from_user.id} added custom exercise: {custom_exercise} for {muscle_group}/{subgroup} (Day {day})")
 
+    panel = data.get("panel", "")
+
     if custom_exercise not in selected_for_muscle:
+        undo = push_undo(data)
         selected_for_muscle.append(custom_exercise)
         selected_total.append(f"{subgroup}: {custom_exercise}")
         selected_exercises.append(custom_exercise)
+        panel = add_selection(panel, subgroup, custom_exercise)
 
         await state.update_data({
             "selected_for_muscle": selected_for_muscle,
             "selected": {f"day{d}": selected[f"day{d}"] for d in range(1, 5)},
-            "selected_exercises": selected_exercises
+            "selected_exercises": selected_exercises,
+            "panel": panel,
+            "undo": undo
         })
 
     logger.info(f"Updated selected exercises for user {message.from_user.id} (Day {day}): {selected_total}")
@@ -424,12 +428,17 @@ async def process_custom_exercise(message: types.Message, state: FSMContext):
     else:
         await state.set_state(UpperLowerStates.choosing_muscle)
         await message.answer(
-            f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup} (День {day})</b>",
+            with_panel(panel, f"✅ <b>Выбрано {len(selected_for_muscle)}/{required_count} для {subgroup} (День {day})</b>"),
             reply_markup=get_exercise_keyboard(
-                muscle_group, subgroup, selected_exercises, day
+                muscle_group, subgroup, selected_exercises, day, catalog_version=data.get("catalog_version")
             )
         )
 
+async def suggestion_selected(callback: types.CallbackQuery, state: FSMContext):
+    # Кнопка из "Вы имели в виду…?" работает так же, как выбор упражнения в списке
+    await state.set_state(UpperLowerStates.choosing_muscle)
+    await exercise_selected(callback, state)
+
 async def cancel_custom_exercise(callback: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
     muscle_group = data.get("current_muscle")
@@ -439,28 +448,29 @@ async def cancel_custom_exercise(callback: types.CallbackQuery, state: FSMContex
 
     await state.set_state(UpperLowerStates.choosing_muscle)
     await callback.message.edit_text(
-        f"💪 <b>Выберите {data.get('required_count')} упражнение для {subgroup} (День {day})</b>",
+        with_panel(data.get("panel", ""), f"💪 <b>Выберите {data.get('required_count')} упражнение для {subgroup} (День {day})</b>"),
         reply_markup=get_exercise_keyboard(
-            muscle_group, subgroup, selected_exercises, day
+            muscle_group, subgroup, selected_exercises, day, catalog_version=data.get("catalog_version")
         )
     )
     await callback.answer()
 
 async def clear_program(callback: types.CallbackQuery, state: FSMContext):
     user_id = str(callback.from_user.id)
-    if user_id in user_program:
-        del user_program[user_id]
-        save_user_program()
+    if delete_program(user_id):
         logger.info(f"Program removed for user {user_id}")
     await state.clear()
     await callback.message.edit_text(
-        "🗑 <b>Программа удалена!</b>\nСоздайте новую с помощью /programma или /start",
+        "🗑 <b>Программа удалена!</b>\nСоздайте новую с помощью /programma или /start\nВернуть прошлую версию можно через /history",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="🏋️ Новая программа", callback_data="start_programma")]
         ])
     )
     await callback.answer()
 
+async def step_back(callback: types.CallbackQuery, state: FSMContext):
+    await undo_step(callback, state, send_next_muscle)
+
 def register_upperlower2_handlers(dp: Dispatcher):
     dp.callback_query.register(start_upperlower2, F.data == "prog_upperlower2")
     dp.callback_query.register(
@@ -473,10 +483,20 @@ def register_upperlower2_handlers(dp: Dispatcher):
         UpperLowerStates.choosing_muscle,
         F.data.startswith("custom_ex_")
     )
+    dp.callback_query.register(
+        step_back,
+        UpperLowerStates.choosing_muscle,
+        F.data == BACK_DATA
+    )
     dp.message.register(
         process_custom_exercise,
         UpperLowerStates.entering_custom_exercise
     )
+    dp.callback_query.register(
+        suggestion_selected,
+        UpperLowerStates.entering_custom_exercise,
+        F.data.startswith("ex_")
+    )
     dp.callback_query.register(
         cancel_custom_exercise,
         UpperLowerStates.entering_custom_exercise,
@@ -0,0 +1,63 @@
+from aiogram import Dispatcher, types, F
+from aiogram.fsm.context import FSMContext
+from aiogram.types import KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove, WebAppInfo
+import settings.config as cfg
+from programs import PROGRAMS, validate_selection, save_program
+from program_view import display_program
+import html
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def open_webapp(callback: types.CallbackQuery, state: FSMContext):
+    # wa_<key>: web_app_data приходит только от кнопок обычной клавиатуры, поэтому не inline
+    spec = PROGRAMS.get(callback.data.replace("wa_", "", 1))
+    if not spec or not cfg.WEBAPP_URL:
+        logger.error(f"Mini App requested for {callback.data}, WEBAPP_URL={cfg.WEBAPP_URL!r}")
+        await callback.answer("❌ Конструктор сейчас недоступен")
+        return
+
+    keyboard = ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(
+            text="🧩 Открыть конструктор",
+            web_app=WebAppInfo(url=f"{cfg.WEBAPP_URL}/webapp/?type={spec.key}")
+        )]],
+        resize_keyboard=True,
+        one_time_keyboard=True
+    )
+    await callback.message.answer(
+        f"🧩 <b>Конструктор «{spec.title}»</b>\n"
+        "Нажмите кнопку внизу, отметьте упражнения на все дни и сохраните программу.",
+        reply_markup=keyboard
+    )
+    await callback.answer()
+
+async def webapp_data_received(message: types.Message, state: FSMContext):
+    user_id = str(message.from_user.id)
+    try:
+        payload = json.loads(message.web_app_data.data)
+        spec = PROGRAMS.get(payload.get("type"))
+        if not spec:
+            raise ValueError("неизвестный тип программы")
+        days = validate_selection(spec, payload.get("days"), payload.get("version"))
+    except (ValueError, AttributeError) as e:
+        logger.warning(f"Rejected Mini App selection from user {user_id}: {e}")
+        # В тексте ошибки бывают названия упражнений пользователя
+        await message.answer(f"❗ Программа не сохранена: {html.escape(str(e))}. Откройте конструктор еще раз.")
+        return
+
+    data = await state.get_data()
+    save_program(user_id, spec, days, data.get("days", spec.days))
+    await state.clear()
+    logger.info(f"Saved {spec.program_type} program from Mini App for user {user_id}")
+
+    await message.answer(
+        f"✅ <b>Программа «{spec.title}» сохранена!</b>",
+        reply_markup=ReplyKeyboardRemove()
+    )
+    await display_program(message, user_id, message.from_user.first_name or "User")
+
+def register_webapp_handlers(dp: Dispatcher):
+    dp.callback_query.register(open_webapp, F.data.startswith("wa_"))
+    dp.message.register(webapp_data_received, F.web_app_data)
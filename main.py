@@ -1,223 +1,62 @@
+import html
 import logging
 import asyncio
+import importlib
+from datetime import date
 
-from aiogram import Bot, Dispatcher, types
-from aiogram.filters import Command
-from aiogram.enums import ParseMode, ContentType
-from aiogram.client.default import DefaultBotProperties
+from aiogram import Dispatcher, types
+from aiogram.filters import Command, CommandObject
+from aiogram.enums import ContentType
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
-from aiogram.types import ReplyKeyboardRemove, LabeledPrice, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
+from aiogram.types import ReplyKeyboardRemove, LabeledPrice, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram import F
 
-from handlers.prog_fullbody2 import register_fullbody2_handlers, muscle_sequence as fullbody_sequence
-from handlers.prog_fullbody3 import register_fullbody3_handlers
-from handlers.prog_hybrid3 import register_hybrid3_handlers, muscle_sequence_day1, muscle_sequence_day2, muscle_sequence_day3
-from handlers.prog_upperlower2 import register_upperlower2_handlers, muscle_sequence_day1 as ul_day1, muscle_sequence_day2 as ul_day2
-from handlers.prog_ap2 import register_pushpull2_handlers, muscle_sequence_day1 as ap_day1, muscle_sequence_day2 as ap_day2
-from handlers.prog_lt2 import register_limbs_torso2_handlers, muscle_sequence_day1 as lt_day1, muscle_sequence_day2 as lt_day2
-from handlers.prog_fullbody34 import register_fullbody34_handlers
 import settings.markups as nav
 import settings.config as cfg
-from utils import check_sub, are_markups_equal
-from storage import user_program, save_user_program, count_programs
-
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+import media
+import analytics
+import export
+import backup
+from bootstrap import Bootstrap
+from fsm_storage import BoundedMemoryStorage
+from catalog import reload_catalog
+from program_view import display_program, display_shared_program, turn_page
+from utils import check_sub
+from storage import user_program, count_programs, is_loaded, wait_loaded, type_counts, top_exercises
 
-bot = Bot(
-    token=cfg.BOT_TOKEN,
-    default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-)
-dp = Dispatcher()
-
-async def send_split_message(bot, chat_id: int, text: str, reply_markup=None):
-    MAX_MESSAGE_LENGTH = 4000
-    logger.debug(f"Sending message to chat {chat_id}, length: {len(text)}")
-    if len(text) <= MAX_MESSAGE_LENGTH:
-        await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
-        return
-    lines = text.split("\n")
-    current_chunk = ""
-    for line in lines:
-        if len(current_chunk) + len(line) + 1 > MAX_MESSAGE_LENGTH:
-            logger.debug(f"Sending chunk of length {len(current_chunk.strip())} for chat {chat_id}")
-            await bot.send_message(chat_id=chat_id, text=current_chunk.strip())
-            current_chunk = ""
-        current_chunk += line + "\n"
-    if current_chunk.strip():
-        logger.debug(f"Sending final chunk of length {len(current_chunk.strip())} for chat {chat_id}")
-        await bot.send_message(chat_id=chat_id, text=current_chunk.strip(), reply_markup=reply_markup)
-
-async def format_day(day_num: int, day_name: str, exercises: list, muscle_seq: list, sets_reps: str, is_multi_day: bool = True):
-    prefix = f"\n{day_num}️⃣ <b>День {day_num} ({day_name})</b>\n" if is_multi_day else ""
-    day_text = prefix
-    muscle_groups = {}
-    subgroup_to_group = {}
-    nested_subgroups = {"Квадрицепсы": [], "Бицепс бедра": []}
-
-    for group, subgroup, count in muscle_seq:
-        if isinstance(count, list):
-            for sub_subgroup, _ in count:
-                subgroup_to_group[sub_subgroup] = group
-                nested_subgroups[subgroup].append(sub_subgroup)
-        else:
-            subgroup_to_group[subgroup] = group
-
-    logger.debug(f"Exercises to format: {exercises}")
-
-    for exercise in exercises:
-        try:
-            subgroup, ex_name = exercise.split(": ", 1)
-            group = subgroup_to_group.get(subgroup, "Unknown")
-            if group not in muscle_groups:
-                muscle_groups[group] = {}
-            if subgroup not in muscle_groups[group]:
-                muscle_groups[group][subgroup] = []
-            muscle_groups[group][subgroup].append(ex_name)
-        except ValueError:
-            logger.warning(f"Invalid exercise format: {exercise}")
-            continue
-
-    for group in muscle_groups:
-        day_text += f"💪 <b>{group}</b>\n"
-        for subgroup in muscle_groups[group]:
-            day_text += f"  ➡️ {subgroup}\n"
-            for ex in muscle_groups[group][subgroup]:
-                day_text += f"    - {ex} ({sets_reps})\n"
-    return day_text
-
-async def display_program(message: types.Message, user_id: str, first_name: str) -> bool:
-    logger.debug(f"Checking user_program for user {user_id}: {user_program.get(user_id)}")
-    if user_id not in user_program or not user_program[user_id].get("program"):
-        logger.info(f"No program found for user {user_id}")
-        return False
-
-    program = user_program[user_id]
-    days = program.get('days', 2)
-    sets_reps = program.get('sets_reps', '3 подхода, 3-8 повторений')
-    program_type = program.get('type', 'Unknown')
-    logger.info(f"Displaying program for user {user_id}: type={program_type}, days={days}, program={program['program']}")
-
-    intro_text = (
-        "😲 Отличный выбор упражнений, спортсмен, очень оптимальный выбор!\n\n"
-        "📝 <i>Упражнения не написаны по исполнительному порядку, начинай тренировку с мышцы, "
-        "которую ты хочешь акцентировать сегодня, и после переходи на следующие упражнения по своему выбору.</i>\n"
-        "💡 <i>Если ты хочешь постепенно добавлять объем, добавляй! Но только если твое тело это позволяет, не нагружай себя просто так.</i>\n\n"
-    )
-    if program_type == "4 день верх/низ":
-        intro_text += "ℹ️ <i>Программа на 4 дня состоит из двух чередующихся дней (верх/низ). День 1 и 3 — верх, день 2 и 4 — низ.</i>\n\n"
-    elif program_type == "4 день перед/зад":
-        intro_text += "ℹ️ <i>Программа на 4 дня состоит из двух чередующихся дней (перед/зад). День 1 и 3 — перед, день 2 и 4 — зад.</i>\n\n"
-    elif program_type == "4 день конечности/торс":
-        intro_text += "ℹ️ <i>Программа на 4 дня состоит из двух чередующихся дней (конечности/торс). День 1 и 3 — конечности, день 2 и 4 — торс.</i>\n\n"
-    elif program_type == "Hybrid 3.0":
-        intro_text += "ℹ️ <i>Программа на 3 дня состоит из одного дня фуллбоди и двух дней, разделенных на верх и низ.</i>\n\n"
-    intro_text += (
-        f"🏋️ <b>Ваша программа тренировок</b>\n"
-        f"📅 Тип: {program_type}\n"
-        f"🗓 Дней: {days}\n"
-    )
-    footer_text = (
-        "\n💡 Техника: <a href='https://t.me/+IkIXHNQL3vgyYzQ8'>ТуторыЗамены</a>\n"
-        "📋 Просмотр: /programma\n"
-        "🔥 Удачи!"
-    )
-    markup = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🔄 Пересоставить", callback_data="clear_program")]
-    ])
+logger = logging.getLogger(__name__)
 
-    if isinstance(program["program"], list) and program_type in ["FullBody 2.0", "FullBody 3.0"]:
-        response = intro_text + f"ℹ️ <i>Программа одинакова для всех дней тренировок.</i>\n\n<b>Упражнения:</b>\n"
-        day_text = await format_day(1, "", program["program"], fullbody_sequence, sets_reps, is_multi_day=False)
-        response += day_text
-        await send_split_message(bot, message.chat.id, response + footer_text, reply_markup=markup)
-        logger.info(f"Displayed {program_type} program for user {user_id}")
-        return True
-
-    if isinstance(program["program"], list) and program_type == "FullBody 3/4":
-        response = intro_text + f"ℹ️ <i>Программа одинакова для всех дней тренировок (3 дня на первой неделе, 4 дня на второй).</i>\n\n<b>Упражнения:</b>\n"
-        day_text = await format_day(1, "", program["program"], fullbody_sequence, sets_reps, is_multi_day=False)
-        response += day_text
-        await send_split_message(bot, message.chat.id, response + footer_text, reply_markup=markup)
-        logger.info(f"Displayed {program_type} program for user {user_id}")
-        return True
-
-    if isinstance(program["program"], list) and program_type == "Hybrid 3.0":
-        response = intro_text
-        muscle_sequences = [muscle_sequence_day1, muscle_sequence_day2, muscle_sequence_day3]
-        day_names = ["Фуллбоди", "Верх", "Низ"]
-        for day_idx, (day_data, muscle_seq, day_name) in enumerate(zip(program["program"], muscle_sequences, day_names), 1):
-            day_text = await format_day(day_idx, day_name, day_data["exercises"], muscle_seq, sets_reps)
-            response += day_text
-        await send_split_message(bot, message.chat.id, response + footer_text, reply_markup=markup)
-        logger.info(f"Displayed {program_type} program for user {user_id}")
-        return True
-
-    if isinstance(program["program"], dict):
-        if program_type == "3 day гибрид верх/низа и фулбади":
-            days_config = [
-                (1, "Фулбади", program["program"].get("day1", []), muscle_sequence_day1),
-                (2, "Верх", program["program"].get("day2", []), muscle_sequence_day2),
-                (3, "Низ", program["program"].get("day3", []), muscle_sequence_day3),
-            ]
-            response = intro_text
-            for day_num, day_name, exercises, muscle_seq in days_config:
-                day_text = await format_day(day_num, day_name, exercises, muscle_seq, sets_reps)
-                response += day_text
-            await send_split_message(bot, message.chat.id, response + footer_text, reply_markup=markup)
-            logger.info(f"Displayed {program_type} program for user {user_id}")
-            return True
-        elif program_type == "4 день верх/низ":
-            days_config = [
-                (1, "Верх (1/3 день)", program["program"].get("day1", []), ul_day1),
-                (2, "Низ (2/4 день)", program["program"].get("day2", []), ul_day2),
-            ]
-            response = intro_text
-            for day_num, day_name, exercises, muscle_seq in days_config:
-                day_text = await format_day(day_num, day_name, exercises, muscle_seq, sets_reps)
-                response += day_text
-            await send_split_message(bot, message.chat.id, response + footer_text, reply_markup=markup)
-            logger.info(f"Displayed {program_type} program for user {user_id}")
-            return True
-        elif program_type == "4 день перед/зад":
-            days_config = [
-                (1, "Перед (1/3 день)", program["program"].get("day1", []), ap_day1),
-                (2, "Зад (2/4 день)", program["program"].get("day2", []), ap_day2),
-            ]
-            response = intro_text
-            for day_num, day_name, exercises, muscle_seq in days_config:
-                day_text = await format_day(day_num, day_name, exercises, muscle_seq, sets_reps)
-                response += day_text
-            await send_split_message(bot, message.chat.id, response + footer_text, reply_markup=markup)
-            logger.info(f"Displayed {program_type} program for user {user_id}")
-            return True
-        elif program_type == "4 день конечности/торс":
-            days_config = [
-                (1, "Конечности (1/3 день)", program["program"].get("day1", []), lt_day1),
-                (2, "Торс (2/4 день)", program["program"].get("day2", []), lt_day2),
-            ]
-            response = intro_text
-            for day_num, day_name, exercises, muscle_seq in days_config:
-                day_text = await format_day(day_num, day_name, exercises, muscle_seq, sets_reps)
-                response += day_text
-            await send_split_message(bot, message.chat.id, response + footer_text, reply_markup=markup)
-            logger.info(f"Displayed {program_type} program for user {user_id}")
-            return True
-    return False
+fsm_storage = BoundedMemoryStorage(cfg.FSM_SESSION_TTL, cfg.FSM_MAX_SESSIONS)
+dp = Dispatcher(storage=fsm_storage)
+
+# Модули мастеров программ импортируются только на фазе регистрации хендлеров
+HANDLER_MODULES = [
+    ("handlers.prog_fullbody2", "register_fullbody2_handlers"),
+    ("handlers.prog_fullbody3", "register_fullbody3_handlers"),
+    ("handlers.prog_hybrid3", "register_hybrid3_handlers"),
+    ("handlers.prog_upperlower2", "register_upperlower2_handlers"),
+    ("handlers.prog_ap2", "register_pushpull2_handlers"),
+    ("handlers.prog_lt2", "register_limbs_torso2_handlers"),
+    ("handlers.prog_fullbody34", "register_fullbody34_handlers"),
+    ("handlers.prog_auto", "register_auto_handlers"),
+    ("handlers.prog_edit", "register_edit_handlers"),
+    ("handlers.prog_compact", "register_compact_handlers"),
+    ("handlers.prog_webapp", "register_webapp_handlers"),
+    ("handlers.prog_history", "register_history_handlers"),
+    ("handlers.prog_log", "register_log_handlers"),
+    ("handlers.prog_progress", "register_progress_handlers"),
+    ("handlers.prog_remind", "register_remind_handlers"),
+    ("handlers.prog_share", "register_share_handlers"),
+    # Последним: устаревшие кнопки мастеров, которые не принял ни один хендлер выше
+    ("handlers.prog_expired", "register_expired_handlers"),
+]
 
 @dp.message(Command("tutorials"))
 async def tutorials_cmd(message: types.Message):
-    await message.answer_photo(
-        photo=FSInputFile(cfg.tutorials_image),
+    sent = await message.answer_photo(
+        photo=media.photo(cfg.tutorials_image),
         caption=(
             "🎥 <b>Туторы и замены упражнений</b>\n"
             "Ознакомьтесь с техникой на нашем канале:\n"
@@ -225,6 +64,7 @@ async def tutorials_cmd(message: types.Message):
         ),
         reply_markup=nav.get_tutorials_btn()
     )
+    media.remember(cfg.tutorials_image, sent)
 
 class DonateStates(StatesGroup):
     waiting_for_amount = State()
@@ -234,14 +74,15 @@ async def donate_cmd(message: types.Message, state: FSMContext):
     markup = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_donate")]
     ])
-    await message.answer_photo(
-        photo=FSInputFile(cfg.donate_image),
+    sent = await message.answer_photo(
+        photo=media.photo(cfg.donate_image),
         caption=(
             "💸 <b>Поддержите проект!</b>\n"
             "Введите количество ⭐️ для пожертвования (целое число):"
         ),
         reply_markup=markup
     )
+    media.remember(cfg.donate_image, sent)
     await state.set_state(DonateStates.waiting_for_amount)
 
 @dp.message(DonateStates.waiting_for_amount, F.text.regexp(r"^\d+$"))
@@ -253,7 +94,7 @@ async def process_amount(message: types.Message, state: FSMContext):
 
     price = [LabeledPrice(label=f"Пожертвование {amount} ⭐️", amount=amount)]
     try:
-        await bot.send_invoice(
+        await message.bot.send_invoice(
             chat_id=message.chat.id,
             title=f"Пожертвование {amount} ⭐️",
             description="Спасибо за поддержку нашего проекта!",
@@ -282,10 +123,10 @@ async def cancel_donate_callback(callback: types.CallbackQuery, state: FSMContex
 @dp.pre_checkout_query()
 async def checkout(pre_q: types.PreCheckoutQuery):
     try:
-        await bot.answer_pre_checkout_query(pre_q.id, ok=True)
+        await pre_q.bot.answer_pre_checkout_query(pre_q.id, ok=True)
     except Exception as e:
         logger.error(f"Error in pre-checkout: {e}")
-        await bot.answer_pre_checkout_query(pre_q.id, ok=False, error_message="Payment error")
+        await pre_q.bot.answer_pre_checkout_query(pre_q.id, ok=False, error_message="Payment error")
 
 @dp.message(F.content_type == ContentType.SUCCESSFUL_PAYMENT)
 async def payment_done(message: types.Message):
@@ -301,7 +142,7 @@ async def check_subscription_handler(callback: types.CallbackQuery):
     user_id = str(callback.from_user.id)
     first_name = callback.from_user.first_name or "User"
 
-    is_subscribed = await check_sub(cfg.CHANNEL, user_id)
+    is_subscribed = await check_sub(cfg.CHANNEL, user_id, bot=callback.bot)
     logger.info(f"User {user_id} subscription check result: {is_subscribed}")
 
     if is_subscribed:
@@ -322,27 +163,18 @@ async def check_subscription_handler(callback: types.CallbackQuery):
         )
         markup = nav.get_channel_btn()
 
-    current_text = callback.message.text or ""
-    current_markup = callback.message.reply_markup
-
-    markup_equal = are_markups_equal(markup, current_markup)
-    logger.debug(f"Text changed: {text != current_text}, Markup equal: {markup_equal}")
-
-    if text != current_text or not markup_equal:
-        try:
-            if callback.message.text:
-                await callback.message.edit_text(text, reply_markup=markup)
-            elif callback.message.caption:
-                await callback.message.edit_caption(caption=text, reply_markup=markup)
-            else:
-                await callback.message.answer(text, reply_markup=markup)
-        except TelegramBadRequest as e:
-            if "message is not modified" in str(e):
-                logger.debug(f"Skipped edit for user {user_id}: message not modified")
-            else:
-                logger.warning(f"Error editing message for user {user_id}: {e}")
-        except Exception as e:
-            logger.warning(f"Unexpected error editing message for user {user_id}: {e}")
+    # Повторное нажатие с тем же результатом не дойдет до API (см. edit_dedup.py)
+    try:
+        if callback.message.text:
+            await callback.message.edit_text(text, reply_markup=markup)
+        elif callback.message.caption:
+            await callback.message.edit_caption(caption=text, reply_markup=markup)
+        else:
+            await callback.message.answer(text, reply_markup=markup)
+    except TelegramBadRequest as e:
+        logger.warning(f"Error editing message for user {user_id}: {e}")
+    except Exception as e:
+        logger.warning(f"Unexpected error editing message for user {user_id}: {e}")
     await callback.answer()
 
 @dp.callback_query(F.data == "start_programma")
@@ -352,7 +184,7 @@ async def start_programma_callback(callback: types.CallbackQuery, state: FSMCont
 
     logger.info(f"Start programma callback for user {user_id}")
 
-    if not await check_sub(cfg.CHANNEL, user_id):
+    if not await check_sub(cfg.CHANNEL, user_id, bot=callback.bot):
         await callback.message.edit_caption(
             caption=(
                 f"❗ <b>{first_name}, подпишись на каналы!</b>\n"
@@ -375,20 +207,39 @@ async def start_programma_callback(callback: types.CallbackQuery, state: FSMCont
     await state.set_state(TrainingProgramStates.choosing_days)
     await callback.answer()
 
+@dp.callback_query(F.data.startswith("page_"))
+async def page_callback(callback: types.CallbackQuery):
+    # Кнопка с номером дня между стрелками ничего не делает
+    if callback.data == "page_noop":
+        await callback.answer()
+        return
+    if not await turn_page(callback.message, str(callback.from_user.id), int(callback.data.removeprefix("page_"))):
+        await callback.answer("❗ Программа изменилась, откройте ее заново: /programma", show_alert=True)
+        return
+    await callback.answer()
+
 @dp.message(Command("start"))
-async def start_cmd(message: types.Message, state: FSMContext):
+async def start_cmd(message: types.Message, state: FSMContext, command: CommandObject):
     user_id = str(message.from_user.id)
     first_name = message.from_user.first_name or "User"
     logger.info(f"Start command received for user {user_id}")
 
     if message.chat.type == "private":
-        if await check_sub(cfg.CHANNEL, user_id):
-            await message.answer_photo(
-                photo=FSInputFile(cfg.start_image),
+        if await check_sub(cfg.CHANNEL, user_id, bot=message.bot):
+            # Ссылка "Поделиться": токен сразу ведет к записи программы, без поиска по хранилищу
+            if command.args and command.args.startswith("share_"):
+                await wait_loaded()
+                if await display_shared_program(message, command.args.removeprefix("share_")):
+                    return
+                await message.answer("❗ Ссылка на программу не найдена, возможно, она устарела.")
+            # Пока хранилище грузится в фоне, счетчик не показываем
+            count_line = f"📊 Количество составленных тренировок сейчас: {count_programs()}\n" if is_loaded() else ""
+            sent = await message.answer_photo(
+                photo=media.photo(cfg.start_image),
                 caption=(
                     f"👋 <b>Привет, {first_name}!</b>\n"
                     f"{cfg.START_MESS_SUB}\n"
-                    f"📊 Количество составленных тренировок сейчас: {count_programs()}\n"
+                    f"{count_line}"
                     "🔥 Готов составить или посмотреть программу?"
                 ),
                 reply_markup=InlineKeyboardMarkup(inline_keyboard=[
@@ -396,14 +247,15 @@ async def start_cmd(message: types.Message, state: FSMContext):
                 ])
             )
         else:
-            await message.answer_photo(
-                photo=FSInputFile(cfg.start_image),
+            sent = await message.answer_photo(
+                photo=media.photo(cfg.start_image),
                 caption=(
                     f"❗ <b>Привет, {first_name}!</b>\n"
                     f"{cfg.NOT_SUB_MESS}"
                 ),
                 reply_markup=nav.get_channel_btn()
             )
+        media.remember(cfg.start_image, sent)
 
 class TrainingProgramStates(StatesGroup):
     choosing_days = State()
@@ -416,15 +268,16 @@ async def programma_cmd(message: types.Message, state: FSMContext):
 
     logger.info(f"Programma command for user {user_id}: {user_program.get(user_id)}")
 
-    if not await check_sub(cfg.CHANNEL, user_id):
-        await message.answer_photo(
-            photo=FSInputFile(cfg.start_image),
+    if not await check_sub(cfg.CHANNEL, user_id, bot=message.bot):
+        sent = await message.answer_photo(
+            photo=media.photo(cfg.start_image),
             caption=(
                 f"❗ <b>{first_name}, подпишись на каналы!</b>\n"
                 f"{cfg.NOT_SUB_MESS}"
             ),
             reply_markup=nav.get_channel_btn()
         )
+        media.remember(cfg.start_image, sent)
         return
 
     if await display_program(message, user_id, first_name):
@@ -460,15 +313,100 @@ async def handle_back_to_days(callback: types.CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
+@dp.message(Command("reload_catalog"))
+async def reload_catalog_cmd(message: types.Message):
+    if message.from_user.id not in cfg.ADMIN_IDS:
+        return
+    try:
+        catalog = await reload_catalog()
+    except Exception as e:
+        logger.error(f"Catalog reload requested by {message.from_user.id} failed: {e}")
+        await message.answer(f"❗ Справочник не обновлен, остается прежняя версия.\nОшибка: {e}")
+        return
+    await message.answer(
+        f"✅ Справочник обновлен: версия {catalog.version}, "
+        f"{len(catalog.exercises)} подгрупп, {len(catalog.exercise_by_id)} упражнений"
+    )
+
+@dp.message(Command("stats"))
+async def stats_cmd(message: types.Message):
+    if message.from_user.id not in cfg.ADMIN_IDS:
+        return
+    types_text = "\n".join(
+        f"    - {program_type}: {count}"
+        for program_type, count in sorted(type_counts.items(), key=lambda item: -item[1])
+    )
+    exercises_text = "\n".join(f"    {place}. {html.escape(line)} — {count}" for place, (line, count) in enumerate(top_exercises(), 1))
+    sessions, session_bytes = fsm_storage.stats()
+    await message.answer(
+        f"📊 <b>Программ сейчас: {count_programs()}</b>\n\n"
+        f"<b>По типам:</b>\n{types_text or '    —'}\n\n"
+        f"<b>Популярные упражнения:</b>\n{exercises_text or '    —'}\n\n"
+        f"🧠 <b>Сессий мастера в памяти:</b> {sessions} (~{session_bytes / 1024:.1f} КБ), "
+        f"истекло {fsm_storage.expired}, вытеснено {fsm_storage.evicted}"
+    )
+
+@dp.message(Command("analytics"))
+async def analytics_cmd(message: types.Message):
+    if message.from_user.id not in cfg.ADMIN_IDS:
+        return
+    await message.answer(
+        "📈 <b>Уникальные пользователи</b> (оценка, ±2%)\n"
+        f"{analytics.format_report(analytics.report())}"
+    )
+
+@dp.message(Command("export"))
+async def export_cmd(message: types.Message, command: CommandObject):
+    if message.from_user.id not in cfg.ADMIN_IDS:
+        return
+    file_format = (command.args or "csv").strip().lower()
+    if file_format not in export.FORMATS:
+        await message.answer("Формат выгрузки: /export csv или /export jsonl")
+        return
+    document = export.ExportFile(file_format, f"programs-{date.today():%Y%m%d}.{file_format}.gz")
+    await message.answer_document(document, caption=f"📦 Программы пользователей ({count_programs()})")
+    logger.info(f"Admin {message.from_user.id} exported {document.rows} rows as {file_format}")
+
+@dp.message(Command("backup"))
+async def backup_cmd(message: types.Message):
+    if message.from_user.id not in cfg.ADMIN_IDS:
+        return
+    name = await backup.create_backup()
+    recent = "\n".join(f"    {name}" for name in backup.list_backups()[:5])
+    await message.answer(
+        f"💾 Резервная копия <code>{name}</code> готова.\n\n<b>Последние архивы:</b>\n{recent}\n\n"
+        "Восстановить: /restore имя_архива"
+    )
+
+@dp.message(Command("restore"))
+async def restore_cmd(message: types.Message, command: CommandObject):
+    if message.from_user.id not in cfg.ADMIN_IDS:
+        return
+    name = (command.args or "").strip()
+    if not name:
+        await message.answer("Укажите архив: /restore имя_архива (список — /backup)")
+        return
+    try:
+        await backup.restore_backup(name)
+    except backup.BackupError as e:
+        await message.answer(f"❌ Не удалось восстановить: {html.escape(str(e))}")
+        return
+    await message.answer(f"✅ Данные восстановлены из <code>{html.escape(name)}</code>: программ {count_programs()}.")
+
+def register_handlers(dp: Dispatcher):
+    for module_name, register_name in HANDLER_MODULES:
+        module = importlib.import_module(module_name)
+        getattr(module, register_name)(dp)
+
 async def main():
-    register_fullbody2_handlers(dp)
-    register_fullbody3_handlers(dp)
-    register_hybrid3_handlers(dp)
-    register_upperlower2_handlers(dp)
-    register_pushpull2_handlers(dp)
-    register_limbs_torso2_handlers(dp)
-    register_fullbody34_handlers(dp)
-    await dp.start_polling(bot)
+    app = Bootstrap(dp, register_handlers)
+    bot = await app.start()
+    try:
+        # SIGINT/SIGTERM останавливают polling, затем dp.shutdown вызывает app.shutdown,
+        # после чего aiogram закрывает HTTP-сессию бота
+        await dp.start_polling(bot, handle_signals=True, close_bot_session=True)
+    finally:
+        app.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,67 @@
+# media.py
+import json
+import logging
+import os
+from typing import Dict
+
+from aiogram import Bot
+from aiogram.types import BufferedInputFile, FSInputFile, Message
+
+logger = logging.getLogger(__name__)
+
+# Путь к картинке -> file_id на серверах Telegram
+file_ids: Dict[str, str] = {}
+_buffers: Dict[str, BufferedInputFile] = {}
+
+def photo(path: str):
+    """Return the best available source for a photo: cached file_id, preloaded bytes or the file itself."""
+    return file_ids.get(path) or _buffers.get(path) or FSInputFile(path)
+
+def remember(path: str, message: Message | None):
+    """Cache the file_id Telegram assigned to a freshly uploaded photo."""
+    if path not in file_ids and message and message.photo:
+        file_ids[path] = message.photo[-1].file_id
+        logger.debug(f"Cached file_id for {path}")
+
+def preload(paths: list[str]):
+    for path in paths:
+        if path in file_ids or path in _buffers:
+            continue
+        try:
+            with open(path, "rb") as f:
+                _buffers[path] = BufferedInputFile(f.read(), filename=os.path.basename(path))
+        except OSError as e:
+            logger.error(f"Failed to preload {path}: {e}")
+
+async def upload(bot: Bot, chat_id: int | str, paths: list[str]):
+    """Upload photos that have no file_id yet to a service chat, so users never wait for the upload."""
+    for path in paths:
+        if path in file_ids:
+            continue
+        try:
+            message = await bot.send_photo(chat_id=chat_id, photo=photo(path), disable_notification=True)
+            remember(path, message)
+        except Exception as e:
+            logger.warning(f"Failed to pre-upload {path} to {chat_id}: {e}")
+
+def load_cache(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            file_ids.update(json.load(f))
+        logger.info(f"Loaded {len(file_ids)} cached file_ids from {path}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Error loading media cache {path}: {e}")
+
+def save_cache(path: str):
+    if not file_ids:
+        return
+    tmp_file = f"{path}.tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(file_ids, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, path)
+        logger.info(f"Saved {len(file_ids)} cached file_ids to {path}")
+    except Exception as e:
+        logger.error(f"Error saving media cache {path}: {e}")
@@ -0,0 +1,243 @@
+# program_view.py
+import logging
+
+from aiogram import types
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from catalog import get_catalog
+from storage import get_program, get_shared, program_hash_of, user_program
+
+logger = logging.getLogger(__name__)
+
+# Старые названия типов, под которыми программы уже лежат в user_program.json
+LEGACY_TYPES = {"4 day перед/зад": "4 день перед/зад"}
+
+# Текст упражнений по дням по (хэш программы, версия справочника); вытесняются самые старые записи
+RENDER_CACHE_SIZE = 4096
+_render_cache: dict[tuple[str, str], tuple[str, ...]] = {}
+# Готовые страницы просмотра по дням (см. display_program): к тексту дней добавлены вступление
+# и число дней пользователя, поэтому ключ — (хэш программы, версия справочника, дней в неделю)
+_page_cache: dict[tuple[str, str, str], tuple[str, tuple[str, ...]]] = {}
+
+FOOTER_TEXT = (
+    "\n💡 Техника: <a href='https://t.me/+IkIXHNQL3vgyYzQ8'>ТуторыЗамены</a>\n"
+    "📋 Просмотр: /programma\n"
+    "🔥 Удачи!"
+)
+
+async def send_split_message(bot, chat_id: int, text: str, reply_markup=None):
+    MAX_MESSAGE_LENGTH = 4000
+    logger.debug(f"Sending message to chat {chat_id}, length: {len(text)}")
+    if len(text) <= MAX_MESSAGE_LENGTH:
+        await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+        return
+    lines = text.split("\n")
+    current_chunk = ""
+    for line in lines:
+        if len(current_chunk) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+            logger.debug(f"Sending chunk of length {len(current_chunk.strip())} for chat {chat_id}")
+            await bot.send_message(chat_id=chat_id, text=current_chunk.strip())
+            current_chunk = ""
+        current_chunk += line + "\n"
+    if current_chunk.strip():
+        logger.debug(f"Sending final chunk of length {len(current_chunk.strip())} for chat {chat_id}")
+        await bot.send_message(chat_id=chat_id, text=current_chunk.strip(), reply_markup=reply_markup)
+
+async def format_day(day_num: int, day_name: str, exercises: list, sets_reps: str, is_multi_day: bool = True):
+    prefix = f"\n{day_num}️⃣ <b>День {day_num} ({day_name})</b>\n" if is_multi_day else ""
+    day_text = prefix
+    muscle_groups = {}
+    subgroup_to_group = get_catalog().subgroup_to_group
+
+    logger.debug(f"Exercises to format: {exercises}")
+
+    for exercise in exercises:
+        try:
+            subgroup, ex_name = exercise.split(": ", 1)
+            group = subgroup_to_group.get(subgroup, "Unknown")
+            if group not in muscle_groups:
+                muscle_groups[group] = {}
+            if subgroup not in muscle_groups[group]:
+                muscle_groups[group][subgroup] = []
+            muscle_groups[group][subgroup].append(ex_name)
+        except ValueError:
+            logger.warning(f"Invalid exercise format: {exercise}")
+            continue
+
+    for group in muscle_groups:
+        day_text += f"💪 <b>{group}</b>\n"
+        for subgroup in muscle_groups[group]:
+            day_text += f"  ➡️ {subgroup}\n"
+            for ex in muscle_groups[group][subgroup]:
+                day_text += f"    - {ex} ({sets_reps})\n"
+    return day_text
+
+def intro_for(program_type: str, days) -> str:
+    intro_text = (
+        "😲 Отличный выбор упражнений, спортсмен, очень оптимальный выбор!\n\n"
+        "📝 <i>Упражнения не написаны по исполнительному порядку, начинай тренировку с мышцы, "
+        "которую ты хочешь акцентировать сегодня, и после переходи на следующие упражнения по своему выбору.</i>\n"
+        "💡 <i>Если ты хочешь постепенно добавлять объем, добавляй! Но только если твое тело это позволяет, не нагружай себя просто так.</i>\n\n"
+    )
+    if program_type == "4 день верх/низ":
+        intro_text += "ℹ️ <i>Программа на 4 дня состоит из двух чередующихся дней (верх/низ). День 1 и 3 — верх, день 2 и 4 — низ.</i>\n\n"
+    elif program_type == "4 день перед/зад":
+        intro_text += "ℹ️ <i>Программа на 4 дня состоит из двух чередующихся дней (перед/зад). День 1 и 3 — перед, день 2 и 4 — зад.</i>\n\n"
+    elif program_type == "4 день конечности/торс":
+        intro_text += "ℹ️ <i>Программа на 4 дня состоит из двух чередующихся дней (конечности/торс). День 1 и 3 — конечности, день 2 и 4 — торс.</i>\n\n"
+    elif program_type == "Hybrid 3.0":
+        intro_text += "ℹ️ <i>Программа на 3 дня состоит из одного дня фуллбоди и двух дней, разделенных на верх и низ.</i>\n\n"
+    intro_text += (
+        f"🏋️ <b>Ваша программа тренировок</b>\n"
+        f"📅 Тип: {program_type}\n"
+        f"🗓 Дней: {days}\n"
+    )
+    return intro_text
+
+async def render_days(program_type: str, program, sets_reps: str) -> list[str] | None:
+    """Текст упражнений программы по дням (без вступления с числом дней); None, если тип не поддерживается."""
+    if isinstance(program, list) and program_type in ["FullBody 2.0", "FullBody 3.0"]:
+        return [
+            "ℹ️ <i>Программа одинакова для всех дней тренировок.</i>\n\n<b>Упражнения:</b>\n"
+            + await format_day(1, "", program, sets_reps, is_multi_day=False)
+        ]
+
+    if isinstance(program, list) and program_type == "FullBody 3/4":
+        return [
+            "ℹ️ <i>Программа одинакова для всех дней тренировок (3 дня на первой неделе, 4 дня на второй).</i>\n\n<b>Упражнения:</b>\n"
+            + await format_day(1, "", program, sets_reps, is_multi_day=False)
+        ]
+
+    if isinstance(program, list) and program_type == "Hybrid 3.0":
+        day_names = ["Фуллбоди", "Верх", "Низ"]
+        return [
+            await format_day(day_idx, day_name, day_data["exercises"], sets_reps)
+            for day_idx, (day_data, day_name) in enumerate(zip(program, day_names), 1)
+        ]
+
+    if isinstance(program, dict):
+        if program_type == "3 day гибрид верх/низа и фулбади":
+            days_config = [
+                (1, "Фулбади", program.get("day1", [])),
+                (2, "Верх", program.get("day2", [])),
+                (3, "Низ", program.get("day3", [])),
+            ]
+        elif program_type == "4 день верх/низ":
+            days_config = [
+                (1, "Верх (1/3 день)", program.get("day1", [])),
+                (2, "Низ (2/4 день)", program.get("day2", [])),
+            ]
+        elif program_type == "4 день перед/зад":
+            days_config = [
+                (1, "Перед (1/3 день)", program.get("day1", [])),
+                (2, "Зад (2/4 день)", program.get("day2", [])),
+            ]
+        elif program_type == "4 день конечности/торс":
+            days_config = [
+                (1, "Конечности (1/3 день)", program.get("day1", [])),
+                (2, "Торс (2/4 день)", program.get("day2", [])),
+            ]
+        else:
+            return None
+        return [await format_day(day_num, day_name, exercises, sets_reps) for day_num, day_name, exercises in days_config]
+    return None
+
+async def _program_days(program_hash: str, load_entry) -> tuple[str, object, tuple[str, ...]] | None:
+    """Тип, число дней и текст упражнений по дням; load_entry(decode) достает запись программы."""
+    # Одинаковые программы хранятся один раз, и текст для них собирается тоже один раз
+    cache_key = (program_hash, get_catalog().version)
+    day_texts = _render_cache.get(cache_key)
+    program = load_entry(decode=day_texts is None)
+    days = program.get('days', 2)
+    program_type = program.get('type', 'Unknown')
+    program_type = LEGACY_TYPES.get(program_type, program_type)
+    if day_texts is None:
+        # Программа хранится как ID упражнений, в текст переводится только здесь
+        sets_reps = program.get('sets_reps', '3 подхода, 3-8 повторений')
+        rendered = await render_days(program_type, program["program"], sets_reps)
+        if rendered is None:
+            return None
+        day_texts = _render_cache[cache_key] = tuple(rendered)
+        while len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.pop(next(iter(_render_cache)))
+    return program_type, days, day_texts
+
+async def program_pages(user_id: str) -> tuple[str, tuple[str, ...]] | None:
+    """Тип программы пользователя и готовые страницы просмотра, по одной на день."""
+    program_hash = program_hash_of(user_id)
+    if not program_hash:
+        return None
+    page_key = (program_hash, get_catalog().version, str(user_program[user_id].get("days")))
+    cached = _page_cache.get(page_key)
+    if cached is not None:
+        return cached
+    rendered = await _program_days(program_hash, lambda decode: get_program(user_id, decode=decode))
+    if rendered is None:
+        return None
+    program_type, days, day_texts = rendered
+    header = f"🏋️ <b>Ваша программа тренировок</b>\n📅 Тип: {program_type}\n🗓 Дней: {days}\n"
+    # Вступление — только на первой странице, на остальных короткий заголовок
+    pages = tuple(
+        (intro_for(program_type, days) if idx == 0 else header) + day_text + FOOTER_TEXT
+        for idx, day_text in enumerate(day_texts)
+    )
+    _page_cache[page_key] = (program_type, pages)
+    while len(_page_cache) > RENDER_CACHE_SIZE:
+        _page_cache.pop(next(iter(_page_cache)))
+    return program_type, pages
+
+def program_markup(page: int, total: int) -> InlineKeyboardMarkup:
+    rows = []
+    if total > 1:
+        rows.append([
+            InlineKeyboardButton(text="◀️", callback_data=f"page_{(page - 1) % total}"),
+            InlineKeyboardButton(text=f"День {page + 1} из {total}", callback_data="page_noop"),
+            InlineKeyboardButton(text="▶️", callback_data=f"page_{(page + 1) % total}")
+        ])
+    rows.append([
+        InlineKeyboardButton(text="✏️ Заменить упражнение", callback_data="edit_program"),
+        InlineKeyboardButton(text="📤 Поделиться", callback_data="share_program")
+    ])
+    rows.append([InlineKeyboardButton(text="🔄 Пересоставить", callback_data="clear_program")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+async def display_program(message: types.Message, user_id: str, first_name: str) -> bool:
+    """Отправляет первую страницу программы: один день, остальные — кнопками ◀️/▶️ (см. turn_page)."""
+    paged = await program_pages(user_id)
+    if paged is None:
+        logger.info(f"No program found for user {user_id}")
+        return False
+    program_type, pages = paged
+    await send_split_message(message.bot, message.chat.id, pages[0], reply_markup=program_markup(0, len(pages)))
+    logger.info(f"Displayed {program_type} program for user {user_id}: {len(pages)} pages")
+    return True
+
+async def turn_page(message: types.Message, user_id: str, page: int) -> bool:
+    """Показывает другой день в том же сообщении; False, если программы нет или страницы уже нет."""
+    paged = await program_pages(user_id)
+    if paged is None or page >= len(paged[1]):
+        return False
+    pages = paged[1]
+    await message.edit_text(pages[page], reply_markup=program_markup(page, len(pages)))
+    return True
+
+async def display_shared_program(message: types.Message, token: str) -> bool:
+    """Программа по ссылке "Поделиться" с кнопкой "Взять себе"; False, если ссылка неизвестна."""
+    # Токен сразу дает хэш программы, так что текст берется из того же кэша, что и у владельцев
+    shared = get_shared(token, decode=False)
+    if not shared:
+        return False
+    rendered = await _program_days(shared["hash"], lambda decode: get_shared(token, decode=decode))
+    if rendered is None:
+        return False
+    program_type, days, day_texts = rendered
+    markup = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📥 Взять себе", callback_data=f"take_{token}")]
+    ])
+    await send_split_message(
+        message.bot, message.chat.id,
+        f"📨 <b>С вами поделились программой</b>\n📅 Тип: {program_type}\n🗓 Дней: {days}\n" + "".join(day_texts),
+        reply_markup=markup
+    )
+    logger.info(f"Displayed shared program {token} in chat {message.chat.id}")
+    return True
@@ -0,0 +1,154 @@
+# programs.py
+import logging
+import random
+from typing import Dict, List
+
+from catalog import get_catalog
+from program_view import LEGACY_TYPES
+from storage import LAYOUT_SINGLE, LAYOUT_HYBRID, LAYOUT_SPLIT, set_program
+from handlers import prog_fullbody2, prog_fullbody3, prog_fullbody34, prog_hybrid3
+from handlers import prog_upperlower2, prog_ap2, prog_lt2
+
+logger = logging.getLogger(__name__)
+
+class ProgramSpec:
+    """Описание типа программы: последовательности мышц по дням и формат хранения."""
+
+    def __init__(self, key: str, title: str, program_type: str, days, sequences: list, layout: str, sets_reps: str):
+        self.key = key
+        self.title = title
+        self.program_type = program_type
+        self.days = days
+        self.sequences = sequences
+        self.layout = layout
+        self.sets_reps = sets_reps
+        self.flat_sequences = [flatten_sequence(seq) for seq in sequences]
+
+
+def flatten_sequence(muscle_seq: list) -> list:
+    """Разворачивает вложенные подгруппы в список (группа, подгруппа, количество)."""
+    flat_sequence = []
+    for group, subgroup, count in muscle_seq:
+        if isinstance(count, list):
+            for sub_subgroup, sub_count in count:
+                flat_sequence.append((group, sub_subgroup, sub_count))
+        else:
+            flat_sequence.append((group, subgroup, count))
+    return flat_sequence
+
+
+PROGRAMS: Dict[str, ProgramSpec] = {spec.key: spec for spec in [
+    ProgramSpec("fullbody2", "💪 Фуллбоди x2", "FullBody 2.0", "2",
+                [prog_fullbody2.muscle_sequence], LAYOUT_SINGLE, prog_fullbody2.SETS_REPS),
+    ProgramSpec("fullbody3", "💪 Фуллбоди x3", "FullBody 3.0", "3",
+                [prog_fullbody3.muscle_sequence], LAYOUT_SINGLE, prog_fullbody3.SETS_REPS),
+    ProgramSpec("hybrid3", "🔄 Гибрид верх-низ + фулбади", "Hybrid 3.0", "3",
+                [prog_hybrid3.muscle_sequence_day1, prog_hybrid3.muscle_sequence_day2, prog_hybrid3.muscle_sequence_day3],
+                LAYOUT_HYBRID, prog_hybrid3.SETS_REPS),
+    ProgramSpec("upperlower2", "🔀 Верх-низ x2", "4 день верх/низ", 4,
+                [prog_upperlower2.muscle_sequence_day1, prog_upperlower2.muscle_sequence_day2],
+                LAYOUT_SPLIT, prog_upperlower2.SETS_REPS),
+    ProgramSpec("ap2", "⚖️ Перед-зад x2", "4 день перед/зад", 4,
+                [prog_ap2.muscle_sequence_day1, prog_ap2.muscle_sequence_day2], LAYOUT_SPLIT, prog_ap2.SETS_REPS),
+    ProgramSpec("lt2", "⚖️ Конечности-торс x2", "4 день конечности/торс", 4,
+                [prog_lt2.muscle_sequence_day1, prog_lt2.muscle_sequence_day2], LAYOUT_SPLIT, prog_lt2.SETS_REPS),
+    ProgramSpec("fullbody34", "🔀 Фбеод", "FullBody 3/4", "3/4",
+                [prog_fullbody34.muscle_sequence], LAYOUT_SINGLE, prog_fullbody34.SETS_REPS),
+]}
+
+SPECS_BY_TYPE: Dict[str, ProgramSpec] = {spec.program_type: spec for spec in PROGRAMS.values()}
+
+
+def spec_for(entry: dict) -> ProgramSpec | None:
+    program_type = entry.get("type")
+    return SPECS_BY_TYPE.get(LEGACY_TYPES.get(program_type, program_type))
+
+
+def expected_counts(spec: ProgramSpec) -> List[int]:
+    return [sum(count for _, _, count in flat_sequence) for flat_sequence in spec.flat_sequences]
+
+
+def build_program(spec: ProgramSpec, days: List[List[str]]) -> dict:
+    """Собирает текстовую "program" из списков строк "Подгруппа: упражнение" по уникальным дням."""
+    if spec.layout == LAYOUT_SINGLE:
+        return days[0]
+    if spec.layout == LAYOUT_HYBRID:
+        return [{"day": idx, "exercises": exercises} for idx, exercises in enumerate(days, 1)]
+    return {
+        "day1": days[0],
+        "day2": days[1],
+        "day3": days[0].copy(),
+        "day4": days[1].copy()
+    }
+
+
+def program_days(spec: ProgramSpec, program) -> List[List[str]]:
+    """Обратная операция к build_program: уникальные дни программы."""
+    if spec.layout == LAYOUT_SINGLE:
+        return [list(program)]
+    if spec.layout == LAYOUT_HYBRID:
+        return [list(day["exercises"]) for day in program]
+    return [list(program.get("day1", [])), list(program.get("day2", []))]
+
+
+def save_program(user_id: str, spec: ProgramSpec, days: List[List[str]], days_per_week=None):
+    set_program(user_id, {
+        "days": days_per_week if days_per_week is not None else spec.days,
+        "program": build_program(spec, days),
+        "type": spec.program_type,
+        "sets_reps": spec.sets_reps
+    })
+    logger.info(f"Saved {spec.program_type} program for user {user_id}")
+
+
+def generate_days(spec: ProgramSpec, seed: str) -> List[List[str]]:
+    """Детерминированно выбирает упражнения для каждого дня по сиду."""
+    rng = random.Random(seed)
+    catalog = get_catalog()
+    days = []
+    for flat_sequence in spec.flat_sequences:
+        chosen = []
+        used = set()
+        for group, subgroup, count in flat_sequence:
+            options = [ex for ex in catalog.get_exercises(group, subgroup) if ex not in used]
+            for exercise in rng.sample(options, min(count, len(options))):
+                used.add(exercise)
+                chosen.append(f"{subgroup}: {exercise}")
+        days.append(chosen)
+    return days
+
+
+def validate_selection(spec: ProgramSpec, payload_days: list, version: str | None = None) -> List[List[str]]:
+    """Проверяет выбор, пришедший целиком (например из Mini App), по тем же последовательностям, что и мастер.
+
+    payload_days[день][номер подгруппы] — список индексов упражнений из каталога или строк своих упражнений.
+    Индексы относятся к версии справочника version, которую клиент получил вместе с каталогом.
+    Возвращает дни в виде строк "Подгруппа: упражнение", при ошибке бросает ValueError с текстом для пользователя,
+    в том числе если версии version уже нет в памяти.
+    """
+    catalog = get_catalog(version, strict=True)
+    if not isinstance(payload_days, list) or len(payload_days) != len(spec.flat_sequences):
+        raise ValueError("неверное количество дней")
+    days = []
+    for day_idx, (flat_sequence, picks) in enumerate(zip(spec.flat_sequences, payload_days), 1):
+        if not isinstance(picks, list) or len(picks) != len(flat_sequence):
+            raise ValueError(f"день {day_idx}: неверное количество групп")
+        lines = []
+        used = set()
+        for (group, subgroup, count), chosen in zip(flat_sequence, picks):
+            if not isinstance(chosen, list) or len(chosen) != count:
+                raise ValueError(f"день {day_idx}: для {subgroup} нужно выбрать {count}")
+            exercises = catalog.get_exercises(group, subgroup)
+            for item in chosen:
+                if isinstance(item, int) and not isinstance(item, bool) and 0 <= item < len(exercises):
+                    exercise = exercises[item]
+                elif isinstance(item, str) and 0 < len(item.strip()) <= 100:
+                    exercise = item.strip()
+                else:
+                    raise ValueError(f"день {day_idx}: неизвестное упражнение для {subgroup}")
+                if exercise in used:
+                    raise ValueError(f"день {day_idx}: {exercise} выбрано дважды")
+                used.add(exercise)
+                lines.append(f"{subgroup}: {exercise}")
+        days.append(lines)
+    return days
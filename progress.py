@@ -0,0 +1,97 @@
+# progress.py
+"""Графики прогресса по журналу тренировок: оценка 1ПМ и тоннаж по дням.
+
+Рисование идет в отдельном процессе (ProcessPoolExecutor), чтобы не блокировать event loop.
+numpy и matplotlib импортируются только в рабочем процессе: без них бот работает, а /progress
+отвечает, что графики недоступны. Готовые картинки не перерисовываются: file_id от Telegram
+кэшируется по (пользователь, упражнение, версия данных).
+"""
+import asyncio
+import importlib.util
+import io
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+import settings.config as cfg
+import workout_log
+
+logger = logging.getLogger(__name__)
+
+CHART_CACHE_SIZE = 1024
+
+_pool: ProcessPoolExecutor | None = None
+# (user_id, exercise_id, версия данных) -> file_id отправленной картинки
+_file_ids: "OrderedDict[Tuple[int, int, int], str]" = OrderedDict()
+
+
+def charts_available() -> bool:
+    return all(importlib.util.find_spec(name) for name in ("numpy", "matplotlib"))
+
+
+def render_chart(title: str, days: List[int], sets: List[int], reps: List[int], weights: List[float]) -> bytes:
+    """Выполняется в рабочем процессе: агрегирует подходы по дням и возвращает PNG."""
+    import numpy as np
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    days = np.asarray(days, dtype=np.int64)
+    sets = np.asarray(sets, dtype=np.float64)
+    reps = np.asarray(reps, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+
+    unique_days, day_idx = np.unique(days, return_inverse=True)
+    # Оценка 1ПМ по формуле Эпли, лучший подход за день
+    one_rep_max = np.zeros(len(unique_days))
+    np.maximum.at(one_rep_max, day_idx, weights * (1 + reps / 30))
+    volume = np.bincount(day_idx, weights=sets * reps * weights)
+    dates = unique_days.astype("datetime64[D]")
+
+    fig, ax = plt.subplots(figsize=(8, 4.5), dpi=120)
+    ax.plot(dates, one_rep_max, marker="o", color="tab:red", label="1ПМ, кг")
+    ax.set_ylabel("1ПМ, кг")
+    volume_ax = ax.twinx()
+    volume_ax.bar(dates, volume, alpha=0.3, color="tab:blue", label="Тоннаж, кг")
+    volume_ax.set_ylabel("Тоннаж, кг")
+    ax.set_zorder(volume_ax.get_zorder() + 1)
+    ax.patch.set_visible(False)
+    ax.set_title(title)
+    fig.autofmt_xdate()
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def chart_key(user_id: int, exercise_id: int) -> Tuple[int, int, int]:
+    """Ключ кэша: новая запись упражнения меняет версию данных, и график рисуется заново."""
+    return user_id, exercise_id, workout_log.data_version(user_id, exercise_id)
+
+def cached_file_id(key: Tuple[int, int, int]) -> str | None:
+    file_id = _file_ids.get(key)
+    if file_id:
+        _file_ids.move_to_end(key)
+    return file_id
+
+def remember(key: Tuple[int, int, int], file_id: str):
+    _file_ids[key] = file_id
+    while len(_file_ids) > CHART_CACHE_SIZE:
+        _file_ids.popitem(last=False)
+
+async def render_progress(user_id: int, exercise_id: int, title: str) -> bytes | None:
+    """PNG с прогрессом упражнения или None, если записей нет."""
+    global _pool
+    columns = workout_log.exercise_columns(user_id, exercise_id)
+    if not columns[0]:
+        return None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=cfg.CHART_WORKERS)
+    return await asyncio.get_running_loop().run_in_executor(_pool, render_chart, title, *columns)
+
+def shutdown():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
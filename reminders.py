@@ -0,0 +1,167 @@
+# reminders.py
+"""Напоминания о днях тренировок.
+
+Один планировщик на процесс: куча (время, пользователь) по всем напоминаниям, настройки лежат
+в storage.reminders и сохраняются вместе с программами. Записи кучи не удаляются при изменении
+напоминания: устаревшие пропускаются при извлечении (их "next" уже другой), а когда мусора
+становится больше, чем живых записей, куча пересобирается.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+import settings.config as cfg
+import storage
+
+logger = logging.getLogger(__name__)
+
+# Дни недели тренировок (0 — понедельник); "3/4" — через день, 3 и 4 тренировки в неделю попеременно
+PLAN_WEEKDAYS = {"2": (0, 3), "3": (0, 2, 4), "4": (0, 1, 3, 4)}
+PLAN_TITLES = {"2": "пн и чт", "3": "пн, ср и пт", "4": "пн, вт, чт и пт", "3/4": "через день"}
+# Сколько напоминаний извлекать из кучи за один проход
+BATCH_SIZE = 500
+# Пропущенное во время простоя напоминание отправляется, если опоздание не больше этого, иначе ждем следующего дня
+CATCH_UP_WINDOW = 2 * 3600
+MAX_SLEEP = 3600
+
+TZ = timezone(timedelta(hours=cfg.REMINDER_UTC_OFFSET))
+_OFFSET = cfg.REMINDER_UTC_OFFSET * 3600
+_EPOCH = date(1970, 1, 1).toordinal()
+
+_heap: List[Tuple[float, str]] = []
+_wakeup = asyncio.Event()
+
+
+def plan_for(days) -> str:
+    """План напоминаний по числу дней программы ("2", "3", "3/4", 4)."""
+    plan = str(days)
+    return plan if plan in PLAN_TITLES else "3"
+
+def is_training_day(reminder: dict, epoch_day: int) -> bool:
+    if reminder["plan"] == "3/4":
+        return (epoch_day + _EPOCH - reminder["anchor"]) % 2 == 0
+    # 1970-01-01 — четверг (weekday 3)
+    return (epoch_day + 3) % 7 in PLAN_WEEKDAYS[reminder["plan"]]
+
+def next_occurrence(reminder: dict, after: float) -> float:
+    """Ближайшее время напоминания строго позже after (unix time)."""
+    # Считаем в целых днях местного времени: без datetime это дешево даже для сотен тысяч напоминаний
+    start = int(after + _OFFSET) // 86400
+    for epoch_day in range(start, start + 8):
+        if is_training_day(reminder, epoch_day):
+            moment = epoch_day * 86400 + reminder["minute"] * 60 - _OFFSET
+            if moment > after:
+                return moment
+    raise ValueError(f"no training day in plan {reminder['plan']}")
+
+
+def _push(user_id: str, reminder: dict):
+    heapq.heappush(_heap, (reminder["next"], user_id))
+    if len(_heap) > 2 * len(storage.reminders) + 64:
+        _heap[:] = [(item["next"], uid) for uid, item in storage.reminders.items()]
+        heapq.heapify(_heap)
+
+def schedule(user_id: str, plan: str, minute: int) -> float:
+    reminder = {"plan": plan, "minute": minute, "anchor": datetime.now(TZ).date().toordinal(), "next": 0}
+    reminder["next"] = next_occurrence(reminder, time.time())
+    storage.reminders[user_id] = reminder
+    _push(user_id, reminder)
+    storage.save_user_program()
+    _wakeup.set()
+    return reminder["next"]
+
+def cancel(user_id: str) -> bool:
+    if storage.reminders.pop(user_id, None) is None:
+        return False
+    storage.save_user_program()
+    return True
+
+def rebuild(now: float):
+    """Куча из сохраненных напоминаний; слишком давно пропущенные переносятся на следующий день тренировки."""
+    for user_id, reminder in storage.reminders.items():
+        if reminder["next"] < now - CATCH_UP_WINDOW:
+            reminder["next"] = next_occurrence(reminder, now)
+    _heap[:] = [(reminder["next"], user_id) for user_id, reminder in storage.reminders.items()]
+    heapq.heapify(_heap)
+
+
+class RateLimiter:
+    """Не чаще rate отправок в секунду: каждая следующая ждет своего слота."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        if self._next > now:
+            await asyncio.sleep(self._next - now)
+        self._next = max(self._next, now) + self.interval
+
+
+async def deliver(bot: Bot, user_id: str):
+    if user_id not in storage.user_program:
+        # Программу удалили — напоминать не о чем
+        cancel(user_id)
+        return
+    for _ in range(2):
+        try:
+            await bot.send_message(
+                chat_id=int(user_id),
+                text="🏋️ <b>Сегодня день тренировки!</b>\nПрограмма — /programma, записать подходы — /log",
+                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                    [InlineKeyboardButton(text="🔕 Отключить напоминания", callback_data="remind_off")]
+                ])
+            )
+            return
+        except TelegramRetryAfter as e:
+            logger.warning(f"Flood control while sending reminder to {user_id}, retrying in {e.retry_after}s")
+            await asyncio.sleep(e.retry_after)
+        except TelegramForbiddenError:
+            logger.info(f"User {user_id} blocked the bot, reminder removed")
+            cancel(user_id)
+            return
+        except Exception as e:
+            logger.error(f"Failed to send reminder to {user_id}: {e}")
+            return
+
+def pop_due(now: float) -> List[str]:
+    due = []
+    while _heap and _heap[0][0] <= now and len(due) < BATCH_SIZE:
+        moment, user_id = heapq.heappop(_heap)
+        reminder = storage.reminders.get(user_id)
+        if reminder is None or reminder["next"] != moment:
+            continue
+        # Следующее время назначаем до отправки: упавшая отправка не приведет к повтору
+        reminder["next"] = next_occurrence(reminder, now)
+        _push(user_id, reminder)
+        due.append(user_id)
+    return due
+
+async def run(bot: Bot):
+    """Фоновый планировщик: ждет ближайшее напоминание, отправляет наступившие пачками."""
+    await storage.wait_loaded()
+    rebuild(time.time())
+    logger.info(f"Reminder scheduler started with {len(storage.reminders)} reminders")
+    limiter = RateLimiter(cfg.REMINDER_RATE)
+    while True:
+        due = pop_due(time.time())
+        if due:
+            storage.save_user_program()
+            for user_id in due:
+                await limiter.wait()
+                await deliver(bot, user_id)
+            continue
+        timeout = min(_heap[0][0] - time.time(), MAX_SLEEP) if _heap else MAX_SLEEP
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
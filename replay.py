@@ -0,0 +1,251 @@
+# replay.py
+"""Запись входящих апдейтов и их воспроизведение без обращения к Telegram.
+
+Запись: переменная окружения CAPTURE_UPDATES=captures/prod.jsonl.gz
+Воспроизведение: python replay.py captures/prod.jsonl.gz [--paced] [--speed 2]
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import secrets
+import shutil
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, get_args
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, TelegramMethod
+from aiogram.types import ChatMemberMember, Message, TelegramObject, Update, User
+
+from edit_dedup import EditDedupMiddleware
+
+logger = logging.getLogger(__name__)
+
+FAKE_TOKEN = "42:replay"
+
+# Ключи, под которыми в апдейте лежат пользователи и чаты
+IDENTITY_KEYS = ("from", "chat", "user", "sender_chat")
+PERSONAL_FIELDS = ("last_name", "username", "phone_number")
+
+
+class UpdateRecorder(BaseMiddleware):
+    """Outer-middleware, дописывающая каждый апдейт в сжатый JSONL файл."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Соль живет только в памяти процесса: ID нельзя восстановить по файлу
+        self._salt = secrets.token_bytes(16)
+        # Файл перезаписывается: t отсчитывается от старта процесса, и вторая запись в тот же файл
+        # начала бы время заново посреди захвата
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._started = time.monotonic()
+        self.recorded = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        try:
+            self.record(event)
+        except Exception as e:
+            logger.error(f"Failed to record update {getattr(event, 'update_id', None)}: {e}")
+        return await handler(event, data)
+
+    def record(self, update: Update):
+        payload = update.model_dump(mode="json", exclude_none=True, by_alias=True)
+        line = {
+            "t": round(time.monotonic() - self._started, 4),
+            "update": anonymize(payload, self._salt)
+        }
+        self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+        self.recorded += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            logger.info(f"Closed capture file {self.path}: {self.recorded} updates recorded")
+
+
+def anonymize_id(value: int, salt: bytes) -> int:
+    digest = hashlib.blake2b(str(abs(value)).encode(), key=salt, digest_size=6).digest()
+    anon = int.from_bytes(digest, "big") % 10**10 or 1
+    return -anon if value < 0 else anon
+
+
+def anonymize(payload: Any, salt: bytes) -> Any:
+    """Заменяет ID пользователей и чатов на стабильные псевдонимы и убирает персональные поля."""
+    if isinstance(payload, list):
+        return [anonymize(item, salt) for item in payload]
+    if not isinstance(payload, dict):
+        return payload
+    result = {}
+    for key, value in payload.items():
+        if key in IDENTITY_KEYS and isinstance(value, dict):
+            value = dict(value)
+            if isinstance(value.get("id"), int):
+                value["id"] = anonymize_id(value["id"], salt)
+            for field in PERSONAL_FIELDS:
+                value.pop(field, None)
+            if "first_name" in value:
+                value["first_name"] = "User"
+        result[key] = anonymize(value, salt)
+    return result
+
+
+def read_capture(path: str):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class ReplaySession(BaseSession):
+    """Сессия-заглушка: отвечает на любые запросы к API правдоподобными объектами."""
+
+    def __init__(self, api_latency: float = 0.0):
+        super().__init__()
+        self.api_latency = api_latency
+        self.calls: Counter = Counter()
+        self._message_id = 0
+
+    async def close(self):
+        pass
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int | None = None):
+        self.calls[type(method).__name__] += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+        return self._fake_result(bot, method)
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    def _fake_result(self, bot: Bot, method: TelegramMethod):
+        if isinstance(method, GetMe):
+            # Нужен, например, create_start_link для ссылки "📤 Поделиться"
+            return User(id=bot.id, is_bot=True, first_name="Replay", username="replay_bot")
+        returning = method.__returning__
+        candidates = get_args(returning) or (returning,)
+        if Message in candidates:
+            self._message_id += 1
+            chat_id = getattr(method, "chat_id", None) or 0
+            return Message.model_validate({
+                "message_id": getattr(method, "message_id", None) or self._message_id,
+                "date": datetime.now(),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": getattr(method, "text", None)
+            }, context={"bot": bot})
+        if ChatMemberMember in candidates:
+            return ChatMemberMember(
+                user={"id": getattr(method, "user_id", 0), "is_bot": False, "first_name": "User"}
+            )
+        if bool in candidates:
+            return True
+        return None
+
+
+async def replay(path: str, paced: bool = False, speed: float = 1.0, concurrency: int = 1, api_latency: float = 0.0):
+    # Импортируем здесь, чтобы запись апдейтов не тянула за собой весь бот
+    import settings.config as cfg
+    import storage
+    import workout_log
+    from main import dp, register_handlers
+
+    register_handlers(dp)
+    storage.load_user_program()
+    # Программы, сохраненные во время прогона, не должны попасть в боевой файл
+    workdir = tempfile.mkdtemp(prefix="replay_")
+    storage.STORAGE_FILE = os.path.join(workdir, os.path.basename(storage.STORAGE_FILE))
+    # Журнал дописывается в сегмент, открытый при загрузке, поэтому грузим его копию
+    log_dir = os.path.join(workdir, "workouts")
+    if os.path.isdir(cfg.WORKOUT_LOG_DIR):
+        shutil.copytree(cfg.WORKOUT_LOG_DIR, log_dir)
+    cfg.WORKOUT_LOG_DIR = log_dir
+    await workout_log.load_async()
+
+    session = ReplaySession(api_latency=api_latency)
+    # Как в боевом боте (см. bootstrap.py): пустые правки не доходят до API
+    session.middleware(EditDedupMiddleware())
+    bot = Bot(token=FAKE_TOKEN, session=session)
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def feed(raw: dict):
+        nonlocal errors
+        async with semaphore:
+            update = Update.model_validate(raw, context={"bot": bot})
+            started = time.perf_counter()
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                errors += 1
+                logger.error(f"Update {update.update_id} failed during replay: {e}")
+            latencies.append(time.perf_counter() - started)
+
+    tasks = []
+    started = time.perf_counter()
+    for record in read_capture(path):
+        if paced:
+            delay = record["t"] / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if concurrency > 1 or paced:
+            tasks.append(asyncio.create_task(feed(record["update"])))
+        else:
+            await feed(record["update"])
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    storage.flush_user_program()
+    workout_log.close()
+
+    report_replay(latencies, errors, elapsed, session.calls)
+    return latencies
+
+
+def report_replay(latencies: list, errors: int, elapsed: float, calls: Counter):
+    if not latencies:
+        print("Capture is empty")
+        return
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    print(f"Updates: {len(latencies)} ({errors} failed) in {elapsed:.3f}s -> {len(latencies) / elapsed:.1f} upd/s")
+    print(
+        f"Latency ms: mean={statistics.mean(latencies) * 1000:.2f} "
+        f"p50={percentile(0.5):.2f} p95={percentile(0.95):.2f} p99={percentile(0.99):.2f}"
+    )
+    print(f"API calls: {sum(calls.values())} " + ", ".join(f"{name}={count}" for name, count in calls.most_common()))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay captured updates against a fake Bot")
+    parser.add_argument("capture", help="gzip JSONL file written with CAPTURE_UPDATES")
+    parser.add_argument("--paced", action="store_true", help="keep the original pacing between updates")
+    parser.add_argument("--speed", type=float, default=1.0, help="pacing multiplier for --paced")
+    parser.add_argument("--concurrency", type=int, default=1, help="updates processed at once when not paced")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated Bot API latency, seconds")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.environ.setdefault("TOKEN", FAKE_TOKEN)
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(replay(args.capture, args.paced, args.speed, args.concurrency, args.api_latency))
@@ -15,94 +15,52 @@ start_image = "images/start.PNG"
 donate_image = "images/donate.PNG"
 tutorials_image = "images/tutorials.PNG"
 
-full_body_program = {
-    "Спина": {
-        "Верх спины": [
-            "Тягя т-грифа с упором/без",
-            "Тяга широким хватом в блоке",
-            "Тяга широким хватом в тренажере",
-            "Келсо шраги + махи на заднюю дельту"
-        ],
-        "Широчайшие": [
-            "Фронтальный + сагиттальный кинан флап",
-            "Тяга верх блока",
-            "Тяга узкой рукоятью на широчайшие"
-        ]
-    },
-    "Грудь": {
-        "Верх груди": [
-            "Жим узким хватом в тренажере",
-            "Махи возле себя в кроссовере на верх груди",
-            "Жим в Смите с узким приведением локтей"
-        ],
-        "Низ груди": [
-            "Бабочка",
-            "Жим гантелей с 90-45° локтей",
-            "Жим штанги с 90-45° локтей",
-            "Жим в тренажере с 90-45° локтей"
-        ]
-    },
-    "Дельты": {
-        "Передняя дельта": [
-            "Жим на переднюю дельту с короткой амплитудой в Смите",
-            "Жим на переднюю дельту с короткой амплитудой со штангой"
-        ],
-        "Средняя дельта": [
-            "Махи в кроссовере",
-            "Махи гантелями",
-            "Махи в тренажере",
-            "Жим передней дельты в фул амплитуду"
-        ],
-        "Задняя дельта": [
-            "Махи задней дельты в бабочке",
-            "Махи задней дельты в кроссовере",
-            "Махи задней дельты с гантелями с упором на грудь"
-        ]
-    },
-    "Руки": {
-        "Бицепс": [
-            "Скамья Скотта с грифом",
-            "Скамья Скотта тренажер",
-            "Mundy curls"
-        ],
-        "Трицепс": [
-            "Jm жим",
-            "Разгибания в кроссовере",
-            "Разгибания с гантелями",
-            "Французский жим",
-            "Брусья"
-        ]
-    },
-    "Ноги": {
-        "Квадрицепсы": [
-            "Разгибания"
-        ],
-        "Бицепс бедра": [
-            "Сгибания ног стоя",
-            "Сгибания ног сидя",
-            "Сгибания ног лёжа"
-        ],
-        "Hinge": [
-            "Гиперэкстензия",
-            "Тяга с строгими ногами"
-        ],
-        "Приводящие": [
-            "Сведение ног сидя",
-            "Сведение ноги стоя",
-            "Подъем колена в разгибании ног"
-        ],
-        "Ягодицы": [
-            "Разведение ног",
-            "Румынская тяга",
-            "Кикбак",
-            "Ягодичный мостик",
-            "Жим ногами",
-            "Присед со штангой",
-            "Пендулум присед",
-            "Присед в гакке"
-        ],
-        "Икры": [
-            "Подъем на носки"
-        ]
-    }
-}
\ No newline at end of file
+# Путь к gzip JSONL файлу для записи входящих апдейтов (см. replay.py), пусто — запись выключена
+CAPTURE_FILE = os.getenv("CAPTURE_UPDATES")
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = "bot.log"
+
+# Служебный чат, куда при старте заранее загружаются картинки (необязательно)
+MEDIA_CHAT_ID = os.getenv("MEDIA_CHAT_ID")
+MEDIA_CACHE_FILE = "media_cache.json"
+
+# Mini App конструктора программ: публичный https-адрес и где слушает встроенный aiohttp сервер
+WEBAPP_URL = os.getenv("WEBAPP_URL", "").rstrip("/")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+
+# Справочник упражнений (см. catalog.py); файл перечитывается без перезапуска бота
+CATALOG_FILE = "settings/exercises.json"
+# Как часто проверять, не изменился ли файл справочника, секунд; 0 — только по /reload_catalog
+CATALOG_WATCH_INTERVAL = float(os.getenv("CATALOG_WATCH_INTERVAL", "30"))
+
+# Telegram ID администраторов через запятую: им доступны служебные команды
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+
+# Файл со скетчами уникальных пользователей по дням (см. analytics.py)
+ANALYTICS_FILE = os.getenv("ANALYTICS_FILE", "analytics.json")
+# Как часто сохранять скетчи, секунд: после падения теряются только отметки за этот промежуток; 0 — только при остановке
+ANALYTICS_SAVE_INTERVAL = float(os.getenv("ANALYTICS_SAVE_INTERVAL", "300"))
+
+# Папка с бинарными сегментами журнала тренировок (см. workout_log.py)
+WORKOUT_LOG_DIR = os.getenv("WORKOUT_LOG_DIR", "workouts")
+# Сколько процессов рисуют графики /progress
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "1"))
+
+# Напоминания о тренировках: часовой пояс пользователей и предел отправок в секунду
+REMINDER_UTC_OFFSET = int(os.getenv("REMINDER_UTC_OFFSET", "3"))
+REMINDER_RATE = float(os.getenv("REMINDER_RATE", "25"))
+
+# Резервные копии (см. backup.py): папка, сколько архивов хранить, как часто снимать, секунд; 0 — только по /backup
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "14"))
+BACKUP_INTERVAL = float(os.getenv("BACKUP_INTERVAL", "86400"))
+
+# Сессии мастеров в памяти (см. fsm_storage.py): через сколько секунд простоя сессия закрывается
+# и сколько сессий держать максимум, лишние вытесняются начиная с давно не тронутых
+FSM_SESSION_TTL = float(os.getenv("FSM_SESSION_TTL", "21600"))
+FSM_MAX_SESSIONS = int(os.getenv("FSM_MAX_SESSIONS", "20000"))
+
+# Сколько секунд при остановке ждать завершения уже начатых хендлеров
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "25"))
@@ -1,5 +1,6 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+import settings.config as cfg
 
 def get_channel_btn() -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardBuilder()
@@ -50,6 +51,30 @@ def get_program_keyboard(days: str) -> InlineKeyboardMarkup:
     else:
         buttons = []
 
-    buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_days"))
+    # Под каждым типом — сборка в одно нажатие (handlers/prog_auto.py)
+    # и выбор целого дня одним сообщением (handlers/prog_compact.py),
+    # рядом с типом — конструктор в Mini App, если задан WEBAPP_URL (handlers/prog_webapp.py)
+    rows = []
+    for btn in buttons:
+        key = btn.callback_data.replace("prog_", "", 1)
+        if cfg.WEBAPP_URL:
+            rows.append([btn, InlineKeyboardButton(text="🧩 Конструктор", callback_data=f"wa_{key}")])
+        else:
+            rows.append([btn])
+        rows.append([
+            InlineKeyboardButton(text="⚡ Собрать автоматически", callback_data=f"auto_{key}"),
+            InlineKeyboardButton(text="📋 Весь день списком", callback_data=f"cmp_start_{key}")
+        ])
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_days")])
 
-    return InlineKeyboardMarkup(inline_keyboard=[[btn] for btn in buttons])
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def get_auto_program_keyboard(key: str, attempt: int) -> InlineKeyboardMarkup:
+    keyboard = InlineKeyboardBuilder()
+    keyboard.row(
+        InlineKeyboardButton(text="🎲 Другой вариант", callback_data=f"auto_{key}_{attempt + 1}")
+    )
+    keyboard.row(
+        InlineKeyboardButton(text="✏️ Заменить упражнение", callback_data="edit_program")
+    )
+    return keyboard.as_markup()
\ No newline at end of file
@@ -1,46 +1,536 @@
 # storage.py
+import asyncio
+import base64
+import hashlib
 import json
 import os
 import logging
+import sys
+import time
 from typing import Dict, List
 
-logging.basicConfig(level=logging.INFO)
+from catalog import get_catalog
+
 logger = logging.getLogger(__name__)
 
 STORAGE_FILE = "user_program.json"
+# Сохранения в течение этого времени склеиваются в одну запись файла
+SAVE_DELAY = 1.0
+# Версия формата файла: 2 — программы хранятся как ID упражнений (см. encode_program),
+# 3 — одинаковые программы хранятся один раз (см. set_program)
+STORAGE_FORMAT = 3
+
+# Как программа выглядит в тексте (decode_program)
+LAYOUT_SINGLE = "single"  # список упражнений, одинаковый для всех дней
+LAYOUT_HYBRID = "hybrid"  # [{"day": 1, "exercises": [...]}, ...]
+LAYOUT_SPLIT = "split"    # {"day1": ..., "day4": ...}, день 3 и 4 повторяют 1 и 2
 
 # Initialize user_program dictionary
-user_program: Dict[str, Dict[str, List[str]]] = {}
+# Пользователь -> {"days": дней в неделю, "hash": ключ общей записи в programs}
+user_program: Dict[str, dict] = {}
 
-# Load data at startup
-try:
-    if os.path.exists(STORAGE_FILE):
-        with open(STORAGE_FILE, "r", encoding="utf-8") as f:
-            user_program = json.load(f)
-            # Ensure keys are strings
-            user_program = {str(k): v for k, v in user_program.items()}
-            logger.info(f"Loaded user_program from {STORAGE_FILE}: {len(user_program)} users")
-    else:
+# Хэш -> одна запись {"type", "sets_reps", "program"} на всех пользователей с такой программой;
+# программа закодирована: {"layout": ..., "days": [[ID, ...], ...], "order": [...]}
+programs: Dict[str, dict] = {}
+# Сколько пользователей ссылается на каждую запись programs; запись без ссылок удаляется
+program_refs: Dict[str, int] = {}
+
+# Свои упражнения пользователей, по одной строке "Подгруппа: упражнение" на всех;
+# в программах на них ссылаются отрицательные ID: -1 — custom_exercises[0]
+custom_exercises: List[str] = []
+_custom_index: Dict[str, int] = {}
+# Растет на 1 с каждым новым своим упражнением и при каждой замене списка целиком
+# (загрузка, /restore), чтобы индексы по списку (suggest.py) замечали замену
+custom_generation = 0
+
+# История программ: пользователь -> {"base": самая старая хранимая версия целиком, "deltas": [...]},
+# каждая следующая версия хранится как изменения ID упражнений относительно предыдущей (см. _diff)
+HISTORY_LIMIT = 10
+VERSION_FIELDS = ("type", "sets_reps", "week", "layout", "order")
+history: Dict[str, dict] = {}
+
+# Программы, которыми поделились (см. share_program): токен ссылки -> {"days", "hash"}.
+# Токен выводится из содержимого, поэтому одна программа дает одну ссылку; каждая запись
+# держит ссылку на programs, так что программа доступна по ссылке и после ее пересоставления автором
+shared: Dict[str, dict] = {}
+
+# Напоминания о тренировках: пользователь -> {"plan", "minute", "anchor", "next"} (см. reminders.py)
+reminders: Dict[str, dict] = {}
+
+# Популярность по пользователям: сколько программ каждого типа и сколько программ с каждым упражнением.
+# Обновляется на каждом сохранении и удалении (см. _count) и пишется в файл вместе с программами
+type_counts: Dict[str, int] = {}
+exercise_counts: Dict[int, int] = {}
+
+# Выставляется, когда данные из файла загружены (см. bootstrap.py)
+_loaded = asyncio.Event()
+_dirty = False
+_flush_handle: asyncio.TimerHandle | None = None
+
+def read_user_program() -> dict:
+    """Read and parse STORAGE_FILE without touching user_program."""
+    try:
+        if os.path.exists(STORAGE_FILE):
+            with open(STORAGE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
         logger.warning(f"File {STORAGE_FILE} does not exist. Starting with empty user_program.")
-except json.JSONDecodeError as e:
-    logger.error(f"Failed to parse {STORAGE_FILE}: {e}. Starting with empty user_program.")
-    user_program = {}
-except Exception as e:
-    logger.error(f"Error loading {STORAGE_FILE}: {e}. Starting with empty user_program.")
-    user_program = {}
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse {STORAGE_FILE}: {e}. Starting with empty user_program.")
+    except Exception as e:
+        logger.error(f"Error loading {STORAGE_FILE}: {e}. Starting with empty user_program.")
+    return {}
+
+def load_user_program():
+    """Load STORAGE_FILE into user_program."""
+    _apply_loaded(read_user_program())
+
+async def load_user_program_async():
+    """Parse STORAGE_FILE in a worker thread; the dict itself is updated on the event loop."""
+    _apply_loaded(await asyncio.to_thread(read_user_program))
+
+def _apply_loaded(data: dict):
+    global _dirty, custom_generation
+    custom_exercises.clear()
+    custom_generation += 1
+    _custom_index.clear()
+    # Обновляем на месте: модули держат ссылку на user_program
+    user_program.clear()
+    programs.clear()
+    program_refs.clear()
+    type_counts.clear()
+    exercise_counts.clear()
+    history.clear()
+    reminders.clear()
+    shared.clear()
+
+    file_format = data.get("format")
+    for line in data.get("custom", []) if file_format else []:
+        _intern_custom(line)
+    if file_format == STORAGE_FORMAT:
+        for program_hash, record in data.get("programs", {}).items():
+            programs[program_hash] = _intern_record(record)
+        for user_id, ref in data.get("users", {}).items():
+            if ref.get("hash") not in programs:
+                logger.error(f"Dropping program of user {user_id}: unknown hash {ref.get('hash')}")
+                continue
+            user_program[str(user_id)] = ref
+            program_refs[ref["hash"]] = program_refs.get(ref["hash"], 0) + 1
+        for token, ref in data.get("shared", {}).items():
+            if ref.get("hash") in programs:
+                shared[token] = ref
+                program_refs[ref["hash"]] = program_refs.get(ref["hash"], 0) + 1
+        for program_hash in [h for h in programs if h not in program_refs]:
+            del programs[program_hash]
+        _load_stats(data.get("stats", {}))
+        history.update(data.get("history", {}))
+        reminders.update(data.get("reminders", {}))
+    else:
+        # Старый файл (программы строками или формат 2 с программой у каждого пользователя).
+        # В новом формате он запишется при следующем сохранении или остановке бота
+        users = data.get("users", {}) if file_format else data
+        _dirty = bool(users)
+        logger.info(f"Migrating {len(users)} programs in {STORAGE_FILE} to format {STORAGE_FORMAT}")
+        for user_id, entry in users.items():
+            # Ensure keys are strings
+            _link(str(user_id), entry)
+
+    _loaded.set()
+    logger.info(
+        f"Loaded user_program from {STORAGE_FILE}: {len(user_program)} users, "
+        f"{len(programs)} distinct programs, {len(custom_exercises)} custom exercises"
+    )
+
+def is_loaded() -> bool:
+    return _loaded.is_set()
+
+async def wait_loaded():
+    await _loaded.wait()
 
 def save_user_program():
-    """Save user_program to file."""
+    """Schedule saving user_program to file; repeated calls within SAVE_DELAY are coalesced."""
+    global _dirty, _flush_handle
+    if not is_loaded():
+        logger.error(f"Refusing to save {STORAGE_FILE} before it was loaded")
+        return
+    _dirty = True
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        flush_user_program()
+        return
+    if _flush_handle is None:
+        _flush_handle = loop.call_later(SAVE_DELAY, flush_user_program)
+
+def _intern_custom(line: str) -> int:
+    global custom_generation
+    if line not in _custom_index:
+        custom_exercises.append(line)
+        custom_generation += 1
+        _custom_index[line] = len(custom_exercises)
+    return -_custom_index[line]
+
+def encode_exercise(line: str) -> int:
+    subgroup, _, name = line.partition(": ")
+    exercise_id = get_catalog().exercise_index.get((subgroup, name))
+    return exercise_id if exercise_id is not None else _intern_custom(line)
+
+def decode_exercise(exercise_id: int) -> str:
+    if exercise_id < 0:
+        return custom_exercises[-exercise_id - 1]
+    found = get_catalog().exercise_by_id.get(exercise_id)
+    if not found:
+        logger.warning(f"Exercise {exercise_id} is missing from catalog {get_catalog().version}")
+        return f"Упражнение #{exercise_id}"
+    return f"{found[1]}: {found[2]}"
+
+def encode_program(program) -> dict:
+    """Текстовую программу (список, список дней или {"dayN": ...}) переводит в ID; одинаковые дни хранятся один раз."""
+    if isinstance(program, dict) and "layout" in program:
+        return program
+    if isinstance(program, dict):
+        layout = LAYOUT_SPLIT
+        day_lists = [program[f"day{idx}"] for idx in range(1, len(program) + 1)]
+    elif program and isinstance(program[0], dict):
+        layout = LAYOUT_HYBRID
+        day_lists = [day["exercises"] for day in program]
+    else:
+        layout = LAYOUT_SINGLE
+        day_lists = [program]
+
+    days, order = _unique_days([[encode_exercise(line) for line in exercises] for exercises in day_lists])
+    return {"layout": layout, "days": days, "order": order}
+
+def _unique_days(day_lists: List[List[int]]) -> tuple[List[List[int]], List[int]]:
+    days: List[List[int]] = []
+    order = []
+    for exercises in day_lists:
+        if exercises not in days:
+            days.append(exercises)
+        order.append(days.index(exercises))
+    return days, order
+
+def decode_program(encoded: dict):
+    """Обратно в текстовый вид, в котором программу показывают пользователю."""
+    if not isinstance(encoded, dict) or "layout" not in encoded:
+        return encoded
+    days = [[decode_exercise(exercise_id) for exercise_id in day] for day in encoded["days"]]
+    if encoded["layout"] == LAYOUT_SINGLE:
+        return days[0]
+    if encoded["layout"] == LAYOUT_HYBRID:
+        return [{"day": idx, "exercises": list(days[day])} for idx, day in enumerate(encoded["order"], 1)]
+    return {f"day{idx}": list(days[day]) for idx, day in enumerate(encoded["order"], 1)}
+
+def _intern_record(record: dict) -> dict:
+    # Тип и подходы одинаковы у многих программ — держим по одной копии строки
+    for key in ("type", "sets_reps"):
+        if isinstance(record.get(key), str):
+            record[key] = sys.intern(record[key])
+    return record
+
+def _shared_record(entry: dict) -> tuple[str, dict]:
+    """Нормализованная запись программы и ее хэш: тип + ID упражнений + подходы."""
+    program = entry.get("program")
+    try:
+        program = encode_program(program) if program else program
+    except Exception as e:
+        logger.error(f"Keeping program as is, failed to encode it: {e}")
+    record = {"type": entry.get("type"), "sets_reps": entry.get("sets_reps"), "program": program}
+    normalized = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest(), record
+
+def _bump(counts: dict, key, delta: int):
+    value = counts.get(key, 0) + delta
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+
+def _count(record: dict, delta: int):
+    """Учитывает (delta=1) или снимает (delta=-1) одного пользователя с программой record."""
+    if record.get("type"):
+        _bump(type_counts, record["type"], delta)
+    program = record.get("program")
+    if isinstance(program, dict) and "layout" in program:
+        for exercise_id in {exercise_id for day in program["days"] for exercise_id in day}:
+            _bump(exercise_counts, exercise_id, delta)
+
+def _load_stats(stats: dict):
+    """Счетчики из файла; если их нет или они не сходятся с программами, пересчитываем один раз."""
+    type_counts.update(stats.get("types", {}))
+    exercise_counts.update({int(exercise_id): count for exercise_id, count in stats.get("exercises", {}).items()})
+    counted = sum(type_counts.values())
+    expected = sum(1 for ref in user_program.values() if programs[ref["hash"]].get("type"))
+    if counted != expected:
+        logger.warning(f"Recounting popularity stats: {counted} counted, {expected} programs stored")
+        type_counts.clear()
+        exercise_counts.clear()
+        for ref in user_program.values():
+            _count(programs[ref["hash"]], 1)
+
+def _link(user_id: str, entry: dict):
+    program_hash, record = _shared_record(entry)
+    if program_hash not in programs:
+        programs[program_hash] = _intern_record(record)
+    program_refs[program_hash] = program_refs.get(program_hash, 0) + 1
+    _count(programs[program_hash], 1)
+    previous = user_program.get(user_id)
+    user_program[user_id] = {"days": entry.get("days"), "hash": program_hash}
+    if previous:
+        _count(programs[previous["hash"]], -1)
+        _release(previous["hash"])
+
+def _release(program_hash: str):
+    program_refs[program_hash] -= 1
+    if not program_refs[program_hash]:
+        del program_refs[program_hash]
+        del programs[program_hash]
+
+def _version_of(ref: dict) -> dict | None:
+    """Версия программы для истории: поля VERSION_FIELDS и закодированные дни."""
+    record = programs[ref["hash"]]
+    program = record.get("program")
+    if not (isinstance(program, dict) and "layout" in program):
+        return None
+    return {
+        "type": record.get("type"),
+        "sets_reps": record.get("sets_reps"),
+        "week": ref.get("days"),
+        "layout": program["layout"],
+        "order": program["order"],
+        "days": [list(day) for day in program["days"]]
+    }
+
+def _diff(old: dict, new: dict) -> dict:
+    """Изменения new относительно old: поменявшиеся поля, длины дней и пары [позиция, ID] по дням."""
+    delta = {key: new[key] for key in VERSION_FIELDS if new[key] != old[key]}
+    lens = [len(day) for day in new["days"]]
+    if lens != [len(day) for day in old["days"]]:
+        delta["lens"] = lens
+    ops = {}
+    for idx, day in enumerate(new["days"]):
+        previous = old["days"][idx] if idx < len(old["days"]) else []
+        changed = [[pos, exercise_id] for pos, exercise_id in enumerate(day)
+                   if pos >= len(previous) or previous[pos] != exercise_id]
+        if changed:
+            ops[str(idx)] = changed
+    if ops:
+        delta["ops"] = ops
+    return delta
+
+def _apply(version: dict, delta: dict) -> dict:
+    new = {key: delta.get(key, version[key]) for key in VERSION_FIELDS}
+    new["days"] = []
+    for idx, length in enumerate(delta.get("lens") or [len(day) for day in version["days"]]):
+        previous = version["days"][idx] if idx < len(version["days"]) else []
+        day = (previous + [0] * length)[:length]
+        for pos, exercise_id in delta.get("ops", {}).get(str(idx), ()):
+            day[pos] = exercise_id
+        new["days"].append(day)
+    new["t"] = delta["t"]
+    return new
+
+def history_versions(user_id: str) -> List[dict]:
+    """Все хранимые версии программы пользователя, от старой к новой."""
+    entry = history.get(user_id)
+    if not entry:
+        return []
+    versions = [entry["base"]]
+    for delta in entry["deltas"]:
+        versions.append(_apply(versions[-1], delta))
+    return versions
+
+def _remember(user_id: str):
+    version = _version_of(user_program[user_id])
+    if version is None:
+        return
+    version["t"] = int(time.time())
+    entry = history.get(user_id)
+    if not entry:
+        history[user_id] = {"base": version, "deltas": []}
+        return
+    versions = history_versions(user_id)
+    delta = _diff(versions[-1], version)
+    if not delta:
+        return
+    delta["t"] = version["t"]
+    entry["deltas"].append(delta)
+    if len(entry["deltas"]) >= HISTORY_LIMIT:
+        # Самая старая версия уходит: следующая за ней становится базой
+        entry["base"] = versions[1]
+        del entry["deltas"][0]
+
+def set_program(user_id: str, entry: dict):
+    """Сохраняет программу пользователя; entry["program"] — в текстовом виде, как его показывают."""
+    _link(user_id, entry)
+    _remember(user_id)
+    save_user_program()
+
+def replace_exercise(user_id: str, day_idx: int, pos: int, exercise_id: int) -> bool:
+    """Меняет одно упражнение программы прямо в ID, без перевода всей программы в текст и обратно.
+
+    day_idx — номер дня, как его показывают при выборе: в split-программе день 1 — это дни 1 и 3.
+    """
+    ref = user_program.get(user_id)
+    record = programs[ref["hash"]] if ref else None
+    program = record.get("program") if record else None
+    if not isinstance(program, dict) or "layout" not in program:
+        return False
+    day_lists = [list(program["days"][day]) for day in program["order"]]
+    if program["layout"] == LAYOUT_SINGLE:
+        targets = range(len(day_lists))
+    elif program["layout"] == LAYOUT_SPLIT:
+        targets = range(day_idx, len(day_lists), 2)
+    else:
+        targets = [day_idx]
+    if not targets or any(day >= len(day_lists) or pos >= len(day_lists[day]) for day in targets):
+        return False
+    for day in targets:
+        day_lists[day][pos] = exercise_id
+    days, order = _unique_days(day_lists)
+    set_program(user_id, {
+        "days": ref.get("days"),
+        "type": record.get("type"),
+        "sets_reps": record.get("sets_reps"),
+        "program": {"layout": program["layout"], "days": days, "order": order}
+    })
+    return True
+
+def is_current_version(user_id: str, version: dict) -> bool:
+    ref = user_program.get(user_id)
+    current = _version_of(ref) if ref else None
+    return current is not None and not _diff(version, current)
+
+def restore_version(user_id: str, version: dict):
+    """Делает версию из истории текущей программой; дни уже закодированы, так что перекодировать нечего."""
+    set_program(user_id, {
+        "days": version["week"],
+        "type": version["type"],
+        "sets_reps": version["sets_reps"],
+        "program": {"layout": version["layout"], "days": version["days"], "order": version["order"]}
+    })
+
+def delete_program(user_id: str) -> bool:
+    previous = user_program.pop(user_id, None)
+    if not previous:
+        return False
+    _count(programs[previous["hash"]], -1)
+    _release(previous["hash"])
+    save_user_program()
+    return True
+
+def program_hash_of(user_id: str) -> str | None:
+    """Хэш программы пользователя, если она есть и не пустая."""
+    ref = user_program.get(user_id)
+    if not ref or not programs[ref["hash"]].get("program"):
+        return None
+    return ref["hash"]
+
+def _entry(ref: dict, decode: bool) -> dict:
+    record = programs[ref["hash"]]
+    entry = {key: value for key, value in record.items() if value is not None}
+    if ref.get("days") is not None:
+        entry["days"] = ref["days"]
+    if decode and entry.get("program"):
+        entry["program"] = decode_program(entry["program"])
+    entry["hash"] = ref["hash"]
+    return entry
+
+def get_program(user_id: str, decode: bool = True) -> dict | None:
+    """Запись пользователя в прежнем виде: days, type, sets_reps и program (в тексте, если decode)."""
+    ref = user_program.get(user_id)
+    if not ref:
+        return None
+    return _entry(ref, decode)
+
+def share_program(user_id: str) -> str | None:
+    """Токен ссылки на программу пользователя: короткий хэш от программы и числа дней."""
+    program_hash = program_hash_of(user_id)
+    if not program_hash:
+        return None
+    days = user_program[user_id].get("days")
+    digest = hashlib.blake2b(f"{program_hash}:{days}".encode("utf-8"), digest_size=6).digest()
+    token = base64.urlsafe_b64encode(digest).decode("ascii")
+    if token not in shared:
+        shared[token] = {"days": days, "hash": program_hash}
+        program_refs[program_hash] += 1
+        save_user_program()
+    return token
+
+def get_shared(token: str, decode: bool = True) -> dict | None:
+    """Программа по токену ссылки, в том же виде, что и get_program."""
+    ref = shared.get(token)
+    return _entry(ref, decode) if ref else None
+
+def take_shared(user_id: str, token: str) -> bool:
+    """Делает программу по ссылке программой пользователя; прежняя остается в истории."""
+    entry = get_shared(token, decode=False)
+    if not entry:
+        return False
+    entry.pop("hash")
+    set_program(user_id, entry)
+    return True
+
+def _payload() -> dict:
+    return {
+        "format": STORAGE_FORMAT,
+        "custom": custom_exercises,
+        "programs": programs,
+        "users": user_program,
+        "stats": {"types": type_counts, "exercises": exercise_counts},
+        "history": history,
+        "reminders": reminders,
+        "shared": shared
+    }
+
+def snapshot() -> bytes:
+    """Содержимое STORAGE_FILE на текущий момент, независимо от отложенной записи.
+
+    Сериализация идет синхронно в event loop, поэтому снимок согласован: ни один хендлер
+    не изменит данные посередине (см. backup.py).
+    """
+    return json.dumps(_payload(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def restore_snapshot(raw: bytes):
+    """Заменяет все данные снимком из snapshot() и сразу записывает их в STORAGE_FILE."""
+    global _dirty
+    _apply_loaded(json.loads(raw))
+    _dirty = True
+    flush_user_program()
+
+def flush_user_program():
+    """Write pending changes atomically: temp file + rename, so a kill never leaves a torn file."""
+    global _dirty, _flush_handle
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    if not _dirty:
+        return
+    _dirty = False
+    tmp_file = f"{STORAGE_FILE}.tmp"
     try:
         logger.debug(f"Saving user_program: {user_program}")
-        with open(STORAGE_FILE, "w", encoding="utf-8") as f:
-            json.dump(user_program, f, ensure_ascii=False, indent=2)
-        logger.info(f"Saved user_program to {STORAGE_FILE}: {len(user_program)} users")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(_payload(), f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, STORAGE_FILE)
+        logger.info(f"Saved user_program to {STORAGE_FILE}: {len(user_program)} users, {len(programs)} distinct programs")
     except Exception as e:
+        _dirty = True
         logger.error(f"Error saving {STORAGE_FILE}: {e}")
 
 def count_programs() -> int:
     """Count the total number of training programs created."""
     count = len(user_program)
     logger.debug(f"Counted {count} programs in user_program")
-    return count
\ No newline at end of file
+    return count
+
+def popular_first(exercise_ids, exercises) -> List[tuple]:
+    """Пары (позиция, упражнение) подгруппы: сначала чаще выбираемые, при равенстве — порядок справочника."""
+    order = sorted(range(len(exercises)), key=lambda idx: (-exercise_counts.get(exercise_ids[idx], 0), idx))
+    return [(idx, exercises[idx]) for idx in order]
+
+def top_exercises(limit: int = 10) -> List[tuple]:
+    """Самые популярные упражнения: пары (строка "Подгруппа: упражнение", число программ)."""
+    top = sorted(exercise_counts.items(), key=lambda item: -item[1])[:limit]
+    return [(decode_exercise(exercise_id), count) for exercise_id, count in top]
\ No newline at end of file
@@ -0,0 +1,167 @@
+# suggest.py
+"""Подсказки "Вы имели в виду…?" для своих упражнений.
+
+Триграммный индекс по справочнику и ранее введенным своим упражнениям (storage.custom_exercises),
+отдельный для каждой подгруппы. Индекс перестраивается при смене версии справочника,
+новые свои упражнения дописываются в него по мере появления.
+"""
+import html
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from aiogram import types
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+import storage
+from catalog import get_catalog
+
+logger = logging.getLogger(__name__)
+
+# Минимальное сходство (коэффициент Дайса по триграммам), с которого показываем подсказку
+MIN_SCORE = 0.45
+SUGGEST_LIMIT = 3
+
+_WORDS = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Нижний регистр, ё -> е, только слова через один пробел."""
+    return " ".join(_WORDS.findall(text.lower().replace("ё", "е")))
+
+
+def trigrams(text: str) -> frozenset:
+    padded = f"  {normalize(text)} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class SubgroupIndex:
+    """Упражнения одной подгруппы: названия, их триграммы и обратный индекс триграмма -> номера."""
+
+    def __init__(self):
+        self.names: List[str] = []
+        # ID упражнения из справочника или None для своего
+        self.ids: List[int | None] = []
+        self.sizes: List[int] = []
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        self.exact: Dict[str, int] = {}
+
+    def add(self, name: str, exercise_id: int | None = None):
+        key = normalize(name)
+        if not key or key in self.exact:
+            return
+        idx = len(self.names)
+        grams = trigrams(name)
+        self.names.append(name)
+        self.ids.append(exercise_id)
+        self.sizes.append(len(grams))
+        self.exact[key] = idx
+        for gram in grams:
+            self.postings[gram].append(idx)
+
+    def search(self, text: str, limit: int) -> List[Tuple[float, int]]:
+        grams = trigrams(text)
+        common: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for idx in self.postings.get(gram, ()):
+                common[idx] += 1
+        scored = [(2 * hits / (len(grams) + self.sizes[idx]), idx) for idx, hits in common.items()]
+        # При равном сходстве упражнения из справочника идут первыми
+        scored.sort(key=lambda item: (-item[0], self.ids[item[1]] is None, item[1]))
+        return [item for item in scored[:limit] if item[0] >= MIN_SCORE]
+
+
+_indexes: Dict[str, SubgroupIndex] = {}
+_version: str | None = None
+_customs_seen = 0
+_generation = -1
+
+
+def _refresh() -> Dict[str, SubgroupIndex]:
+    global _version, _customs_seen, _generation
+    catalog = get_catalog()
+    customs = storage.custom_exercises
+    # Поколение выросло ровно на число новых строк — список только дописывался; иначе его заменили
+    appended_only = storage.custom_generation - _generation == len(customs) - _customs_seen
+    if catalog.version != _version or not appended_only:
+        _indexes.clear()
+        for subgroup, names in catalog.exercises.items():
+            index = _indexes[subgroup] = SubgroupIndex()
+            for name, exercise_id in zip(names, catalog.exercise_ids[subgroup]):
+                index.add(name, exercise_id)
+        _version, _customs_seen = catalog.version, 0
+    # Свои упражнения только дописываются в конец списка, так что добавляем лишь новые
+    for line in customs[_customs_seen:]:
+        subgroup, _, name = line.partition(": ")
+        if subgroup in _indexes:
+            _indexes[subgroup].add(name)
+    _customs_seen, _generation = len(customs), storage.custom_generation
+    return _indexes
+
+
+def canonical_exercise(subgroup: str, text: str) -> str | None:
+    """Уже известное написание упражнения, если текст совпадает с ним с точностью до регистра и пробелов."""
+    index = _refresh().get(subgroup)
+    if index is None:
+        return None
+    idx = index.exact.get(normalize(text))
+    return index.names[idx] if idx is not None else None
+
+
+def suggest_exercises(subgroup: str, text: str, limit: int = SUGGEST_LIMIT, exclude=()) -> List[Tuple[str, int | None]]:
+    """Похожие упражнения подгруппы: пары (название, ID в справочнике или None для своего)."""
+    index = _refresh().get(subgroup)
+    if index is None:
+        return []
+    excluded = set(exclude)
+    matches = index.search(text, limit + len(excluded))
+    return [(index.names[idx], index.ids[idx]) for _, idx in matches if index.names[idx] not in excluded][:limit]
+
+
+async def offer_suggestions(message: types.Message, state: FSMContext, data: dict, subgroup: str, text: str) -> bool:
+    """Заменяет запрос своего упражнения на "Вы имели в виду…?". False — подсказать нечего, текст можно принимать.
+
+    Кнопки подсказок используют exercise_mapping мастера, поэтому выбор обрабатывает его exercise_selected.
+    Повторная отправка того же текста принимается как свое упражнение.
+    """
+    line = f"{subgroup}: {text}"
+    if data.get("suggested_for") == line:
+        return False
+    mapping = data.get("exercise_mapping", {})
+    template = next(iter(mapping.values()), None)
+    request_message_id = data.get("request_message_id")
+    if template is None or not request_message_id:
+        return False
+    exclude = set(data.get("selected_for_muscle", [])) | set(data.get("selected_exercises", []))
+    matches = suggest_exercises(subgroup, text, exclude=exclude)
+    if not matches:
+        return False
+
+    keys_by_name = {entry["exercise"]: key for key, entry in mapping.items()}
+    buttons = []
+    for n, (name, _) in enumerate(matches):
+        key = keys_by_name.get(name)
+        if key is None:
+            # Своего упражнения (или упражнения другой версии справочника) нет в клавиатуре мастера
+            key = f"ex_s{n}"
+            mapping[key] = {**template, "exercise": name}
+        buttons.append([InlineKeyboardButton(text=name, callback_data=key)])
+    buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_custom_exercise")])
+
+    await state.update_data({"exercise_mapping": mapping, "suggested_for": line})
+    logger.debug(f"Suggestions for {subgroup}/{text!r}: {matches}")
+    try:
+        await message.bot.edit_message_text(
+            chat_id=message.chat.id,
+            message_id=request_message_id,
+            text=f"🤔 <b>Вы имели в виду…?</b>\n"
+                 f"Выберите упражнение из списка или отправьте «{html.escape(text)}» еще раз, чтобы оставить свое.",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons)
+        )
+    except Exception as e:
+        logger.error(f"Failed to show suggestions in message {request_message_id}: {e}")
+        return False
+    await message.delete()
+    return True
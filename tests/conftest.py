@@ -0,0 +1,124 @@
+# conftest.py
+"""Общие фикстуры: пустое хранилище во временном файле и бот на фейковой сессии Telegram."""
+import asyncio
+import itertools
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from replay import FAKE_TOKEN, ReplaySession  # noqa: E402
+
+os.environ.setdefault("TOKEN", FAKE_TOKEN)
+
+import settings.config as cfg  # noqa: E402
+import storage  # noqa: E402
+import workout_log  # noqa: E402
+from aiogram import Bot  # noqa: E402
+from aiogram.exceptions import TelegramBadRequest  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+
+cfg.CATALOG_FILE = os.path.join(ROOT, cfg.CATALOG_FILE)
+
+# Каждый тест с ботом пишет от своего пользователя, чтобы FSM-сессии тестов не пересекались
+_user_ids = itertools.count(1000)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Пустое хранилище; сохранения идут во временный файл."""
+    monkeypatch.setattr(storage, "STORAGE_FILE", str(tmp_path / "user_program.json"))
+    storage._apply_loaded({"format": storage.STORAGE_FORMAT})
+    yield storage
+    storage.flush_user_program()
+    storage._apply_loaded({"format": storage.STORAGE_FORMAT})
+
+
+@pytest.fixture
+def workouts(tmp_path, monkeypatch):
+    """Пустой журнал тренировок во временном каталоге."""
+    monkeypatch.setattr(cfg, "WORKOUT_LOG_DIR", str(tmp_path / "workouts"))
+    monkeypatch.setattr(workout_log, "_segments", [])
+    monkeypatch.setattr(workout_log, "_active", None)
+    monkeypatch.setattr(workout_log, "_count", 0)
+    monkeypatch.setattr(workout_log, "_by_user", {})
+    monkeypatch.setattr(workout_log, "_by_user_exercise", {})
+    monkeypatch.setattr(workout_log, "_loaded", asyncio.Event())
+    asyncio.run(workout_log.load_async())
+    yield workout_log
+    workout_log.close()
+
+
+class RecordingSession(ReplaySession):
+    """ReplaySession, которая запоминает запросы и умеет отвечать ошибкой на выбранные методы."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+        self.failing = set()
+        self.error = "Bad Request: message can't be edited"
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests.append(method)
+        if type(method) in self.failing:
+            raise TelegramBadRequest(method=method, message=self.error)
+        return await super().make_request(bot, method, timeout)
+
+
+class FakeChat:
+    """Личный чат с ботом: нажатия кнопок и сообщения проходят через настоящий Dispatcher."""
+
+    def __init__(self, dp):
+        self.dp = dp
+        self.user_id = next(_user_ids)
+        self.session = RecordingSession()
+        self.bot = Bot(FAKE_TOKEN, session=self.session)
+        self._update_ids = itertools.count(1)
+
+    def _user(self) -> dict:
+        return {"id": self.user_id, "is_bot": False, "first_name": "Test"}
+
+    def feed(self, payload: dict):
+        payload["update_id"] = next(self._update_ids)
+        update = Update.model_validate(payload, context={"bot": self.bot})
+        asyncio.run(self.dp.feed_update(self.bot, update))
+
+    def press(self, data: str, text: str = "x"):
+        self.feed({"callback_query": {
+            "id": "1", "from": self._user(), "chat_instance": "x", "data": data,
+            "message": {"message_id": 1, "date": datetime.now(), "chat": {"id": self.user_id, "type": "private"}, "text": text}
+        }})
+
+    def send(self, text: str, **extra):
+        message = {"message_id": 5, "date": datetime.now(), "chat": {"id": self.user_id, "type": "private"},
+                   "from": self._user(), "text": text, **extra}
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        self.feed({"message": message})
+
+    def texts(self) -> list:
+        return [method.text for method in self.session.requests if getattr(method, "text", None)]
+
+    def buttons(self) -> list:
+        """callback_data кнопок последней отправленной inline-клавиатуры."""
+        for method in reversed(self.session.requests):
+            markup = getattr(method, "reply_markup", None)
+            if markup is not None and hasattr(markup, "inline_keyboard"):
+                return [button.callback_data for row in markup.inline_keyboard for button in row]
+        return []
+
+
+@pytest.fixture(scope="session")
+def dp():
+    import main
+    main.register_handlers(main.dp)
+    return main.dp
+
+
+@pytest.fixture
+def chat(dp, store):
+    return FakeChat(dp)
@@ -0,0 +1,61 @@
+# test_analytics.py
+import asyncio
+import json
+
+import pytest
+
+import analytics
+
+
+@pytest.fixture
+def sketches(monkeypatch):
+    monkeypatch.setattr(analytics, "sketches", {})
+    monkeypatch.setattr(analytics, "_dirty", False)
+    return analytics.sketches
+
+
+def test_unique_users_estimate(sketches):
+    for user_id in range(1000):
+        analytics.track(user_id, "/start" if user_id % 2 else None)
+    analytics.track(1)
+
+    stats = analytics.report()
+
+    assert abs(stats["all"]["DAU"] - 1000) < 50
+    assert abs(stats["/start"]["MAU"] - 500) < 25
+    assert stats["/donate"]["DAU"] == 0
+
+
+def test_saved_sketches_load_back(sketches, tmp_path):
+    path = str(tmp_path / "analytics.json")
+    for user_id in range(100):
+        analytics.track(user_id)
+    analytics.save(path)
+    expected = analytics.unique_users()
+
+    sketches.clear()
+    analytics.load(path)
+
+    assert analytics.unique_users() == expected
+
+
+def test_periodic_save_writes_only_after_activity(sketches, tmp_path):
+    path = tmp_path / "analytics.json"
+
+    async def run_for(seconds: float):
+        task = asyncio.create_task(analytics.run(0.01, str(path)))
+        await asyncio.sleep(seconds)
+        task.cancel()
+
+    analytics.track(1)
+    asyncio.run(run_for(0.05))
+    assert json.loads(path.read_text())["precision"] == analytics.PRECISION
+    assert not analytics._dirty
+
+    path.unlink()
+    asyncio.run(run_for(0.05))
+    assert not path.exists()
+
+    analytics.track(2, "/programma")
+    asyncio.run(run_for(0.05))
+    assert "/programma" in json.loads(path.read_text())["sketches"]
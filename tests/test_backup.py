@@ -0,0 +1,125 @@
+# test_backup.py
+import asyncio
+import io
+import json
+import os
+import tarfile
+
+import pytest
+
+import analytics
+import backup
+import settings.config as cfg
+
+UPPER = ["Верх спины: Тяга широким хватом в блоке", "Широчайшие: Тяга верх блока"]
+LOWER = ["Квадрицепсы: Свой присед"]
+
+
+@pytest.fixture
+def backups(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr(cfg, "ANALYTICS_FILE", str(tmp_path / "analytics.json"))
+    monkeypatch.setattr(analytics, "sketches", {})
+    return tmp_path / "backups"
+
+
+def program(lines):
+    return {"days": "2", "type": "FullBody 2.0", "sets_reps": "2x8", "program": lines}
+
+
+def test_archive_roundtrip_with_manifest(backups, store):
+    store.set_program("1", program(UPPER))
+    analytics.track(1, "/start")
+
+    name = asyncio.run(backup.create_backup())
+    members = backup.read_archive(str(backups / name))
+
+    assert members["user_program.json"] == store.snapshot()
+    assert members["analytics.json"] == analytics.snapshot()
+    with tarfile.open(backups / name, "r:gz") as archive:
+        manifest = json.load(archive.extractfile(backup.MANIFEST))
+    assert manifest["storage_format"] == store.STORAGE_FORMAT
+    assert set(manifest["files"]) == {"user_program.json", "analytics.json"}
+
+
+def rewrite(path, name, data):
+    with tarfile.open(path, "r:gz") as archive:
+        members = {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+    members[name] = data
+    with tarfile.open(path, "w:gz") as archive:
+        for member, content in members.items():
+            info = tarfile.TarInfo(member)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+
+def test_tampered_archive_is_rejected(backups, store):
+    store.set_program("1", program(UPPER))
+    path = str(backups / asyncio.run(backup.create_backup()))
+    rewrite(path, "user_program.json", b"{}")
+
+    with pytest.raises(backup.BackupError, match="checksum mismatch"):
+        backup.read_archive(path)
+
+
+def test_broken_archive_is_rejected(tmp_path):
+    path = tmp_path / "backup-broken.tar.gz"
+    path.write_bytes(b"not a tarball")
+
+    with pytest.raises(backup.BackupError, match="cannot read"):
+        backup.read_archive(str(path))
+
+
+def test_names_are_unique_and_old_archives_rotate(backups, monkeypatch):
+    monkeypatch.setattr(cfg, "BACKUP_KEEP", 3)
+
+    # Архивы снимаются в одну секунду и отличаются только суффиксом копии
+    names = [asyncio.run(backup.create_backup()) for _ in range(5)]
+
+    assert len(set(names[:4])) == 4
+    assert backup.list_backups() == names[:-4:-1]
+    assert sorted(os.listdir(backups)) == sorted(names[-3:])
+
+
+def test_restore_replaces_live_state(backups, store):
+    store.set_program("1", program(UPPER))
+    store.share_program("1")
+    analytics.track(1, "/start")
+    name = asyncio.run(backup.create_backup())
+    saved = store.snapshot()
+
+    store.set_program("1", program(LOWER))
+    store.set_program("2", program(LOWER))
+    analytics.track(2, "/start")
+    asyncio.run(backup.restore_backup(name))
+
+    assert store.snapshot() == saved
+    assert store.get_program("1")["program"] == UPPER
+    assert store.get_program("2") is None
+    assert analytics.unique_users("/start") == 1
+    # Файл хранилища записан сразу, а прежнее состояние сохранено отдельным архивом
+    with open(store.STORAGE_FILE, "rb") as f:
+        assert json.loads(f.read())["users"] == json.loads(saved)["users"]
+    pre_restore = [other for other in backup.list_backups() if other.endswith("-pre-restore.tar.gz")]
+    assert len(pre_restore) == 1
+    assert "2" in json.loads(backup.read_archive(str(backups / pre_restore[0]))["user_program.json"])["users"]
+
+
+@pytest.mark.parametrize("name", ["backup-missing.tar.gz", "../user_program.json"])
+def test_restore_rejects_unknown_names(backups, name):
+    with pytest.raises(backup.BackupError, match="unknown backup"):
+        asyncio.run(backup.restore_backup(name))
+
+
+def test_offline_restore_writes_files(backups, store):
+    store.set_program("1", program(UPPER))
+    analytics.track(1)
+    path = str(backups / asyncio.run(backup.create_backup()))
+    saved = store.snapshot()
+    os.remove(store.STORAGE_FILE)
+
+    backup.restore_files(path)
+
+    with open(store.STORAGE_FILE, "rb") as f:
+        assert f.read() == saved
+    assert os.path.exists(cfg.ANALYTICS_FILE)
@@ -0,0 +1,48 @@
+# test_expired.py
+import pytest
+
+import main
+
+STALE = "Этот выбор устарел"
+WIZARD_BUTTONS = [
+    "ex_1", "custom_ex_1.1", "days_2", "wizard_back", "cancel_custom_exercise", "back_to_days",
+    "cmp_t_fullbody2_0_0_0", "cmp_done",
+]
+
+
+def assert_restart_offered(chat):
+    assert STALE in chat.texts()[-1]
+    assert chat.buttons() == ["start_programma"]
+
+
+@pytest.mark.parametrize("data", WIZARD_BUTTONS)
+def test_wizard_button_without_session(chat, data):
+    chat.press(data)
+    assert_restart_offered(chat)
+
+
+def test_evicted_session_offers_restart(dp, store, monkeypatch):
+    from conftest import FakeChat
+    monkeypatch.setattr(main.fsm_storage, "max_sessions", 1)
+    first, second = FakeChat(dp), FakeChat(dp)
+
+    first.press("prog_ap2")
+    exercise = next(data for data in first.buttons() if data.startswith("ex_"))
+    second.press("prog_ap2")
+    first.press(exercise)
+
+    assert_restart_offered(first)
+    assert main.fsm_storage.evicted >= 1
+
+
+def test_expired_session_offers_restart(chat, monkeypatch):
+    chat.press("prog_ap2")
+    exercise = next(data for data in chat.buttons() if data.startswith("ex_"))
+    for session in main.fsm_storage._sessions.values():
+        session.touched -= main.fsm_storage.ttl
+    expired = main.fsm_storage.expired
+
+    chat.press(exercise)
+
+    assert_restart_offered(chat)
+    assert main.fsm_storage.expired > expired
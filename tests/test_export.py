@@ -0,0 +1,103 @@
+# test_export.py
+import asyncio
+import csv
+import gzip
+import io
+import json
+
+import export
+
+UPPER = ["Верх спины: Тяга широким хватом в блоке", "Широчайшие: Тяга верх блока"]
+
+
+def fill(store, count, start=0):
+    for user_id in range(start, start + count):
+        store.set_program(str(user_id), {"days": "2", "type": "FullBody 2.0", "sets_reps": "2x8", "program": UPPER})
+
+
+def collect(document, on_rows=None) -> bytes:
+    """Читает выгрузку; on_rows вызывается между пачками, как хендлеры, работающие во время выгрузки."""
+    async def read():
+        parts = []
+        async for part in document.read(None):
+            parts.append(part)
+        return b"".join(parts)
+
+    async def handlers():
+        while True:
+            on_rows(document.rows)
+            await asyncio.sleep(0)
+
+    async def run():
+        concurrent = asyncio.create_task(handlers()) if on_rows else None
+        try:
+            return await read()
+        finally:
+            if concurrent:
+                concurrent.cancel()
+    return gzip.decompress(asyncio.run(run()))
+
+
+def test_csv_has_a_row_per_exercise(store):
+    fill(store, 3)
+    document = export.ExportFile("csv", "programs.csv.gz")
+
+    rows = list(csv.reader(io.StringIO(collect(document).decode("utf-8"))))
+
+    assert tuple(rows[0]) == export.COLUMNS
+    assert len(rows) == 1 + 3 * len(UPPER) == 1 + document.rows
+    assert rows[1][:3] == ["0", "FullBody 2.0", "2"]
+    assert rows[2][6:8] == ["Широчайшие", "Тяга верх блока"]
+
+
+def test_jsonl_rows(store):
+    fill(store, 2)
+
+    lines = collect(export.ExportFile("jsonl", "programs.jsonl.gz")).decode("utf-8").splitlines()
+
+    assert [json.loads(line)["user_id"] for line in lines] == ["0", "0", "1", "1"]
+
+
+def test_users_changing_during_export(store, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_USERS", 10)
+    fill(store, 100)
+
+    changed = []
+
+    def on_rows(rows):
+        if rows >= 20 * len(UPPER) and not changed:
+            changed.append(rows)
+            # Удалены уже выгруженный и еще не выгруженный пользователи, добавлены новые
+            store.delete_program("3")
+            store.delete_program("50")
+            fill(store, 5, start=1000)
+
+    lines = collect(export.ExportFile("jsonl", "programs.jsonl.gz"), on_rows).decode("utf-8").splitlines()
+    exported = {json.loads(line)["user_id"] for line in lines}
+
+    assert changed == [20 * len(UPPER)]
+    assert "50" not in exported
+    assert exported >= set(store.user_program)
+    assert len(lines) == len(exported) * len(UPPER)
+
+
+def test_users_replaced_one_for_one_during_export(store, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_USERS", 10)
+    fill(store, 100)
+
+    replaced = []
+
+    def on_rows(rows):
+        # После каждой пачки: удален уже выгруженный пользователь, вместо него добавлен новый
+        chunk = rows // (10 * len(UPPER))
+        if rows % (10 * len(UPPER)) == 0 and 0 < chunk <= 5 and chunk not in replaced:
+            replaced.append(chunk)
+            store.delete_program(str(chunk * 10 - 1))
+            fill(store, 1, start=1000 + chunk)
+
+    lines = collect(export.ExportFile("jsonl", "programs.jsonl.gz"), on_rows).decode("utf-8").splitlines()
+    exported = [json.loads(line)["user_id"] for line in lines[::len(UPPER)]]
+
+    assert replaced == [1, 2, 3, 4, 5]
+    assert len(exported) == len(set(exported))
+    assert set(exported) >= set(store.user_program)
@@ -0,0 +1,73 @@
+# test_fsm_storage.py
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from fsm_storage import BoundedMemoryStorage, _estimate
+
+
+def key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_idle_session_expires():
+    storage = BoundedMemoryStorage(ttl=60, max_sessions=10)
+    run(storage.set_state(key(1), "Wizard:choosing"))
+    run(storage.set_data(key(2), {"step": 1}))
+    storage._sessions[key(1)].touched -= 61
+
+    assert run(storage.get_state(key(1))) is None
+    assert run(storage.get_data(key(2))) == {"step": 1}
+    assert storage.expired == 1
+    assert storage.stats() == (1, _estimate({"step": 1}))
+
+
+def test_overflow_evicts_least_recently_used():
+    storage = BoundedMemoryStorage(ttl=60, max_sessions=2)
+    run(storage.set_state(key(1), "Wizard:choosing"))
+    run(storage.set_state(key(2), "Wizard:choosing"))
+    # Чтение состояния продлевает сессию: первой уходит вторая
+    run(storage.get_state(key(1)))
+    run(storage.set_state(key(3), "Wizard:choosing"))
+
+    assert run(storage.get_state(key(2))) is None
+    assert run(storage.get_state(key(1))) == "Wizard:choosing"
+    assert run(storage.get_state(key(3))) == "Wizard:choosing"
+    assert storage.evicted == 1
+
+
+def test_cleared_session_is_removed():
+    storage = BoundedMemoryStorage(ttl=60, max_sessions=10)
+    run(storage.set_state(key(1), "Wizard:choosing"))
+    run(storage.set_data(key(1), {"selected": ["Жим лежа"]}))
+    assert storage.stats() == (1, _estimate({"selected": ["Жим лежа"]}))
+
+    run(storage.set_state(key(1), None))
+    run(storage.set_data(key(1), {}))
+
+    assert storage.stats() == (0, 0)
+    assert not storage._sessions
+
+
+def test_data_size_follows_updates():
+    storage = BoundedMemoryStorage(ttl=60, max_sessions=10)
+    run(storage.set_data(key(1), {"panel": "x" * 100}))
+    run(storage.set_data(key(1), {"panel": "x"}))
+    run(storage.set_data(key(2), {"panel": "y" * 10}))
+
+    assert storage.stats() == (2, _estimate({"panel": "x"}) + _estimate({"panel": "y" * 10}))
+
+    storage._sessions[key(1)].touched -= 60
+    assert storage.stats() == (1, _estimate({"panel": "y" * 10}))
+
+
+def test_get_data_returns_copy():
+    storage = BoundedMemoryStorage(ttl=60, max_sessions=10)
+    run(storage.set_data(key(1), {"step": 1}))
+    run(storage.get_data(key(1)))["step"] = 2
+
+    assert run(storage.get_data(key(1))) == {"step": 1}
@@ -0,0 +1,85 @@
+# test_history.py
+import random
+
+import pytest
+
+UPPER = ["Верх спины: Тяга широким хватом в блоке", "Широчайшие: Тяга верх блока"]
+
+
+def version(days, **fields):
+    base = {"type": "FullBody 2.0", "sets_reps": "2x8", "week": "2", "layout": "single", "order": [0], "t": 1}
+    base.update(fields)
+    base["days"] = days
+    return base
+
+
+def roundtrip(store, old, new):
+    delta = store._diff(old, new)
+    delta["t"] = new["t"]
+    return store._apply(old, delta)
+
+
+@pytest.mark.parametrize("old_days, new_days", [
+    ([[1, 2, 3]], [[1, 2, 3]]),
+    ([[1, 2, 3]], [[1, 5, 3]]),
+    ([[1, 2, 3]], [[1, 2]]),
+    ([[1, 2]], [[1, 2, -1, 7]]),
+    ([[1, 2], [3, 4]], [[1, 2]]),
+    ([[1, 2]], [[1, 2], [3, 4]]),
+    ([[]], [[0, 0, 1]]),
+])
+def test_diff_apply_roundtrip(store, old_days, new_days):
+    old, new = version(old_days), version(new_days, t=2)
+
+    assert roundtrip(store, old, new) == new
+
+
+def test_changed_fields_are_kept(store):
+    old = version([[1, 2]])
+    new = version([[1, 2], [3]], type="Hybrid 3.0", week="3", layout="hybrid", order=[0, 1, 0], t=2)
+
+    assert store._diff(old, new).keys() == {"type", "week", "layout", "order", "lens", "ops"}
+    assert roundtrip(store, old, new) == new
+
+
+def test_unchanged_version_gives_empty_delta(store):
+    assert store._diff(version([[1, 2]]), version([[1, 2]], t=5)) == {}
+
+
+def test_random_chains_roundtrip(store):
+    rng = random.Random(38)
+    current = version([[rng.randint(-3, 60) for _ in range(8)]])
+    for step in range(200):
+        days = [list(day) for day in current["days"]]
+        for day in days:
+            for pos in rng.sample(range(len(day)), min(len(day), rng.randint(0, 2))):
+                day[pos] = rng.randint(-3, 60)
+            if rng.random() < 0.2:
+                day.append(rng.randint(1, 60))
+            if rng.random() < 0.2 and day:
+                day.pop(rng.randrange(len(day)))
+        if rng.random() < 0.1:
+            days.append([rng.randint(1, 60)])
+        if rng.random() < 0.1 and len(days) > 1:
+            days.pop()
+        new = version(days, week=str(rng.randint(2, 4)), t=step + 2)
+        assert roundtrip(store, current, new) == new
+        current = new
+
+
+def test_history_keeps_last_versions_as_deltas(store):
+    entry = {"days": "2", "type": "FullBody 2.0", "sets_reps": "2x8", "program": UPPER}
+    store.set_program("1", entry)
+    saved = []
+    for exercise_id in range(1, store.HISTORY_LIMIT + 4):
+        store.replace_exercise("1", 0, 1, exercise_id)
+        saved.append(store.programs[store.user_program["1"]["hash"]]["program"]["days"])
+
+    versions = store.history_versions("1")
+    assert len(versions) == store.HISTORY_LIMIT
+    assert [v["days"] for v in versions] == saved[-store.HISTORY_LIMIT:]
+    assert len(store.history["1"]["deltas"]) == store.HISTORY_LIMIT - 1
+
+    store.restore_version("1", versions[0])
+    assert store.is_current_version("1", versions[0])
+    assert store.history_versions("1")[-1]["days"] == versions[0]["days"]
@@ -0,0 +1,44 @@
+# test_log.py
+import asyncio
+
+import pytest
+
+import workout_log
+
+UPPER = ["Верх спины: Тяга широким хватом в блоке", "Широчайшие: Тяга верх блока"]
+
+
+def start_logging(chat, store):
+    store.set_program(str(chat.user_id), {"days": "2", "type": "FullBody 2.0", "sets_reps": "2x8", "program": UPPER})
+    chat.send("/log")
+    chat.press(next(data for data in chat.buttons() if data.startswith("log_ex_")))
+
+
+def test_sets_are_logged(chat, store, workouts):
+    start_logging(chat, store)
+    chat.send("3x8x60")
+    chat.send("8 х 62,5 кг")
+
+    assert chat.texts()[-1].startswith("✅ Записано")
+    entries = workouts.exercise_history(chat.user_id, workouts._read(0).exercise_id)
+    assert [(entry.sets, entry.reps, entry.weight) for entry in entries] == [(3, 8, 60.0), (1, 8, 62.5)]
+
+
+def test_command_after_logged_set_is_not_a_set(chat, store, workouts):
+    start_logging(chat, store)
+    chat.send("3x8x60")
+    chat.send("/progress")
+
+    assert not any(text.startswith("❗ Не понял запись") for text in chat.texts())
+    assert workouts._count == 1
+
+
+def test_failed_load_does_not_block_waiters(monkeypatch):
+    def broken():
+        raise OSError("disk error")
+
+    monkeypatch.setattr(workout_log, "_load", broken)
+    monkeypatch.setattr(workout_log, "_loaded", asyncio.Event())
+    with pytest.raises(OSError):
+        asyncio.run(workout_log.load_async())
+    asyncio.run(asyncio.wait_for(workout_log.wait_loaded(), 1))
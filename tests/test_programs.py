@@ -0,0 +1,71 @@
+# test_programs.py
+import json
+
+import pytest
+
+import catalog
+from programs import PROGRAMS, validate_selection
+
+FULLBODY2 = PROGRAMS["fullbody2"]
+HYBRID3 = PROGRAMS["hybrid3"]
+
+
+def first_of_each(spec):
+    return [[[0] * count for _, _, count in flat_sequence] for flat_sequence in spec.flat_sequences]
+
+
+def test_indices_become_catalog_lines():
+    days = validate_selection(FULLBODY2, first_of_each(FULLBODY2), catalog.get_catalog().version)
+
+    current = catalog.get_catalog()
+    assert days == [[f"{subgroup}: {current.get_exercises(group, subgroup)[0]}" for group, subgroup, _ in FULLBODY2.flat_sequences[0]]]
+
+
+def test_custom_names_are_stripped():
+    picks = first_of_each(FULLBODY2)
+    picks[0][0] = ["  Своя тяга  "]
+
+    assert validate_selection(FULLBODY2, picks)[0][0] == "Верх спины: Своя тяга"
+
+
+def test_each_day_is_checked_separately():
+    days = validate_selection(HYBRID3, first_of_each(HYBRID3))
+
+    assert [len(day) for day in days] == [sum(count for _, _, count in flat) for flat in HYBRID3.flat_sequences]
+
+
+@pytest.mark.parametrize("payload, message", [
+    ("not a list", "неверное количество дней"),
+    ([], "неверное количество дней"),
+    ([[[0]]], "неверное количество групп"),
+    ([[[0, 1]] + [[0]] * 14], "нужно выбрать 1"),
+    ([[[99]] + [[0]] * 14], "неизвестное упражнение"),
+    ([[[True]] + [[0]] * 14], "неизвестное упражнение"),
+    ([[["   "]] + [[0]] * 14], "неизвестное упражнение"),
+    ([[["x" * 101]] + [[0]] * 14], "неизвестное упражнение"),
+    ([[["Своя"], ["Своя"]] + [[0]] * 13], "Своя выбрано дважды"),
+])
+def test_invalid_selection_is_rejected(payload, message):
+    with pytest.raises(ValueError, match=message):
+        validate_selection(FULLBODY2, payload)
+
+
+def test_evicted_catalog_version_is_rejected(tmp_path, monkeypatch):
+    old_version = catalog.get_catalog().version
+    monkeypatch.setattr(catalog, "_versions", catalog.OrderedDict())
+    monkeypatch.setattr(catalog, "_catalog", None)
+    # Справочник правили: в начало подгруппы добавлено упражнение, номера остальных сдвинулись
+    with open(catalog.cfg.CATALOG_FILE, encoding="utf-8") as f:
+        source = json.load(f)
+    source["groups"][0]["subgroups"][0]["exercises"].insert(0, {"id": 900, "name": "Новое упражнение"})
+    edited = tmp_path / "exercises.json"
+    edited.write_text(json.dumps(source, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(catalog.cfg, "CATALOG_FILE", str(edited))
+    assert catalog.get_catalog().version != old_version
+
+    with pytest.raises(ValueError, match="каталог обновился"):
+        validate_selection(FULLBODY2, first_of_each(FULLBODY2), old_version)
+
+
+def test_wizards_keep_falling_back_to_the_current_catalog():
+    assert catalog.get_catalog("evicted") is catalog.get_catalog()
@@ -0,0 +1,59 @@
+# test_replay.py
+import gzip
+import json
+import os
+import subprocess
+import sys
+
+from aiogram.types import Update
+
+from conftest import ROOT
+from replay import UpdateRecorder, read_capture
+
+
+def message(update_id: int, text: str) -> dict:
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 1700000000, "chat": {"id": 7, "type": "private"},
+        "from": {"id": 7, "is_bot": False, "first_name": "Test"}, "text": text,
+        "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    }}
+
+
+def write_capture(path, updates: list):
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for update in updates:
+            f.write(json.dumps({"t": 0, "update": update}) + "\n")
+
+
+def run_replay(tmp_path, capture, *args) -> subprocess.CompletedProcess:
+    env = dict(os.environ, WORKOUT_LOG_DIR=str(tmp_path / "workouts"))
+    return subprocess.run(
+        [sys.executable, "replay.py", str(capture), *args],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+
+
+def test_replay_with_workout_log_commands(tmp_path):
+    capture = tmp_path / "capture.jsonl.gz"
+    write_capture(capture, [message(1, "/progress"), message(2, "/log")])
+
+    result = run_replay(tmp_path, capture)
+
+    assert result.returncode == 0, result.stderr
+    assert "Updates: 2 (0 failed)" in result.stdout
+    # Прогон пишет в копию журнала, а не в исходный каталог
+    assert not (tmp_path / "workouts").exists()
+
+
+def test_new_capture_session_overwrites_the_file(tmp_path):
+    path = str(tmp_path / "capture.jsonl.gz")
+    for texts in (["/start", "/programma"], ["/log"]):
+        recorder = UpdateRecorder(path)
+        for update_id, text in enumerate(texts, 1):
+            recorder.record(Update.model_validate(message(update_id, text)))
+        recorder.close()
+
+    records = list(read_capture(path))
+
+    assert [record["update"]["message"]["text"] for record in records] == ["/log"]
+    assert records[0]["update"]["message"]["from"]["id"] != 7
@@ -0,0 +1,20 @@
+# test_share.py
+UPPER = ["Верх спины: Тяга широким хватом в блоке", "Широчайшие: Тяга верх блока"]
+
+
+def test_share_link_and_take(dp, store):
+    from conftest import FakeChat
+    author, friend = FakeChat(dp), FakeChat(dp)
+    store.set_program(str(author.user_id), {"days": "2", "type": "FullBody 2.0", "sets_reps": "2x8", "program": UPPER})
+
+    author.press("share_program")
+    link = author.texts()[-1].split("\n")[1]
+    assert link.startswith("https://t.me/replay_bot?start=share_")
+
+    friend.send(f"/start {link.rsplit('=', 1)[1]}")
+    take = [data for data in friend.buttons() if data.startswith("take_")]
+    assert take
+    friend.press(take[0])
+
+    assert store.get_program(str(friend.user_id))["program"] == UPPER
+    assert store.user_program[str(friend.user_id)]["hash"] == store.user_program[str(author.user_id)]["hash"]
@@ -0,0 +1,115 @@
+# test_storage.py
+import json
+
+from catalog import get_catalog
+
+UPPER = ["Верх спины: Тяга широким хватом в блоке", "Широчайшие: Тяга верх блока"]
+LOWER = ["Квадрицепсы: Свой присед", "Икры: Свои подъемы"]
+
+
+def entry(program, program_type="FullBody 2.0", days="2"):
+    return {"days": days, "program": program, "type": program_type, "sets_reps": "2x8"}
+
+
+def write(store, data):
+    with open(store.STORAGE_FILE, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def reload(store):
+    store.flush_user_program()
+    store.load_user_program()
+
+
+def test_legacy_file_is_migrated_to_shared_records(store):
+    split = {"day1": UPPER, "day2": LOWER, "day3": UPPER, "day4": LOWER}
+    write(store, {
+        "1": entry(UPPER),
+        "2": entry(UPPER),
+        "3": entry(split, "4 день верх/низ", 4)
+    })
+    store.load_user_program()
+
+    assert len(store.user_program) == 3
+    assert len(store.programs) == 2
+    assert sorted(store.program_refs.values()) == [1, 2]
+    assert store.user_program["1"]["hash"] == store.user_program["2"]["hash"]
+    # Свои упражнения хранятся один раз и кодируются отрицательными ID
+    assert store.custom_exercises == LOWER
+    encoded = store.programs[store.user_program["3"]["hash"]]["program"]
+    assert encoded["layout"] == store.LAYOUT_SPLIT
+    assert encoded["order"] == [0, 1, 0, 1]
+    assert encoded["days"][1] == [-1, -2]
+
+    reload(store)
+    with open(store.STORAGE_FILE, encoding="utf-8") as f:
+        assert json.load(f)["format"] == store.STORAGE_FORMAT
+    assert store.get_program("1")["program"] == UPPER
+    assert store.get_program("3")["program"] == split
+    assert store.type_counts == {"FullBody 2.0": 2, "4 день верх/низ": 1}
+
+
+def test_format_2_file_is_migrated(store):
+    catalog = get_catalog()
+    ids = [catalog.exercise_index[tuple(line.split(": ", 1))] for line in UPPER]
+    encoded = {"layout": store.LAYOUT_SINGLE, "days": [ids + [-1]], "order": [0]}
+    write(store, {"format": 2, "custom": ["Икры: Свои подъемы"], "users": {"5": entry(encoded), "6": entry(encoded)}})
+    store.load_user_program()
+
+    assert len(store.programs) == 1
+    assert store.get_program("6")["program"] == UPPER + ["Икры: Свои подъемы"]
+
+
+def test_identical_programs_share_one_record(store):
+    store.set_program("1", entry(UPPER))
+    store.set_program("2", entry(list(UPPER)))
+    shared_hash = store.user_program["1"]["hash"]
+    assert store.program_refs == {shared_hash: 2}
+
+    # Пересоставленная программа отпускает общую запись, но та жива, пока на нее есть ссылки
+    store.set_program("1", entry(LOWER))
+    assert store.program_refs[shared_hash] == 1
+    assert store.get_program("2")["program"] == UPPER
+
+    store.delete_program("2")
+    assert shared_hash not in store.programs
+    assert shared_hash not in store.program_refs
+    store.delete_program("1")
+    assert store.programs == {} and store.program_refs == {}
+    assert store.type_counts == {} and store.exercise_counts == {}
+
+
+def test_days_per_week_stay_per_user(store):
+    store.set_program("1", entry(UPPER, days="2"))
+    store.set_program("2", entry(UPPER, days="3"))
+
+    assert len(store.programs) == 1
+    assert store.get_program("1")["days"] == "2"
+    assert store.get_program("2")["days"] == "3"
+
+
+def test_shared_link_keeps_the_program_alive(store):
+    store.set_program("1", entry(UPPER))
+    token = store.share_program("1")
+    assert store.share_program("1") == token
+
+    store.delete_program("1")
+    assert store.get_shared(token)["program"] == UPPER
+
+    assert store.take_shared("2", token)
+    assert store.program_refs[store.user_program["2"]["hash"]] == 2
+    reload(store)
+    assert store.get_shared(token)["program"] == UPPER
+    assert store.program_refs[store.user_program["2"]["hash"]] == 2
+
+
+def test_load_drops_dangling_references(store):
+    store.set_program("1", entry(UPPER))
+    data = json.loads(store.snapshot())
+    data["users"]["2"] = {"days": "2", "hash": "missing"}
+    data["programs"]["orphan"] = {"type": "FullBody 2.0", "sets_reps": None, "program": None}
+    write(store, data)
+    store.load_user_program()
+
+    assert list(store.user_program) == ["1"]
+    assert "orphan" not in store.programs
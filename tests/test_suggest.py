@@ -0,0 +1,43 @@
+# test_suggest.py
+import json
+
+import suggest
+
+SUBGROUP = "Верх спины"
+
+
+def with_custom(store, user_id: str, name: str):
+    store.set_program(user_id, {"days": "2", "type": "FullBody 2.0", "sets_reps": "2x8",
+                                "program": [f"{SUBGROUP}: {name}"]})
+
+
+def names(text: str) -> list:
+    return [name for name, _ in suggest.suggest_exercises(SUBGROUP, text)]
+
+
+def test_new_custom_exercise_is_suggested(store):
+    with_custom(store, "1", "Тяга Мидоуса")
+    assert suggest.suggest_exercises(SUBGROUP, "тяга мидоуса") == [("Тяга Мидоуса", None)]
+
+    with_custom(store, "2", "Тяга Крока")
+    assert "Тяга Крока" in names("тяга крока")
+    assert suggest.canonical_exercise(SUBGROUP, "тяга  МИДОУСА") == "Тяга Мидоуса"
+
+
+def restore_customs(store, *lines):
+    store.restore_snapshot(json.dumps({"format": store.STORAGE_FORMAT, "custom": list(lines)}).encode("utf-8"))
+
+
+def test_restore_with_same_number_of_customs_rebuilds_index(store):
+    with_custom(store, "1", "Тяга Мидоуса")
+    assert "Тяга Мидоуса" in names("тяга мидоуса")
+
+    restore_customs(store, f"{SUBGROUP}: Тяга Крока")
+
+    assert "Тяга Крока" in names("тяга крока")
+    assert "Тяга Мидоуса" not in names("тяга мидоуса")
+
+    restore_customs(store, f"{SUBGROUP}: Тяга Крока", f"{SUBGROUP}: Тяга Пендлея")
+
+    assert "Тяга Пендлея" in names("тяга пендлея")
+    assert suggest.canonical_exercise(SUBGROUP, "тяга крока") == "Тяга Крока"
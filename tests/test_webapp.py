@@ -0,0 +1,25 @@
+# test_webapp.py
+import json
+
+from catalog import get_catalog
+
+
+def submit(chat, days, version=None):
+    payload = {"type": "fullbody2", "version": version or get_catalog().version, "days": days}
+    chat.send("", web_app_data={"data": json.dumps(payload, ensure_ascii=False), "button_text": "🧩 Открыть конструктор"})
+
+
+def test_rejection_escapes_custom_exercise_names(chat, store):
+    custom = "Тяга <b> & co"
+    submit(chat, [[[custom], [custom]] + [[0]] * 13])
+
+    reply = chat.texts()[-1]
+    assert "Тяга &lt;b&gt; &amp; co выбрано дважды" in reply
+    assert store.get_program(str(chat.user_id)) is None
+
+
+def test_valid_selection_is_saved(chat, store):
+    submit(chat, [[[0]] * 15])
+
+    assert store.get_program(str(chat.user_id))["type"] == "FullBody 2.0"
+    assert "сохранена" in chat.texts()[0]
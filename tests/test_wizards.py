@@ -0,0 +1,53 @@
+# test_wizards.py
+from aiogram.methods import EditMessageText, SendMessage
+
+
+def run_wizard(chat, start: str, limit: int = 50):
+    """Проходит мастер, каждый раз нажимая первое упражнение на клавиатуре."""
+    chat.press(start)
+    for _ in range(limit):
+        exercises = [data for data in chat.buttons() if data.startswith("ex_")]
+        if not exercises:
+            return
+        chat.press(exercises[0])
+    raise AssertionError("мастер не закончился")
+
+
+def test_ap2_falls_back_to_new_message_when_edit_fails(chat, store):
+    chat.session.failing = {EditMessageText}
+
+    run_wizard(chat, "prog_ap2")
+
+    program = store.get_program(str(chat.user_id))
+    assert program["type"] == "4 день перед/зад"
+    assert program["program"]["day3"] == program["program"]["day1"]
+    sent = [method for method in chat.session.requests if isinstance(method, SendMessage)]
+    assert len(sent) > 10
+    # Последнее сообщение — первая страница программы вместо невыполненного редактирования
+    assert sent[-1].reply_markup is not None
+    assert any(isinstance(method, EditMessageText) for method in chat.session.requests)
+
+
+def test_ap2_edits_in_place(chat, store):
+    run_wizard(chat, "prog_ap2")
+
+    assert store.get_program(str(chat.user_id))["type"] == "4 день перед/зад"
+    assert not any(isinstance(method, SendMessage) for method in chat.session.requests)
+
+
+def test_custom_exercise_prompt_survives_unmodified_edit(chat, store):
+    from edit_dedup import EditDedupMiddleware
+    from handlers.prog_ap2 import PushPullStates
+    chat.session.middleware(EditDedupMiddleware())
+    chat.press("prog_ap2")
+    custom = next(data for data in chat.buttons() if data.startswith("custom_ex_"))
+
+    # Подсказка уже на экране (повторное нажатие или сообщение до перезапуска)
+    chat.session.failing = {EditMessageText}
+    chat.session.error = "Bad Request: message is not modified"
+    chat.press(custom)
+
+    key = next(key for key in chat.dp.storage._sessions if key.user_id == chat.user_id)
+    session = chat.dp.storage._sessions[key]
+    assert session.state == PushPullStates.entering_custom_exercise.state
+    assert session.data["request_message_id"] == 1
@@ -0,0 +1,66 @@
+# webapp.py
+import json
+import logging
+import os
+
+from aiohttp import web
+
+import settings.config as cfg
+from catalog import get_catalog
+from programs import PROGRAMS, ProgramSpec
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "webapp")
+
+# Готовые JSON-ответы по версии справочника и типу программы: каталог меняется редко, а открытий Mini App много
+_payload_cache: dict[tuple[str, str], bytes] = {}
+
+def catalog_payload(spec: ProgramSpec) -> dict:
+    catalog = get_catalog()
+    return {
+        "key": spec.key,
+        "title": spec.title,
+        "version": catalog.version,
+        "days": [
+            [
+                {"subgroup": subgroup, "count": count, "exercises": list(catalog.get_exercises(group, subgroup))}
+                for group, subgroup, count in flat_sequence
+            ]
+            for flat_sequence in spec.flat_sequences
+        ]
+    }
+
+async def catalog_handler(request: web.Request) -> web.Response:
+    key = request.query.get("type", "")
+    spec = PROGRAMS.get(key)
+    if not spec:
+        raise web.HTTPNotFound(text="unknown program type")
+    cache_key = (get_catalog().version, key)
+    if cache_key not in _payload_cache:
+        # Ответы для прошлых версий справочника больше не нужны
+        if any(version != cache_key[0] for version, _ in _payload_cache):
+            _payload_cache.clear()
+        _payload_cache[cache_key] = json.dumps(catalog_payload(spec), ensure_ascii=False).encode("utf-8")
+    return web.Response(
+        body=_payload_cache[cache_key],
+        content_type="application/json",
+        headers={"Cache-Control": "public, max-age=300"}
+    )
+
+async def index_handler(request: web.Request) -> web.FileResponse:
+    return web.FileResponse(os.path.join(STATIC_DIR, "index.html"))
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/webapp/", index_handler)
+    app.router.add_get("/webapp/catalog.json", catalog_handler)
+    app.router.add_static("/webapp/static/", STATIC_DIR)
+    return app
+
+async def start_webapp() -> web.AppRunner:
+    runner = web.AppRunner(create_app())
+    await runner.setup()
+    await web.TCPSite(runner, cfg.WEBAPP_HOST, cfg.WEBAPP_PORT).start()
+    logger.info(f"Mini App server listening on {cfg.WEBAPP_HOST}:{cfg.WEBAPP_PORT}, public URL {cfg.WEBAPP_URL}/webapp/")
+    return runner
@@ -0,0 +1,52 @@
+# wizard_panel.py
+"""Сводка уже выбранных упражнений над вопросом мастера программы.
+
+Сводка лежит в FSM готовой строкой ("panel") и с каждым выбором дописывается на одну строку,
+так что текст шага — это сводка плюс вопрос, без пересборки всей программы. Когда мастер
+закончен, то же сообщение одной правкой превращается в первую страницу программы.
+"""
+import html
+import logging
+
+from aiogram import types
+
+from program_view import program_markup, program_pages
+
+logger = logging.getLogger(__name__)
+
+# Сообщение в Telegram ограничено 4096 символами: вместе с вопросом сводка должна поместиться
+PANEL_LIMIT = 3000
+
+
+def add_day(panel: str, day: int) -> str:
+    return f"{panel}\n\n📅 <b>День {day}</b>" if panel else f"📅 <b>День {day}</b>"
+
+def add_selection(panel: str, subgroup: str, exercise: str) -> str:
+    # Свои упражнения пользователь пишет сам — экранируем их для HTML
+    return f"{panel}\n  ✔️ {html.escape(subgroup)}: {html.escape(exercise)}"
+
+def with_panel(panel: str, text: str) -> str:
+    if not panel:
+        return text
+    if len(panel) > PANEL_LIMIT:
+        # Слишком длинная сводка: оставляем последние строки
+        panel = "…" + panel[panel.index("\n", len(panel) - PANEL_LIMIT):]
+    return f"📝 <b>Уже выбрано:</b>\n{panel.lstrip()}\n\n{text}"
+
+async def show_program(message: types.CallbackQuery | types.Message, user_id: str):
+    """Последний шаг мастера: вместо вопроса — первая страница сохраненной программы."""
+    paged = await program_pages(user_id)
+    if paged is None:
+        text, markup = "/programma - просмотреть программу", None
+    else:
+        pages = paged[1]
+        text, markup = pages[0], program_markup(0, len(pages))
+    if isinstance(message, types.CallbackQuery):
+        try:
+            await message.message.edit_text(text, reply_markup=markup)
+        except Exception as e:
+            logger.error(f"Failed to edit message for user {user_id}: {e}")
+            await message.message.answer(text, reply_markup=markup)
+    else:
+        await message.answer(text, reply_markup=markup)
+    logger.info(f"Wizard of user {user_id} finished with the program view")
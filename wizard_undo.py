@@ -0,0 +1,72 @@
+# wizard_undo.py
+"""Кнопка "↩️ Назад" в мастерах программы.
+
+Перед каждым выбором упражнения в FSM кладется короткая запись [шаг, день, длина сводки,
+сколько уже выбрано для группы]. Откат снимает последнюю запись и последнее упражнение
+из списков выбора — без копий всей программы ни при выборе, ни при откате.
+"""
+import logging
+
+from aiogram import types
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InlineKeyboardButton
+
+logger = logging.getLogger(__name__)
+
+BACK_DATA = "wizard_back"
+
+
+def back_button() -> InlineKeyboardButton:
+    return InlineKeyboardButton(text="↩️ Назад", callback_data=BACK_DATA)
+
+def push_undo(data: dict) -> list:
+    """Стек отката с записью о текущем шаге; вызывать до того, как выбор добавлен в data."""
+    undo = data.get("undo", [])
+    undo.append([
+        data.get("current_step", 0),
+        data.get("current_day", 1),
+        len(data.get("panel", "")),
+        len(data.get("selected_for_muscle", []))
+    ])
+    return undo
+
+async def undo_step(callback: types.CallbackQuery, state: FSMContext, send_next_muscle):
+    """Отменяет последний выбор и заново показывает его шаг через send_next_muscle мастера."""
+    data = await state.get_data()
+    undo = data.get("undo")
+    if not undo:
+        await callback.answer("Это первый шаг — отменять нечего")
+        return
+
+    step, day, panel_len, muscle_count = undo.pop()
+    current_day = data.get("current_day", 1)
+    selected = data.get("selected", [])
+    update = {"current_step": step, "panel": data.get("panel", "")[:panel_len], "undo": undo}
+
+    if isinstance(selected, dict):
+        day_selected = selected[f"day{day}"]
+    elif day != current_day:
+        # Выбор закрыл прошлый день: его список возвращается из готовой части программы
+        program = data.get("program", [])
+        day_selected = selected = program.pop()["exercises"]
+        update["program"] = program
+    else:
+        day_selected = selected
+    day_selected.pop()
+
+    if day == current_day:
+        selected_exercises = data.get("selected_exercises", [])
+        selected_exercises.pop()
+    else:
+        # При смене дня список для клавиатуры сбрасывается — собираем его по выбору того дня
+        selected_exercises = [entry.split(": ", 1)[-1] for entry in day_selected]
+        update["current_day"] = day
+
+    update.update({"selected": selected, "selected_exercises": selected_exercises})
+    await state.update_data(update)
+    await send_next_muscle(callback, state)
+    if muscle_count:
+        await state.update_data({"selected_for_muscle": selected_exercises[-muscle_count:]})
+
+    logger.info(f"User {callback.from_user.id} stepped back to step {step}, day {day}")
+    await callback.answer("↩️ Выбор отменен")
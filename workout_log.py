@@ -0,0 +1,182 @@
+# workout_log.py
+"""Журнал тренировок: подходы x повторения x вес по упражнениям из программы.
+
+Записи только дописываются в бинарные сегменты WORKOUT_LOG_DIR/seg-NNNNNN.bin фиксированного размера
+(SEGMENT_RECORDS записей по RECORD.size байт). Заполненные сегменты читаются через mmap,
+в памяти держатся только номера записей по пользователю и по (пользователь, упражнение) —
+в порядке добавления, то есть по дате.
+"""
+import asyncio
+import logging
+import mmap
+import os
+import struct
+from array import array
+from datetime import date, timedelta
+from typing import Dict, List, NamedTuple, Tuple
+
+import settings.config as cfg
+
+logger = logging.getLogger(__name__)
+
+# user_id, ID упражнения (отрицательный — свое), день (с 1970-01-01), подходы, повторения, вес в десятых кг
+RECORD = struct.Struct("<QiHBHI")
+SEGMENT_RECORDS = 1 << 20
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+class LogEntry(NamedTuple):
+    user_id: int
+    exercise_id: int
+    day: date
+    sets: int
+    reps: int
+    weight: float
+
+    @property
+    def volume(self) -> float:
+        return self.sets * self.reps * self.weight
+
+
+_segments: List[mmap.mmap | bytearray] = []
+_active = None
+_count = 0
+_by_user: Dict[int, array] = {}
+_by_user_exercise: Dict[Tuple[int, int], array] = {}
+_loaded = asyncio.Event()
+
+
+def _segment_path(number: int) -> str:
+    return os.path.join(cfg.WORKOUT_LOG_DIR, f"seg-{number:06d}.bin")
+
+def _index(number: int, user_id: int, exercise_id: int):
+    _by_user.setdefault(user_id, array("Q")).append(number)
+    _by_user_exercise.setdefault((user_id, exercise_id), array("Q")).append(number)
+
+def _open_active(number: int, existing: bytes = b""):
+    global _active
+    _segments.append(bytearray(existing))
+    _active = open(_segment_path(number), "ab")
+
+def _load():
+    global _count
+    os.makedirs(cfg.WORKOUT_LOG_DIR, exist_ok=True)
+    number = 0
+    while os.path.exists(_segment_path(number)):
+        path = _segment_path(number)
+        size = os.path.getsize(path)
+        whole = size - size % RECORD.size
+        if whole != size:
+            # Обрыв при записи: хвост без целой записи отбрасываем
+            logger.warning(f"Truncating {size - whole} bytes of a torn record in {path}")
+            with open(path, "r+b") as f:
+                f.truncate(whole)
+        if whole // RECORD.size < SEGMENT_RECORDS:
+            with open(path, "rb") as f:
+                data = f.read()
+            _open_active(number, data)
+        else:
+            with open(path, "rb") as f:
+                _segments.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            data = _segments[-1]
+        for user_id, exercise_id, *_ in RECORD.iter_unpack(data):
+            _index(_count, user_id, exercise_id)
+            _count += 1
+        number += 1
+        if _active:
+            break
+    if _active is None:
+        _open_active(number)
+
+async def load_async():
+    """Строит индекс по сегментам в отдельном потоке."""
+    try:
+        await asyncio.to_thread(_load)
+    finally:
+        # Даже при ошибке загрузки: иначе хендлеры журнала ждали бы ее вечно
+        _loaded.set()
+    logger.info(f"Loaded workout log from {cfg.WORKOUT_LOG_DIR}: {_count} records, {len(_by_user)} users")
+
+async def wait_loaded():
+    await _loaded.wait()
+
+def close():
+    if _active and not _active.closed:
+        _active.close()
+
+
+def _read(number: int) -> LogEntry:
+    segment, slot = divmod(number, SEGMENT_RECORDS)
+    user_id, exercise_id, day, sets, reps, weight = RECORD.unpack_from(_segments[segment], slot * RECORD.size)
+    return LogEntry(user_id, exercise_id, date.fromordinal(day + _EPOCH), sets, reps, weight / 10)
+
+def append(user_id: int, exercise_id: int, sets: int, reps: int, weight: float, day: date | None = None) -> LogEntry:
+    global _count
+    day = day or date.today()
+    raw = RECORD.pack(user_id, exercise_id, day.toordinal() - _EPOCH, sets, reps, round(weight * 10))
+    if len(_segments[-1]) // RECORD.size >= SEGMENT_RECORDS:
+        # Сегмент заполнен: закрываем его и дальше читаем через mmap
+        _active.close()
+        with open(_segment_path(len(_segments) - 1), "rb") as f:
+            _segments[-1] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _open_active(len(_segments))
+    _active.write(raw)
+    _active.flush()
+    _segments[-1].extend(raw)
+    _index(_count, user_id, exercise_id)
+    _count += 1
+    return _read(_count - 1)
+
+
+def last_session(user_id: int, exercise_id: int) -> List[LogEntry]:
+    """Все записи упражнения за последний день, когда оно выполнялось."""
+    numbers = _by_user_exercise.get((user_id, exercise_id))
+    if not numbers:
+        return []
+    session = [_read(numbers[-1])]
+    for idx in range(len(numbers) - 2, -1, -1):
+        entry = _read(numbers[idx])
+        if entry.day != session[0].day:
+            break
+        session.append(entry)
+    session.reverse()
+    return session
+
+def best_set(user_id: int, exercise_id: int) -> LogEntry | None:
+    """Подход с наибольшим весом (при равенстве — с большим числом повторений)."""
+    best = None
+    for number in _by_user_exercise.get((user_id, exercise_id), ()):
+        entry = _read(number)
+        if best is None or (entry.weight, entry.reps) > (best.weight, best.reps):
+            best = entry
+    return best
+
+def weekly_volume(user_id: int, today: date | None = None) -> float:
+    """Суммарный тоннаж (подходы x повторения x вес) за последние 7 дней."""
+    since = (today or date.today()) - timedelta(days=6)
+    numbers = _by_user.get(user_id, ())
+    volume = 0.0
+    # Записи идут по дате, поэтому достаточно пройти с конца до начала недели
+    for idx in range(len(numbers) - 1, -1, -1):
+        entry = _read(numbers[idx])
+        if entry.day < since:
+            break
+        volume += entry.volume
+    return volume
+
+def exercise_history(user_id: int, exercise_id: int) -> List[LogEntry]:
+    return [_read(number) for number in _by_user_exercise.get((user_id, exercise_id), ())]
+
+def data_version(user_id: int, exercise_id: int) -> int:
+    """Число записей упражнения: меняется с каждой новой записью."""
+    return len(_by_user_exercise.get((user_id, exercise_id), ()))
+
+def exercise_columns(user_id: int, exercise_id: int) -> Tuple[list, list, list, list]:
+    """Записи упражнения по столбцам: день (с 1970-01-01), подходы, повторения, вес."""
+    columns = ([], [], [], [])
+    for number in _by_user_exercise.get((user_id, exercise_id), ()):
+        segment, slot = divmod(number, SEGMENT_RECORDS)
+        _, _, day, sets, reps, weight = RECORD.unpack_from(_segments[segment], slot * RECORD.size)
+        for column, value in zip(columns, (day, sets, reps, weight / 10)):
+            column.append(value)
+    return columns